@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from time_world.audits_ep import stationary_distribution
+from time_world.model import build_model, preset_record_drive
+from time_world.utils import artifact_dir, write_json
+
+# (n_phi, n_r) of the record-drive chain; n_x stays at the preset value.
+SIZES = [(8, 32), (16, 32), (16, 64), (32, 64), (32, 128), (64, 256)]
+# A slowly mixing variant, where power iteration needs ~2e5 matvecs.
+SLOW = {"p_x": 0.02, "p_phi": 0.05, "phase_noise": 0.0}
+SLOW_SIZES = [(16, 32), (16, 64), (32, 64)]
+# "auto" runs with the record levels as IAD blocks and "auto_unblocked" without.
+METHODS = ("direct", "gmres", "power", "iad", "auto", "auto_unblocked")
+# Factorisations past these sizes take minutes and are not timed.
+SKIP_ABOVE_NNZ = {"direct": 500_000, "gmres": 1_000_000}
+
+
+def main() -> None:
+    rows = []
+    cases = [("record_drive", size, {}) for size in SIZES]
+    cases += [("slow_mixing", size, SLOW) for size in SLOW_SIZES]
+    for chain, (n_phi, n_r), overrides in cases:
+        params = preset_record_drive()
+        params.update(n_phi=n_phi, n_r=n_r, **overrides)
+        states, P = build_model(params, format="csr")
+        row = {"chain": chain, "n_states": int(P.shape[0]), "nnz": int(P.nnz)}
+        for method in METHODS:
+            if P.nnz > SKIP_ABOVE_NNZ.get(method, np.inf):
+                row[method] = None
+                continue
+            blocks = None if method == "auto_unblocked" else states.r
+            start = time.perf_counter()
+            _, info = stationary_distribution(
+                P, method=method.removesuffix("_unblocked"), blocks=blocks, return_info=True
+            )
+            row[method] = round(time.perf_counter() - start, 3)
+            if method.startswith("auto"):
+                row[f"{method}_method"] = info["method"]
+        rows.append(row)
+        print(row, flush=True)
+
+    path = artifact_dir("bench_stationary_solvers") / "timings.json"
+    write_json(path, {"rows": rows})
+    print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,9 @@ from time_world.clock_audits import (
     idempotence_defect_snap,
     simulate_with_maintenance,
 )
-from time_world.model import build_model, preset_record_drive
+from time_world.model import preset_record_drive
+from time_world.model_cache import ModelCache, cached_build_model, default_cache_dir
+from time_world.sampling import TransitionSampler, build_sampler
 from time_world.utils import artifact_dir, write_json
 
 
@@ -38,7 +40,7 @@ def _summarize_nan_safe(values: list[float]) -> dict[str, float]:
 
 def _run_budget(
     states: list[tuple[int, int, int]],
-    P: np.ndarray,
+    sampler: TransitionSampler,
     *,
     steps: int,
     burn_in: int,
@@ -60,7 +62,7 @@ def _run_budget(
     for seed in seeds:
         run = simulate_with_maintenance(
             states,
-            P,
+            sampler,
             steps,
             seed,
             budget_total=budget_total,
@@ -115,7 +117,9 @@ def main() -> None:
     params = dict(params)
     params["phase_noise"] = 0.12
 
-    states, P = build_model(params)
+    cache = ModelCache(cache_dir=default_cache_dir())
+    states, P = cached_build_model(params, cache=cache)
+    sampler = build_sampler(P)
 
     steps = 60_000
     burn_in = 5_000
@@ -135,7 +139,7 @@ def main() -> None:
     for b in budgets_per_1k:
         summary = _run_budget(
             states,
-            P,
+            sampler,
             steps=steps,
             burn_in=burn_in,
             budget_total=budget_totals[b],
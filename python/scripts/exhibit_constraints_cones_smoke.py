@@ -10,8 +10,8 @@ SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
 if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
-from time_world.audits_ep import entropy_production_step, stationary_distribution
-from time_world.clock_audits import clock_metrics_from_run, simulate_with_maintenance
+from time_world.audits_ep import entropy_production_batch, stationary_distribution_batch
+from time_world.clock_audits import clock_metrics_from_run, maintenance_run_from_traj
 from time_world.constraints_cones import (
     adjacency_from_P,
     constraint_phi_forbid_pm1,
@@ -19,7 +19,9 @@ from time_world.constraints_cones import (
     constraint_r_constant,
     reachable_sizes,
 )
-from time_world.model import build_model, preset_record_drive
+from time_world.model import preset_record_drive, simulate_batch
+from time_world.model_cache import ModelCache, cached_build_model, default_cache_dir
+from time_world.sampling import TransitionSampler, build_sampler
 from time_world.utils import artifact_dir, write_json
 
 
@@ -29,7 +31,7 @@ def _mean(values: list[float]) -> float:
 
 def _run_clock_metrics(
     states: list[tuple[int, int, int]],
-    P: np.ndarray,
+    sampler: TransitionSampler,
     *,
     steps: int,
     burn_in: int,
@@ -42,16 +44,9 @@ def _run_clock_metrics(
     tick_rates = []
     tick_failure_rate_nan_count = 0
 
-    for seed in seeds:
-        run = simulate_with_maintenance(
-            states,
-            P,
-            steps,
-            seed,
-            budget_total=0,
-            burn_in=burn_in,
-            start_idx=0,
-        )
+    trajs = simulate_batch(sampler, steps + burn_in, seeds, start_idx=0)
+    for traj_full in trajs:
+        run = maintenance_run_from_traj(states, traj_full, burn_in=burn_in)
         metrics = clock_metrics_from_run(run)
         tick_failure_rate = metrics["tick_failure_rate"]
         tick_failure_rates.append(tick_failure_rate)
@@ -74,14 +69,16 @@ def _run_clock_metrics(
     }
 
 
-def _ep_stats(P: np.ndarray) -> dict[str, float]:
-    pi = stationary_distribution(P, tol=1e-12)
-    ep_raw = entropy_production_step(P, pi, zero_mode="inf")
-    ep_reg = entropy_production_step(P, pi, zero_mode="regularize", eps=1e-15)
-    return {
-        "ep_raw": float(ep_raw),
-        "ep_reg": float(ep_reg),
-    }
+def _ep_stats(Ps: list[np.ndarray]) -> list[dict[str, float]]:
+    pis = stationary_distribution_batch(Ps, tol=1e-12)
+    ep_raw, ep_reg = entropy_production_batch(Ps, pis, eps=1e-15)
+    return [
+        {
+            "ep_raw": float(raw),
+            "ep_reg": float(reg),
+        }
+        for raw, reg in zip(ep_raw, ep_reg)
+    ]
 
 
 def main() -> None:
@@ -117,16 +114,24 @@ def main() -> None:
     burn_in = 5_000
     seeds = [0, 1, 2]
 
+    cache = ModelCache(cache_dir=default_cache_dir())
+    models = {
+        name: cached_build_model(regime["params"], cache=cache)
+        for name, regime in regimes.items()
+    }
+    ep_by_regime = dict(zip(models, _ep_stats([P for _, P in models.values()])))
+
     results = {}
     for name, regime in regimes.items():
         params = regime["params"]
-        states, P = build_model(params)
+        states, P = models[name]
+        sampler = build_sampler(P)
         adj = adjacency_from_P(P, tol=0.0)
         sizes = reachable_sizes(adj, start_idx=0, t_max=t_max)
 
-        ep_stats = _ep_stats(P)
+        ep_stats = ep_by_regime[name]
         clock_stats = _run_clock_metrics(
-            states, P, steps=steps, burn_in=burn_in, seeds=seeds
+            states, sampler, steps=steps, burn_in=burn_in, seeds=seeds
         )
 
         params_serialized = dict(params)
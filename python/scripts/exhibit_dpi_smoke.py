@@ -18,7 +18,9 @@ from time_world.audits_path_kl import (
     lens_drop_r,
     lens_identity,
 )
-from time_world.model import build_model, preset_record_drive, preset_reversibleish, simulate
+from time_world.model import preset_record_drive, preset_reversibleish, simulate_batch
+from time_world.model_cache import ModelCache, cached_build_model, default_cache_dir
+from time_world.sampling import TransitionSampler, build_sampler
 from time_world.utils import artifact_dir, write_json
 
 
@@ -32,23 +34,26 @@ def _summarize(values: list[float]) -> dict[str, float]:
     return {"mean": float(np.mean(values)), "stderr": _stderr(values)}
 
 
-def _collect_run(
-    P: np.ndarray,
+def _collect_runs(
+    sampler: TransitionSampler,
     Ts: Iterable[int],
     lens_maps: dict[str, np.ndarray],
     *,
     steps: int,
     burn_in: int,
-    seed: int,
+    seeds: list[int],
     alpha: float,
-) -> dict[int, dict[str, object]]:
-    traj = simulate(P, steps + burn_in, seed=seed)
-    traj = traj[burn_in:]
-    return estimate_sigma_Ts_for_lenses(traj, Ts, lens_maps, alpha=alpha)
+) -> list[dict[int, dict[str, object]]]:
+    trajs = simulate_batch(sampler, steps + burn_in, seeds)
+    return [
+        estimate_sigma_Ts_for_lenses(traj[burn_in:], Ts, lens_maps, alpha=alpha)
+        for traj in trajs
+    ]
 
 
-def _run_preset(name: str, params: dict) -> dict[str, object]:
-    states, P = build_model(params)
+def _run_preset(name: str, params: dict, cache: ModelCache) -> dict[str, object]:
+    states, P = cached_build_model(params, cache=cache)
+    sampler = build_sampler(P)
 
     lens_maps = {
         "identity": apply_lens(states, lens_identity)[1],
@@ -66,16 +71,16 @@ def _run_preset(name: str, params: dict) -> dict[str, object]:
         T: {"micro": [], "identity": [], "drop_r": [], "drop_phi": []} for T in Ts
     }
 
-    for seed in seeds:
-        results = _collect_run(
-            P,
-            Ts,
-            lens_maps,
-            steps=steps,
-            burn_in=burn_in,
-            seed=seed,
-            alpha=alpha,
-        )
+    runs = _collect_runs(
+        sampler,
+        Ts,
+        lens_maps,
+        steps=steps,
+        burn_in=burn_in,
+        seeds=seeds,
+        alpha=alpha,
+    )
+    for results in runs:
         for T in Ts:
             accum[T]["micro"].append(results[T]["micro"])
             for lens_name, value in results[T]["lenses"].items():
@@ -124,9 +129,10 @@ def _print_summary(result: dict[str, object]) -> None:
 
 
 def main() -> None:
+    cache = ModelCache(cache_dir=default_cache_dir())
     results = [
-        _run_preset("record_drive", preset_record_drive()),
-        _run_preset("reversibleish", preset_reversibleish()),
+        _run_preset("record_drive", preset_record_drive(), cache),
+        _run_preset("reversibleish", preset_reversibleish(), cache),
     ]
 
     timestamp_utc = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
@@ -11,7 +11,9 @@ if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
 from time_world.enablement import run_enablement
-from time_world.model import build_model
+from time_world.model import simulate_batch
+from time_world.model_cache import ModelCache, cached_build_model, default_cache_dir
+from time_world.sampling import build_sampler
 from time_world.utils import artifact_dir, write_json
 
 
@@ -51,20 +53,24 @@ def main() -> None:
         "control": {**base_params, "x_phi_coupling": 0.0},
     }
 
+    cache = ModelCache(cache_dir=default_cache_dir())
     results = {}
     for name, params in regimes.items():
-        states, P = build_model(params)
+        states, P = cached_build_model(params, cache=cache)
+        sampler = build_sampler(P)
+        trajs = simulate_batch(sampler, steps + burn_in, seeds)
         per_seed = []
-        for seed in seeds:
+        for seed, traj in zip(seeds, trajs):
             outcome = run_enablement(
                 states,
-                P,
+                sampler,
                 seed=seed,
                 steps=steps,
                 burn_in=burn_in,
                 window=window,
                 threshold=threshold,
                 alpha=alpha,
+                traj=traj,
             )
             per_seed.append(outcome)
 
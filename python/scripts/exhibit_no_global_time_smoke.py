@@ -10,13 +10,16 @@ SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
 if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
+from time_world.constraints_cones import constraint_phi_odd_only
 from time_world.holonomy import (
     omega_from_samples,
     protocol_A_identity,
     protocol_B_even,
     protocol_C_odd,
 )
-from time_world.model import build_model, preset_reversibleish, simulate
+from time_world.model import preset_reversibleish, simulate_batch
+from time_world.model_cache import ModelCache, cached_build_model, default_cache_dir
+from time_world.sampling import build_sampler
 from time_world.utils import artifact_dir, write_json
 
 
@@ -30,12 +33,6 @@ def _summarize(values: list[float]) -> dict[str, float]:
     return {"mean": float(np.mean(values)), "stderr": _stderr(values)}
 
 
-def _odd_phi_constraint(
-    _from_state: tuple[int, int, int], to_state: tuple[int, int, int]
-) -> bool:
-    return (to_state[1] % 2) == 1
-
-
 def _run_regime(
     params: dict,
     *,
@@ -44,8 +41,10 @@ def _run_regime(
     burn_in: int,
     stride: int,
     seeds: list[int],
+    cache: ModelCache,
 ) -> dict:
-    states, P = build_model(params)
+    states, P = cached_build_model(params, cache=cache)
+    sampler = build_sampler(P)
 
     proto_a = protocol_A_identity()
     proto_b = protocol_B_even(params["n_phi"])
@@ -57,10 +56,10 @@ def _run_regime(
     omega_ca_vals = []
     H_vals = []
 
-    for seed in seeds:
-        traj = simulate(P, steps + burn_in, seed)
+    trajs = simulate_batch(sampler, steps + burn_in, seeds)
+    for seed, traj in zip(seeds, trajs):
         traj = traj[burn_in:]
-        samples = [states[int(idx)] for idx in traj[::stride]]
+        samples = states.tuples(traj[::stride])
 
         omega_ab = omega_from_samples(proto_a, proto_b, samples)["omega_mean"]
         omega_bc = omega_from_samples(proto_b, proto_c, samples)["omega_mean"]
@@ -116,7 +115,9 @@ def main() -> None:
     regime_a_params["constraint_mask"] = None
 
     regime_b_params = dict(base)
-    regime_b_params["constraint_mask"] = _odd_phi_constraint
+    regime_b_params["constraint_mask"] = constraint_phi_odd_only()
+
+    cache = ModelCache(cache_dir=default_cache_dir())
 
     results = {
         "nonzero": _run_regime(
@@ -126,6 +127,7 @@ def main() -> None:
             burn_in=burn_in,
             stride=stride,
             seeds=seeds,
+            cache=cache,
         ),
         "control": _run_regime(
             regime_b_params,
@@ -134,6 +136,7 @@ def main() -> None:
             burn_in=burn_in,
             stride=stride,
             seeds=seeds,
+            cache=cache,
         ),
     }
 
@@ -10,7 +10,15 @@ SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
 if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
-from time_world.sweeps import generate_cases, run_case_metrics, run_enablement_sweep
+from time_world.audits_ep import MOVE_TYPES, stationary_distribution_batch
+from time_world.model_cache import ModelCache, cached_build_model, default_cache_dir
+from time_world.sweeps import (
+    case_params,
+    ep_move_field,
+    generate_cases,
+    run_case_metrics,
+    run_enablement_sweep,
+)
 from time_world.utils import artifact_dir, write_json
 
 
@@ -41,9 +49,14 @@ def main() -> None:
     burn_in = 3_000
     stride = 10
     alpha_kl = 1.0
+    cache = ModelCache(cache_dir=default_cache_dir())
+
+    # Every case shares one state space, so solve all stationary laws at once.
+    Ps = [cached_build_model(case_params(case), cache=cache)[1] for case in cases]
+    pis = stationary_distribution_batch(Ps, tol=1e-12)
 
     case_results = []
-    for case in cases:
+    for case, pi in zip(cases, pis):
         case_results.append(
             run_case_metrics(
                 case,
@@ -52,6 +65,8 @@ def main() -> None:
                 burn_in=burn_in,
                 stride=stride,
                 alpha_kl=alpha_kl,
+                cache=cache,
+                pi=pi,
             )
         )
 
@@ -64,6 +79,7 @@ def main() -> None:
         window=20_000,
         threshold=0.02,
         alpha=1.0,
+        cache=cache,
     )
 
     out_dir = artifact_dir("sweeps/sweep_smoke")
@@ -80,6 +96,7 @@ def main() -> None:
         "constraint_name",
         "ep_raw",
         "ep_reg",
+        *(ep_move_field(move) for move in MOVE_TYPES[1:]),
         "tick_failure_rate_mean",
         "tick_failure_rate_stderr",
         "drift_rate_per_1k_mean",
@@ -1,79 +1,1173 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
+from typing import Callable, Iterator, Sequence
+
 import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.sparse import linalg as spla
 
+from time_world.constraints_cones import communicating_classes
+from time_world.model import state_coords
 
-def stationary_distribution(
-    P: np.ndarray, *, tol: float = 1e-12, max_iter: int = 500_000
-) -> np.ndarray:
-    P = np.asarray(P, dtype=np.float64)
+
+def _as_transition_matrix(P: object) -> np.ndarray | sparse.csr_array:
+    if sparse.issparse(P):
+        P = sparse.csr_array(P, dtype=np.float64)
+    else:
+        P = np.asarray(P, dtype=np.float64)
     if P.ndim != 2 or P.shape[0] != P.shape[1]:
         raise ValueError("P must be a square matrix")
-    if P.shape[0] == 0:
+    return P
+
+
+def _is_operator(P: object) -> bool:
+    # Matrix-free transition operators (e.g. ``FactoredChain``) expose
+    # ``rmatvec(v) == v @ P`` and ``shape`` instead of their entries.
+    return (
+        not sparse.issparse(P)
+        and not isinstance(P, np.ndarray)
+        and callable(getattr(P, "rmatvec", None))
+    )
+
+
+STATIONARY_METHODS = (
+    "auto",
+    "power",
+    "anderson",
+    "direct",
+    "gmres",
+    "bicgstab",
+    "arnoldi",
+    "iad",
+    "classes",
+)
+# Nonzero budgets for the explicit solvers, from
+# scripts/bench_stationary_solvers.py. Sparse LU fill-in grows much faster
+# than nnz (12 s at 4e5 nonzeros). ILU-GMRES falls behind power iteration
+# past ~2e6 nonzeros (24 s against 13 s at 3.3e6) but stays 10-20x ahead of
+# it on slowly mixing chains below that. Past the ILU budget, power
+# iteration (or IAD, given blocks) is used.
+_DIRECT_MAX_NNZ = 20_000
+_ILU_MAX_NNZ = 1_000_000
+# Dense LAPACK solves cost n**3 whatever the sparsity.
+_DENSE_DIRECT_MAX_STATES = 2_000
+_ANDERSON_MEMORY = 5
+
+
+def stationary_distribution(
+    P: object,
+    *,
+    tol: float = 1e-12,
+    max_iter: int = 500_000,
+    method: str = "auto",
+    pi0: np.ndarray | None = None,
+    return_info: bool = False,
+    blocks: np.ndarray | None = None,
+    classes: tuple[np.ndarray, np.ndarray] | None = None,
+) -> np.ndarray | tuple[np.ndarray, dict]:
+    """Solve ``pi = pi @ P`` for a probability vector ``pi``.
+
+    ``method`` selects the solver:
+
+    - ``"power"``: power iteration from the uniform vector. On a reducible
+      chain this gives the limit reached from the uniform start.
+    - ``"anderson"``: power iteration with Anderson mixing of the last few
+      iterates; converges on nearly periodic chains where plain power crawls.
+    - ``"direct"``: sparse LU on ``(P^T - I) pi = 0`` with the last equation
+      replaced by ``sum(pi) = 1``.
+    - ``"gmres"`` / ``"bicgstab"``: the same system by Krylov iteration,
+      ILU-preconditioned when ``P`` is an explicit matrix.
+    - ``"arnoldi"``: dominant left eigenvector via ARPACK.
+    - ``"iad"``: iterative aggregation/disaggregation over the partition
+      given by ``blocks`` (one label per state, e.g. ``states.r`` for the
+      record levels) with a block Gauss-Seidel sweep; suited to nearly
+      block-triangular chains such as a slowly sliding record register.
+    - ``"classes"``: split ``P`` into communicating classes (see
+      :func:`stationary_decomposition`) and combine the per-class solutions
+      with the absorption probabilities of the start vector, giving the
+      limit power iteration converges to from that start.
+    - ``"auto"``: when ``P`` has a single closed class, so ``pi`` is
+      unique, the cheapest solver for its number of nonzeros: ``"direct"``
+      up to ``_DIRECT_MAX_NNZ``, then ``"iad"`` if ``blocks`` is given and
+      no block holds a closed set of states, else ``"gmres"`` up to
+      ``_ILU_MAX_NNZ`` and ``"power"`` beyond.
+      ``"classes"`` from the uniform start otherwise; ``"power"`` for
+      matrix-free operators.
+
+    Operators (anything with ``rmatvec`` and ``shape``) support every method
+    except ``"direct"``, ``"iad"`` and ``"classes"``.
+
+    ``pi0`` replaces the uniform starting vector of the iterative methods,
+    e.g. the solution of a neighbouring sweep case. ``"auto"`` ignores it when
+    the stationary distribution is not unique, since the start then selects
+    the limit. With ``return_info=True`` the result is ``(pi, info)`` where
+    ``info`` holds the resolved ``method`` and the number of ``matvecs``
+    (products with ``P``) spent. ``classes`` passes in the
+    :func:`communicating_classes` of ``P`` when the caller already has them.
+    """
+    if method not in STATIONARY_METHODS:
+        raise ValueError(f"method must be one of {STATIONARY_METHODS}")
+    operator = _is_operator(P)
+    if operator:
+        if len(P.shape) != 2 or P.shape[0] != P.shape[1]:
+            raise ValueError("P must be a square matrix")
+    else:
+        P = _as_transition_matrix(P)
+    n_states = P.shape[0]
+    if n_states == 0:
         raise ValueError("P must be non-empty")
 
+    start = np.full(n_states, 1.0 / n_states, dtype=np.float64)
+    if pi0 is not None:
+        pi0 = np.asarray(pi0, dtype=np.float64)
+        if pi0.shape != (n_states,) or np.any(pi0 < 0) or not pi0.sum() > 0:
+            raise ValueError("pi0 must be a nonnegative vector matching P with positive mass")
+    if method == "auto":
+        if operator:
+            method = "power"
+            pi0 = None
+        else:
+            if classes is None:
+                classes = communicating_classes(P)
+            if np.count_nonzero(classes[1]) != 1:
+                method = "classes"
+                pi0 = None
+            else:
+                method = _irreducible_method(P, blocks)
+    if pi0 is not None:
+        start = pi0 / pi0.sum()
+
+    matvecs = 0
+    apply_P = _left_step(P)
+
+    def step(v: np.ndarray) -> np.ndarray:
+        nonlocal matvecs
+        matvecs += 1
+        return apply_P(v)
+
+    if method == "power":
+        pi = _power_iteration(step, start, tol=tol, max_iter=max_iter)
+    elif method == "anderson":
+        pi = _anderson_iteration(step, start, tol=tol, max_iter=max_iter)
+    elif method == "arnoldi":
+        pi = _arnoldi(step, start, tol=tol, max_iter=max_iter)
+    elif method == "direct":
+        if operator:
+            raise ValueError("method='direct' needs an explicit matrix")
+        pi = spla.spsolve(_normalized_system(P), _unit_last(n_states))
+    elif method == "classes":
+        if operator:
+            raise ValueError("method='classes' needs an explicit matrix")
+        decomposition = stationary_decomposition(
+            P, tol=tol, max_iter=max_iter, classes=classes
+        )
+        pi = decomposition.limit(start)
+    elif method == "iad":
+        if operator:
+            raise ValueError("method='iad' needs an explicit matrix")
+        if blocks is None:
+            raise ValueError("method='iad' needs block labels")
+        pi, sweeps = _aggregation_disaggregation(
+            P, blocks, start, tol=tol, max_iter=max_iter
+        )
+        # Each outer sweep touches every entry of P twice: once to aggregate
+        # and once in the Gauss-Seidel pass.
+        matvecs = 2 * sweeps
+    else:
+        pi = _krylov(P, step, start, method, tol=tol, max_iter=max_iter)
+
+    pi = np.maximum(np.real(pi), 0.0)
+    total = float(pi.sum())
+    if total <= 0 or not np.isfinite(total):
+        raise ValueError("stationary_distribution encountered nonpositive mass")
+    pi /= total
+    if return_info:
+        return pi, {"method": method, "matvecs": matvecs}
+    return pi
+
+
+def _left_step(P: object) -> Callable[[np.ndarray], np.ndarray]:
+    if _is_operator(P):
+        return P.rmatvec
+    if sparse.issparse(P):
+        PT = P.T.tocsr()
+        return lambda v: PT @ v
+    return lambda v: v @ P
+
+
+def _irreducible_method(P: np.ndarray | sparse.csr_array, blocks: np.ndarray | None) -> str:
+    """``"auto"`` solver for an explicit ``P`` with a unique stationary distribution."""
+    nnz = P.nnz if sparse.issparse(P) else np.count_nonzero(P)
+    if nnz <= _DIRECT_MAX_NNZ:
+        return "direct"
+    if blocks is not None:
+        _, ids = np.unique(np.asarray(blocks), return_inverse=True)
+        ids = ids.reshape(-1)
+        if ids.shape == (P.shape[0],) and ids.max() > 0 and _blocks_leak(P, ids):
+            return "iad"
+    return "gmres" if nnz <= _ILU_MAX_NNZ else "power"
+
+
+def _closed_class_count(P: np.ndarray | sparse.csr_array) -> int:
+    """Number of communicating classes that no transition leaves."""
+    _, closed = communicating_classes(P)
+    return int(np.count_nonzero(closed))
+
+
+@dataclass(frozen=True)
+class StationaryDecomposition:
+    """Closed classes of a chain with their stationary laws and absorption odds.
+
+    ``classes[c]`` lists the states of closed class ``c`` and ``class_pi[c]``
+    its stationary distribution over those states. ``absorption[i, c]`` is
+    the probability that the chain started in ``i`` ends up in class ``c``
+    (one-hot for recurrent states); ``transient`` lists the other states.
+    """
+
+    n_states: int
+    classes: tuple[np.ndarray, ...]
+    class_pi: tuple[np.ndarray, ...]
+    transient: np.ndarray
+    absorption: np.ndarray
+
+    def limit(self, start: np.ndarray | None = None) -> np.ndarray:
+        """Long-run distribution from ``start`` (default: uniform)."""
+        if start is None:
+            start = np.full(self.n_states, 1.0 / self.n_states)
+        weights = np.asarray(start, dtype=np.float64) @ self.absorption
+        pi = np.zeros(self.n_states, dtype=np.float64)
+        for weight, members, class_pi in zip(weights, self.classes, self.class_pi):
+            pi[members] = weight * class_pi
+        return pi
+
+
+def stationary_decomposition(
+    P: np.ndarray | sparse.csr_array,
+    *,
+    tol: float = 1e-12,
+    max_iter: int = 500_000,
+    classes: tuple[np.ndarray, np.ndarray] | None = None,
+) -> StationaryDecomposition:
+    """Split ``P`` into closed classes and solve each one separately.
+
+    Classes come from :func:`communicating_classes` on ``P`` (pass ``classes`` to reuse them). Every closed class is irreducible, so
+    its stationary distribution is unique; absorption probabilities solve
+    ``(I - Q) B = R`` over the transient states.
+    """
+    P = sparse.csr_array(_as_transition_matrix(P))
     n_states = P.shape[0]
-    pi = np.full(n_states, 1.0 / n_states, dtype=np.float64)
+    if n_states == 0:
+        raise ValueError("P must be non-empty")
+    labels, closed = classes if classes is not None else communicating_classes(P)
+
+    closed_labels = np.flatnonzero(closed)
+    members = tuple(np.flatnonzero(labels == label) for label in closed_labels)
+    class_pi = []
+    for idx in members:
+        sub = P[idx][:, idx]
+        method = _irreducible_method(sub, None)
+        class_pi.append(stationary_distribution(sub, tol=tol, max_iter=max_iter, method=method))
+
+    class_of = np.full(n_states, -1, dtype=np.int64)
+    for c, idx in enumerate(members):
+        class_of[idx] = c
+    absorption = np.zeros((n_states, len(members)), dtype=np.float64)
+    recurrent = np.flatnonzero(class_of >= 0)
+    absorption[recurrent, class_of[recurrent]] = 1.0
+
+    transient = np.flatnonzero(class_of < 0)
+    if transient.size:
+        rows = P[transient]
+        Q = rows[:, transient]
+        R = (rows @ sparse.csr_array(absorption)).toarray()
+        system = (sparse.eye_array(transient.shape[0]) - Q).tocsc()
+        B = spla.splu(system).solve(R)
+        absorption[transient] = np.clip(B, 0.0, 1.0)
+
+    return StationaryDecomposition(
+        n_states=n_states,
+        classes=members,
+        class_pi=tuple(class_pi),
+        transient=transient,
+        absorption=absorption,
+    )
+
+
+@dataclass(frozen=True)
+class SpectralGap:
+    """Second eigenvalue of a chain and the relaxation time it implies.
+
+    ``lambda2`` is the subdominant eigenvalue of largest modulus (of ``P``
+    for ``method="arnoldi"``, of the additive reversibilisation
+    ``(P + P*) / 2`` for ``method="reversible"``). ``gap = 1 - |lambda2|``
+    and ``relaxation_time = 1 / gap``, infinite for periodic or reducible
+    chains.
+    """
+
+    lambda2: complex
+    gap: float
+    relaxation_time: float
+    method: str
+
+
+SPECTRAL_METHODS = ("arnoldi", "reversible")
+_DENSE_EIG_MAX_STATES = 500
 
+
+def spectral_gap(
+    P: object,
+    *,
+    method: str = "arnoldi",
+    pi: np.ndarray | None = None,
+    tol: float = 1e-10,
+) -> SpectralGap:
+    """Absolute spectral gap of ``P``.
+
+    ``"arnoldi"`` finds the leading eigenvalues of ``P`` itself (implicitly
+    restarted Arnoldi, or a dense solve for small chains). ``"reversible"``
+    symmetrises ``P`` with its time reversal under ``pi`` and runs Lanczos;
+    its gap bounds mixing of non-reversible chains and equals the
+    Arnoldi gap for reversible ones. Only states with ``pi > 0`` enter the
+    reversible form. Clustered eigenvalues of strongly non-normal chains are
+    ill-conditioned, so treat the Arnoldi value as an estimate there.
+    """
+    if method not in SPECTRAL_METHODS:
+        raise ValueError(f"method must be one of {SPECTRAL_METHODS}")
+    operator = _is_operator(P)
+    if not operator:
+        P = _as_transition_matrix(P)
+    n_states = P.shape[0]
+
+    if method == "arnoldi":
+        if not operator and n_states <= _DENSE_EIG_MAX_STATES:
+            dense = P.toarray() if sparse.issparse(P) else P
+            eigvals = np.linalg.eigvals(dense)
+        else:
+            A = spla.LinearOperator(
+                (n_states, n_states), matvec=_left_step(P), dtype=np.float64
+            )
+            eigvals = spla.eigs(
+                A, k=min(6, n_states - 2), which="LM", tol=tol, return_eigenvectors=False
+            )
+    else:
+        if operator:
+            raise ValueError("method='reversible' needs an explicit matrix")
+        if pi is None:
+            pi = stationary_distribution(P, tol=tol)
+        support = np.flatnonzero(np.asarray(pi) > 0)
+        root = np.sqrt(np.asarray(pi, dtype=np.float64)[support])
+        sub = sparse.csr_array(P)[support][:, support]
+        # D^1/2 P D^-1/2 symmetrised: D^1/2 (P + D^-1 P^T D) D^-1/2 / 2.
+        half = sparse.diags_array(root) @ sub @ sparse.diags_array(1.0 / root)
+        S = 0.5 * (half + half.T)
+        if support.shape[0] <= _DENSE_EIG_MAX_STATES:
+            eigvals = np.linalg.eigvalsh(S.toarray())
+        else:
+            top = spla.eigsh(S, k=2, which="LA", tol=tol, return_eigenvectors=False)
+            bottom = spla.eigsh(S, k=1, which="SA", tol=tol, return_eigenvectors=False)
+            eigvals = np.concatenate([top, bottom])
+
+    # Drop the Perron eigenvalue 1; any other eigenvalue on the unit circle
+    # (periodicity, several closed classes) leaves no gap.
+    order = np.argsort(-np.abs(eigvals), kind="stable")
+    eigvals = eigvals[order]
+    perron = int(np.argmin(np.abs(eigvals - 1.0)))
+    rest = np.delete(eigvals, perron)
+    lambda2 = complex(rest[0]) if rest.size else 0j
+    gap = max(0.0, 1.0 - abs(lambda2))
+    if gap < tol:
+        gap = 0.0
+    return SpectralGap(
+        lambda2=lambda2,
+        gap=gap,
+        relaxation_time=float("inf") if gap == 0.0 else 1.0 / gap,
+        method=method,
+    )
+
+
+def choose_run_length(
+    P: object,
+    *,
+    target_stderr: float,
+    n_chains: int = 1,
+    variance: float = 0.25,
+    tv_eps: float = 0.01,
+    max_steps: int = 10_000_000,
+    pi: np.ndarray | None = None,
+) -> dict:
+    """Pick ``burn_in`` and ``steps`` per chain from the relaxation time of ``P``.
+
+    ``burn_in = t_rel * log(1 / (tv_eps * pi_min))`` bounds the time to get
+    within ``tv_eps`` of stationarity in total variation. ``steps`` makes the
+    standard error of a time average of an observable with ``variance`` (0.25
+    bounds any rate or indicator) about ``target_stderr`` across ``n_chains``
+    chains, using ``2 * t_rel`` as its integrated autocorrelation time. Both
+    are capped at ``max_steps``; ``capped`` reports whether that happened.
+    """
+    if target_stderr <= 0 or n_chains < 1 or variance <= 0 or not (0 < tv_eps < 1):
+        raise ValueError("target_stderr, n_chains, variance and tv_eps must be positive")
+    if pi is None:
+        pi = stationary_distribution(P)
+    t_rel = spectral_gap(P).relaxation_time
+    pi_min = float(np.min(pi[pi > 0]))
+
+    burn_in = t_rel * np.log(1.0 / (tv_eps * pi_min))
+    steps = 2.0 * t_rel * variance / (target_stderr**2 * n_chains)
+    capped = not (burn_in <= max_steps and steps <= max_steps)
+    return {
+        "burn_in": int(min(np.ceil(burn_in), max_steps)),
+        "steps": int(min(np.ceil(steps), max_steps)),
+        "relaxation_time": t_rel,
+        "capped": capped,
+    }
+
+
+def _normalize_mass(v: np.ndarray) -> np.ndarray:
+    v = np.maximum(v, 0.0)
+    total = float(v.sum())
+    if total <= 0 or not np.isfinite(total):
+        raise ValueError("stationary_distribution encountered nonpositive mass")
+    return v / total
+
+
+def _power_iteration(
+    step: Callable[[np.ndarray], np.ndarray], start: np.ndarray, *, tol: float, max_iter: int
+) -> np.ndarray:
+    pi = start
     residual = float("inf")
     for _ in range(max_iter):
-        pi_next = pi @ P
-        pi_next = np.maximum(pi_next, 0.0)
-        total = float(pi_next.sum())
-        if total <= 0 or not np.isfinite(total):
-            raise ValueError("stationary_distribution encountered nonpositive mass")
-        pi_next /= total
-
+        pi_next = _normalize_mass(step(pi))
         residual = float(np.linalg.norm(pi_next - pi, 1))
-        if residual < tol:
-            pi = pi_next
-            break
         pi = pi_next
-    else:
+        if residual < tol:
+            return pi
+    raise ValueError(
+        f"stationary_distribution did not converge within {max_iter} iterations "
+        f"(residual={residual})"
+    )
+
+
+def _anderson_iteration(
+    step: Callable[[np.ndarray], np.ndarray], start: np.ndarray, *, tol: float, max_iter: int
+) -> np.ndarray:
+    x = start
+    g = _normalize_mass(step(x))
+    f = g - x
+    d_f: list[np.ndarray] = []
+    d_g: list[np.ndarray] = []
+    residual = float("inf")
+    for _ in range(max_iter):
+        residual = float(np.linalg.norm(f, 1))
+        if residual < tol:
+            return g
+        x_next = g
+        if d_f:
+            gamma = np.linalg.lstsq(np.column_stack(d_f), f, rcond=None)[0]
+            mixed = np.maximum(g - np.column_stack(d_g) @ gamma, 0.0)
+            total = float(mixed.sum())
+            # Fall back to the plain power step if mixing leaves the simplex.
+            if total > 0 and np.isfinite(total):
+                x_next = mixed / total
+        g_next = _normalize_mass(step(x_next))
+        f_next = g_next - x_next
+        d_f.append(f_next - f)
+        d_g.append(g_next - g)
+        if len(d_f) > _ANDERSON_MEMORY:
+            del d_f[0], d_g[0]
+        x, g, f = x_next, g_next, f_next
+    raise ValueError(
+        f"stationary_distribution did not converge within {max_iter} iterations "
+        f"(residual={residual})"
+    )
+
+
+def _arnoldi(
+    step: Callable[[np.ndarray], np.ndarray], start: np.ndarray, *, tol: float, max_iter: int
+) -> np.ndarray:
+    n_states = start.shape[0]
+    if n_states < 3:
+        # ARPACK needs k < n - 1; recover P^T column by column instead.
+        PT = np.column_stack([step(e) for e in np.eye(n_states)])
+        vals, vecs = np.linalg.eig(PT)
+        return np.real(vecs[:, np.argmin(np.abs(vals - 1.0))])
+    PT = spla.LinearOperator((n_states, n_states), matvec=step, dtype=np.float64)
+    try:
+        _, vecs = spla.eigs(
+            PT,
+            k=1,
+            which="LR",
+            v0=start,
+            tol=tol,
+            maxiter=max_iter,
+        )
+    except spla.ArpackNoConvergence as exc:
+        raise ValueError("stationary_distribution: Arnoldi did not converge") from exc
+    vec = np.real(vecs[:, 0])
+    return vec if vec.sum() >= 0 else -vec
+
+
+def _blocks_leak(P: np.ndarray | sparse.csr_array, ids: np.ndarray) -> bool:
+    """Whether every state can reach a transition out of its block within the block.
+
+    Exactly then is every ``I - P_JJ`` nonsingular: a block fails when it
+    holds a closed set of states, e.g. the top record level without backslide.
+    """
+    n_states = P.shape[0]
+    graph = sparse.csr_array(P).tocoo()
+    keep = graph.data > 0
+    rows, cols = graph.row[keep], graph.col[keep]
+    inside = ids[rows] == ids[cols]
+    leaky = np.unique(rows[~inside])
+    # Walk intra-block edges backwards from a sink fed by every leaky state.
+    src = np.concatenate([cols[inside], np.full(leaky.shape[0], n_states)])
+    dst = np.concatenate([rows[inside], leaky])
+    reverse = sparse.csr_array(
+        (np.ones(src.shape[0]), (src, dst)), shape=(n_states + 1, n_states + 1)
+    )
+    reached = csgraph.breadth_first_order(reverse, n_states, return_predecessors=False)
+    return reached.shape[0] == n_states + 1
+
+
+def _aggregation_disaggregation(
+    P: np.ndarray | sparse.csr_array,
+    blocks: np.ndarray,
+    start: np.ndarray,
+    *,
+    tol: float,
+    max_iter: int,
+) -> tuple[np.ndarray, int]:
+    """Koury-McAllister-Stewart iterative aggregation/disaggregation.
+
+    Each sweep solves the coupling chain between blocks for the block masses,
+    rescales the current iterate to them and then does one block Gauss-Seidel
+    pass ``pi_J (I - P_JJ) = sum_{I != J} pi_I P_IJ`` with cached block LU
+    factors. Returns ``pi`` and the number of sweeps.
+    """
+    n_states = P.shape[0]
+    blocks = np.asarray(blocks)
+    if blocks.shape != (n_states,):
+        raise ValueError("blocks must give one label per state")
+    _, ids = np.unique(blocks, return_inverse=True)
+    n_blocks = int(ids.max()) + 1
+    if n_blocks == 1:
+        return spla.spsolve(_normalized_system(P), _unit_last(n_states)), 1
+
+    if not _blocks_leak(P, ids):
+        # splu does not reliably fail on a singular I - P_JJ, so check the
+        # structure up front.
         raise ValueError(
-            f"stationary_distribution did not converge within {max_iter} iterations "
-            f"(residual={residual})"
+            "method='iad': some block holds a closed set of states, so I - P_JJ is singular"
         )
 
-    pi = np.maximum(pi, 0.0)
-    pi /= float(pi.sum())
+    # Permute so every block is contiguous; ``perm[k]`` is the state at slot k.
+    perm = np.argsort(ids, kind="stable")
+    ids = ids[perm]
+    bounds = np.searchsorted(ids, np.arange(n_blocks + 1))
+    Pp = sparse.csr_array(P)[perm][:, perm].tocsc()
+    columns = [Pp[:, bounds[J] : bounds[J + 1]] for J in range(n_blocks)]
+    factors = []
+    for J in range(n_blocks):
+        lo, hi = bounds[J], bounds[J + 1]
+        diag = columns[J][lo:hi]
+        factors.append(spla.splu((sparse.eye_array(hi - lo) - diag).T.tocsc()))
+    indicator = sparse.csr_array(
+        (np.ones(n_states), (np.arange(n_states), ids)), shape=(n_states, n_blocks)
+    )
+    Pp = Pp.tocsr()
+
+    pi = start[perm].copy()
+    residual = float("inf")
+    for sweep in range(1, max_iter + 1):
+        previous = pi.copy()
+
+        # Aggregate: coupling chain C_IJ = sum_{i in I} (pi_i / pi_I) P_iJ.
+        mass = indicator.T @ pi
+        weights = np.divide(pi, mass[ids], out=np.zeros_like(pi), where=mass[ids] > 0)
+        empty = mass <= 0
+        if np.any(empty):
+            sizes = np.diff(bounds)
+            weights[empty[ids]] = 1.0 / sizes[ids[empty[ids]]]
+        coupling = indicator.T @ (Pp * weights[:, None]) @ indicator
+        xi = np.maximum(
+            spla.spsolve(_normalized_system(coupling), _unit_last(n_blocks)), 0.0
+        )
+
+        # Disaggregate, then one block Gauss-Seidel pass.
+        pi = xi[ids] * weights
+        for J in range(n_blocks):
+            lo, hi = bounds[J], bounds[J + 1]
+            rhs = pi @ columns[J] - pi[lo:hi] @ columns[J][lo:hi]
+            pi[lo:hi] = np.maximum(factors[J].solve(rhs), 0.0)
+        pi = _normalize_mass(pi)
+
+        residual = float(np.linalg.norm(pi - previous, 1))
+        if residual < tol:
+            out = np.empty_like(pi)
+            out[perm] = pi
+            return out, sweep
+    raise ValueError(
+        f"stationary_distribution did not converge within {max_iter} iterations "
+        f"(residual={residual})"
+    )
+
+
+def _unit_last(n_states: int) -> np.ndarray:
+    b = np.zeros(n_states, dtype=np.float64)
+    b[-1] = 1.0
+    return b
+
+
+def _normalized_system(P: np.ndarray | sparse.csr_array) -> sparse.csc_array:
+    """``P^T - I`` with its last row replaced by ones (the constraint ``sum(pi) = 1``)."""
+    n_states = P.shape[0]
+    A = (sparse.csr_array(P).T - sparse.eye_array(n_states)).tocoo()
+    keep = A.row != n_states - 1
+    rows = np.concatenate([A.row[keep], np.full(n_states, n_states - 1)])
+    cols = np.concatenate([A.col[keep], np.arange(n_states)])
+    vals = np.concatenate([A.data[keep], np.ones(n_states)])
+    return sparse.csc_array((vals, (rows, cols)), shape=(n_states, n_states))
+
+
+def _krylov(
+    P: object,
+    step: Callable[[np.ndarray], np.ndarray],
+    start: np.ndarray,
+    method: str,
+    *,
+    tol: float,
+    max_iter: int,
+) -> np.ndarray:
+    n_states = P.shape[0]
+
+    def apply(v: np.ndarray) -> np.ndarray:
+        # Same rows as ``_normalized_system``, applied through ``step``.
+        out = step(v) - v
+        out[-1] = v.sum()
+        return out
+
+    A = spla.LinearOperator((n_states, n_states), matvec=apply, dtype=np.float64)
+    preconditioner = None
+    if not _is_operator(P):
+        try:
+            ilu = spla.spilu(_normalized_system(P), drop_tol=1e-6, fill_factor=20)
+        except RuntimeError:
+            ilu = None
+        if ilu is not None:
+            preconditioner = spla.LinearOperator(A.shape, matvec=ilu.solve)
+
+    solver = spla.gmres if method == "gmres" else spla.bicgstab
+    pi, info = solver(
+        A,
+        _unit_last(n_states),
+        x0=start,
+        rtol=tol,
+        atol=0.0,
+        maxiter=max_iter,
+        M=preconditioner,
+    )
+    if info != 0:
+        raise ValueError(f"stationary_distribution: {method} did not converge (info={info})")
     return pi
 
 
 def entropy_production_step(
-    P: np.ndarray,
+    P: object,
     pi: np.ndarray,
     *,
     zero_mode: str = "inf",
     eps: float = 1e-15,
 ) -> float:
-    P = np.asarray(P, dtype=np.float64)
+    if zero_mode not in {"inf", "raise", "regularize"}:
+        raise ValueError("zero_mode must be 'inf', 'raise', or 'regularize'")
+    P, pi = _prepare_ep(P, pi)
+    total = 0.0
+    for rows, _cols, vals, rev_vals in _edge_blocks(P):
+        total += _edge_entropy_production(
+            pi[rows], vals, rev_vals, zero_mode=zero_mode, eps=eps
+        )
+        if total == float("inf"):
+            break
+    return total
+
+
+def entropy_production_pair(
+    P: object, pi: np.ndarray, *, eps: float = 1e-15
+) -> tuple[float, float]:
+    """Raw (``zero_mode="inf"``) and regularised EP from one pass over the edges."""
+    P, pi = _prepare_ep(P, pi)
+    raw = 0.0
+    regularized = 0.0
+    for rows, _cols, vals, rev_vals in _edge_blocks(P):
+        weight = pi[rows] * vals
+        if raw != float("inf"):
+            raw += _raw_edge_sum(weight, vals, rev_vals)
+        regularized += float(np.sum(weight * np.log((vals + eps) / (rev_vals + eps))))
+    return raw, regularized
+
+
+def _raw_edge_sum(weight: np.ndarray, vals: np.ndarray, rev_vals: np.ndarray) -> float:
+    forward = vals > 0
+    if np.any(forward & (rev_vals == 0)):
+        return float("inf")
+    return float(np.sum(weight[forward] * np.log(vals[forward] / rev_vals[forward])))
+
+
+# Indexed by dx + 2 * dphi + 4 * dr, the coordinates an edge changes.
+MOVE_TYPES = ("idle", "x", "phi", "x+phi", "r", "x+r", "phi+r", "x+phi+r")
+
+
+@dataclass(frozen=True)
+class EntropyProductionBreakdown:
+    """Where the entropy production of one chain comes from.
+
+    ``by_move`` and the per-edge ``contrib`` use the regularised form
+    ``pi_i P_ij log((P_ij + eps) / (P_ji + eps))``, which stays finite on
+    one-way edges; ``irreversible_edges`` counts those edges. ``top`` lists
+    the ``(i, j, contribution)`` of the largest contributors, largest first.
+    ``rows``/``cols``/``contrib`` are ``None`` unless edges were kept.
+    """
+
+    ep_raw: float
+    ep_reg: float
+    by_move: dict[str, float]
+    irreversible_edges: int
+    top: list[tuple[int, int, float]]
+    rows: np.ndarray | None = None
+    cols: np.ndarray | None = None
+    contrib: np.ndarray | None = None
+
+
+def entropy_production_breakdown(
+    P: object,
+    pi: np.ndarray,
+    states: object,
+    *,
+    eps: float = 1e-15,
+    top_k: int = 10,
+    keep_edges: bool = True,
+) -> EntropyProductionBreakdown:
+    """Per-edge and per-move-type EP, plus a top-k of hotspots, in one pass.
+
+    ``states`` is the ``StateSpace`` (or list of ``(x, phi, r)`` tuples) of
+    ``P``; each edge is classified by which coordinates it changes.
+    """
+    if top_k < 0:
+        raise ValueError("top_k must be >= 0")
+    P, pi = _prepare_ep(P, pi)
+    x, phi, r = state_coords(states)
+    if x.shape[0] != P.shape[0]:
+        raise ValueError("states must match P")
+
+    raw = 0.0
+    by_move = np.zeros(len(MOVE_TYPES), dtype=np.float64)
+    irreversible = 0
+    top_rows = np.empty(0, dtype=np.int64)
+    top_cols = np.empty(0, dtype=np.int64)
+    top_vals = np.empty(0, dtype=np.float64)
+    kept: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    for rows, cols, vals, rev_vals in _edge_blocks(P):
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        weight = pi[rows] * vals
+        contrib = weight * np.log((vals + eps) / (rev_vals + eps))
+        if raw != float("inf"):
+            raw += _raw_edge_sum(weight, vals, rev_vals)
+        irreversible += int(np.count_nonzero((vals > 0) & (rev_vals == 0)))
+
+        move = (
+            (x[rows] != x[cols]).astype(np.int64)
+            + 2 * (phi[rows] != phi[cols])
+            + 4 * (r[rows] != r[cols])
+        )
+        by_move += np.bincount(move, weights=contrib, minlength=len(MOVE_TYPES))
+
+        # Streaming top-k: keep only the k largest seen so far.
+        top_rows = np.concatenate([top_rows, rows])
+        top_cols = np.concatenate([top_cols, cols])
+        top_vals = np.concatenate([top_vals, contrib])
+        if top_vals.shape[0] > top_k:
+            keep = np.argpartition(-top_vals, top_k - 1)[:top_k] if top_k else []
+            top_rows, top_cols, top_vals = top_rows[keep], top_cols[keep], top_vals[keep]
+        if keep_edges:
+            kept.append((rows, cols, contrib))
+
+    order = np.argsort(-top_vals, kind="stable")
+    top = [
+        (int(i), int(j), float(v))
+        for i, j, v in zip(top_rows[order], top_cols[order], top_vals[order])
+    ]
+    edges = (
+        tuple(np.concatenate(parts) for parts in zip(*kept))
+        if keep_edges and kept
+        else (None, None, None)
+    )
+    return EntropyProductionBreakdown(
+        ep_raw=raw,
+        ep_reg=float(by_move.sum()),
+        by_move={name: float(value) for name, value in zip(MOVE_TYPES, by_move)},
+        irreversible_edges=irreversible,
+        top=top,
+        rows=edges[0],
+        cols=edges[1],
+        contrib=edges[2],
+    )
+
+
+@dataclass(frozen=True)
+class _TransitionStack:
+    """``k`` transition matrices over one state space.
+
+    Dense stacks keep ``dense`` with shape ``(k, n, n)``; sparse stacks share
+    the CSR ``pattern`` and keep one row of ``data`` per matrix.
+    """
+
+    dense: np.ndarray | None = None
+    pattern: sparse.csr_array | None = None
+    data: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return (self.dense if self.dense is not None else self.data).shape[0]
+
+    @property
+    def n_states(self) -> int:
+        return (self.dense if self.dense is not None else self.pattern).shape[-1]
+
+    def __getitem__(self, k: int) -> np.ndarray | sparse.csr_array:
+        if self.dense is not None:
+            return self.dense[k]
+        P = self.pattern.copy()
+        P.data = self.data[k].copy()
+        P.eliminate_zeros()
+        return P
+
+    def edges(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """``(rows, cols, P_ij, P_ji)`` over the union pattern; values are ``(k, nnz)``."""
+        if self.dense is not None:
+            rows, cols = np.nonzero((self.dense != 0).any(axis=0))
+            return rows, cols, self.dense[:, rows, cols], self.dense[:, cols, rows]
+        rows, pos, found = _reverse_edge_positions(self.pattern)
+        return rows, self.pattern.indices, self.data, np.where(found, self.data[:, pos], 0.0)
+
+    def closed_class_counts(self) -> np.ndarray:
+        """:func:`_closed_class_count` of every chain, from one graph over all of them."""
+        rows, cols, vals, _ = self.edges()
+        n_states = self.n_states
+        chain, edge = np.nonzero(vals > 0)
+        src = chain * n_states + rows[edge]
+        dst = chain * n_states + cols[edge]
+        size = len(self) * n_states
+        graph = sparse.csr_array((np.ones(src.shape[0]), (src, dst)), shape=(size, size))
+        labels, closed = communicating_classes(graph)
+        n_classes = closed.shape[0]
+        owner = np.zeros(n_classes, dtype=np.int64)
+        owner[labels] = np.arange(size) // n_states
+        return np.bincount(owner[closed], minlength=len(self))
+
+
+def _transition_stack(Ps: object) -> _TransitionStack:
+    if isinstance(Ps, np.ndarray):
+        dense = np.asarray(Ps, dtype=np.float64)
+        if dense.ndim != 3 or dense.shape[1] != dense.shape[2]:
+            raise ValueError("a stacked P must have shape (k, n, n)")
+        return _TransitionStack(dense=dense)
+    mats = list(Ps)
+    if not mats:
+        raise ValueError("need at least one transition matrix")
+    if not any(sparse.issparse(P) for P in mats):
+        return _transition_stack(np.stack([np.asarray(P, dtype=np.float64) for P in mats]))
+    if not all(sparse.issparse(P) for P in mats):
+        raise ValueError("cannot mix dense and sparse transition matrices")
+
+    mats = [_as_transition_matrix(P) for P in mats]
+    n_states = mats[0].shape[0]
+    if any(P.shape != mats[0].shape for P in mats):
+        raise ValueError("transition matrices must share one state space")
+    for P in mats:
+        P.sum_duplicates()
+    pattern = mats[0]
+    if all(
+        np.array_equal(P.indptr, pattern.indptr) and np.array_equal(P.indices, pattern.indices)
+        for P in mats[1:]
+    ):
+        data = np.stack([P.data for P in mats])
+        return _TransitionStack(pattern=sparse.csr_array(pattern, copy=True), data=data)
+
+    # Patterns differ: store every matrix on the union pattern, padding with zeros.
+    keys = [
+        np.repeat(np.arange(n_states, dtype=np.int64), np.diff(P.indptr)) * n_states
+        + P.indices
+        for P in mats
+    ]
+    union = np.unique(np.concatenate(keys))
+    data = np.zeros((len(mats), union.shape[0]), dtype=np.float64)
+    for k, (P, key) in enumerate(zip(mats, keys)):
+        data[k, np.searchsorted(union, key)] = P.data
+    pattern = sparse.csr_array(
+        (np.ones(union.shape[0]), (union // n_states, union % n_states)),
+        shape=(n_states, n_states),
+    )
+    return _TransitionStack(pattern=pattern, data=data)
+
+
+def stationary_distribution_batch(
+    Ps: object, *, tol: float = 1e-12, max_iter: int = 500_000
+) -> np.ndarray:
+    """Stationary distributions of a stack of chains, shape ``(k, n)``.
+
+    ``Ps`` is a ``(k, n, n)`` array, a list of dense matrices, or a list of
+    sparse matrices (stored on the union of their patterns, which is free when
+    they share one). Chains with a single closed
+    class are solved together: dense stacks with one batched LAPACK solve,
+    sparse ones through a single block-diagonal LU. The rest (several closed
+    classes, or too large for a direct solve: more than
+    ``_DENSE_DIRECT_MAX_STATES`` dense states or ``_DIRECT_MAX_NNZ`` sparse
+    nonzeros) fall back to :func:`stationary_distribution` one by one.
+    """
+    stack = _transition_stack(Ps)
+    n_states = stack.n_states
+    pis = np.empty((len(stack), n_states), dtype=np.float64)
+
+    if stack.dense is not None:
+        direct = n_states <= _DENSE_DIRECT_MAX_STATES
+    else:
+        direct = stack.pattern.nnz <= _DIRECT_MAX_NNZ
+    if direct:
+        single = stack.closed_class_counts() == 1
+    else:
+        single = np.zeros(len(stack), dtype=bool)
+    for k in np.flatnonzero(~single):
+        pis[k] = stationary_distribution(stack[k], tol=tol, max_iter=max_iter)
+    batched = np.flatnonzero(single)
+    if batched.size == 0:
+        return pis
+
+    if stack.dense is not None:
+        # Same system as ``_normalized_system``, one slice per chain.
+        A = np.swapaxes(stack.dense[batched], 1, 2) - np.eye(n_states)
+        A[:, -1, :] = 1.0
+        sol = np.linalg.solve(A, _unit_last(n_states)[None, :, None])[..., 0]
+    else:
+        sol = _block_diagonal_solve(stack.pattern, stack.data[batched])
+
+    sol = np.maximum(sol, 0.0)
+    totals = sol.sum(axis=1)
+    if np.any(totals <= 0) or not np.all(np.isfinite(totals)):
+        raise ValueError("stationary_distribution_batch encountered nonpositive mass")
+    pis[batched] = sol / totals[:, None]
+    return pis
+
+
+def _block_diagonal_solve(pattern: sparse.csr_array, data: np.ndarray) -> np.ndarray:
+    """Solve the ``_normalized_system`` of every row of ``data`` with one LU."""
+    n_batch, nnz = data.shape
+    n_states = pattern.shape[0]
+    rows = np.repeat(np.arange(n_states, dtype=np.int64), np.diff(pattern.indptr))
+    cols = pattern.indices.astype(np.int64)
+    diag = np.arange(n_states, dtype=np.int64)
+
+    # Rows of P^T - I: edge i -> j lands at (j, i); the last row is replaced by ones.
+    keep = cols != n_states - 1
+    keep_diag = diag != n_states - 1
+    local_rows = np.concatenate([cols[keep], diag[keep_diag], np.full(n_states, n_states - 1)])
+    local_cols = np.concatenate([rows[keep], diag[keep_diag], diag])
+    offsets = (np.arange(n_batch, dtype=np.int64) * n_states)[:, None]
+    vals = np.concatenate(
+        [
+            data[:, keep],
+            np.full((n_batch, n_states - 1), -1.0),
+            np.ones((n_batch, n_states)),
+        ],
+        axis=1,
+    )
+    size = n_batch * n_states
+    A = sparse.csc_array(
+        (vals.ravel(), ((local_rows + offsets).ravel(), (local_cols + offsets).ravel())),
+        shape=(size, size),
+    )
+    b = np.tile(_unit_last(n_states), n_batch)
+    return spla.spsolve(A, b).reshape(n_batch, n_states)
+
+
+def entropy_production_batch(
+    Ps: object, pis: np.ndarray, *, eps: float = 1e-15
+) -> tuple[np.ndarray, np.ndarray]:
+    """Raw and regularised EP of every chain in a stack, as two ``(k,)`` arrays.
+
+    Batched counterpart of :func:`entropy_production_pair`; ``Ps`` takes the
+    same forms as in :func:`stationary_distribution_batch` and ``pis`` has
+    shape ``(k, n)``.
+    """
+    stack = _transition_stack(Ps)
+    pis = np.asarray(pis, dtype=np.float64)
+    if pis.shape != (len(stack), stack.n_states):
+        raise ValueError("pis must have shape (k, n) matching Ps")
+
+    rows, _cols, vals, rev_vals = stack.edges()
+    weight = pis[:, rows] * vals
+    forward = vals > 0
+    one_way = forward & (rev_vals == 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw_terms = np.where(forward & ~one_way, weight * np.log(vals / rev_vals), 0.0)
+        reg_terms = np.where(forward, weight * np.log((vals + eps) / (rev_vals + eps)), 0.0)
+    raw = np.where(one_way.any(axis=1), np.inf, raw_terms.sum(axis=1))
+    return raw, reg_terms.sum(axis=1)
+
+
+def stationary_sensitivity(
+    P: object, dPs: Sequence[object]
+) -> tuple[np.ndarray, np.ndarray]:
+    """``pi`` and its derivatives ``d pi`` along each direction in ``dPs``.
+
+    Differentiating ``pi (I - P) = 0``, ``sum(pi) = 1`` gives
+    ``d_pi (I - P) = pi dP`` with ``sum(d_pi) = 0``, i.e. ``d_pi = pi dP A#``
+    for the group inverse ``A#`` of ``I - P``. All of these are solved with
+    one LU of the normalised system that also yields ``pi``. ``P`` must
+    have a single closed class; each ``dP`` must have zero row sums.
+    """
+    P = _as_transition_matrix(P)
+    if _closed_class_count(P) != 1:
+        raise ValueError("stationary_sensitivity needs a unique stationary distribution")
+    n_states = P.shape[0]
+    lu = spla.splu(_normalized_system(P))
+    pi = np.maximum(lu.solve(_unit_last(n_states)), 0.0)
+    pi /= pi.sum()
+
+    d_pi = np.empty((len(dPs), n_states), dtype=np.float64)
+    for k, dP in enumerate(dPs):
+        dP = _as_transition_matrix(dP)
+        if dP.shape != P.shape:
+            raise ValueError("every dP must match the shape of P")
+        rhs = -np.asarray(pi @ dP, dtype=np.float64)
+        rhs[-1] = 0.0
+        d_pi[k] = lu.solve(rhs)
+    return pi, d_pi
+
+
+def entropy_production_sensitivity(
+    P: object,
+    dPs: Sequence[object],
+    pi: np.ndarray,
+    d_pi: np.ndarray,
+    *,
+    eps: float = 1e-15,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Derivatives of the raw and regularised EP along each direction in ``dPs``.
+
+    Edges that only ``dP`` touches are included, so the regularised
+    derivative is right at parameter values where an edge switches on. The
+    raw derivative is ``nan`` where the raw EP is infinite or an edge leaves
+    zero (``P_ij = 0`` while ``dP_ij != 0``).
+    """
+    P = _as_transition_matrix(P)
+    pi = np.asarray(pi, dtype=np.float64)
+    d_pi = np.asarray(d_pi, dtype=np.float64)
+    if d_pi.shape != (len(dPs), P.shape[0]) or pi.shape != (P.shape[0],):
+        raise ValueError("pi and d_pi must match P and dPs")
+    mats = [P, *dPs]
+    if sparse.issparse(P) or any(sparse.issparse(dP) for dP in dPs):
+        mats = [sparse.csr_array(M) for M in mats]
+    rows, _cols, vals, rev_vals = _transition_stack(mats).edges()
+    p, rev_p = vals[0], rev_vals[0]
+    dp, rev_dp = vals[1:], rev_vals[1:]
+
+    log_reg = np.log((p + eps) / (rev_p + eps))
+    d_reg = (
+        d_pi[:, rows] * p * log_reg
+        + pi[rows] * dp * log_reg
+        + pi[rows] * p * (dp / (p + eps) - rev_dp / (rev_p + eps))
+    ).sum(axis=1)
+
+    forward = p > 0
+    if np.any(forward & (rev_p == 0)) or np.any(~forward & (dp != 0)):
+        return np.full(len(dPs), np.nan), d_reg
+    p, rev_p = p[forward], rev_p[forward]
+    dp, rev_dp = dp[:, forward], rev_dp[:, forward]
+    rows = rows[forward]
+    log_raw = np.log(p / rev_p)
+    d_raw = (
+        d_pi[:, rows] * p * log_raw
+        + pi[rows] * dp * log_raw
+        + pi[rows] * p * (dp / p - rev_dp / rev_p)
+    ).sum(axis=1)
+    return d_raw, d_reg
+
+
+def _prepare_ep(P: object, pi: np.ndarray) -> tuple[object, np.ndarray]:
+    if not _is_operator(P):
+        P = _as_transition_matrix(P)
     pi = np.asarray(pi, dtype=np.float64)
-    if P.ndim != 2 or P.shape[0] != P.shape[1]:
-        raise ValueError("P must be a square matrix")
     if pi.ndim != 1 or pi.shape[0] != P.shape[0]:
         raise ValueError("pi must be a vector matching P")
-    if zero_mode not in {"inf", "raise", "regularize"}:
-        raise ValueError("zero_mode must be 'inf', 'raise', or 'regularize'")
+    return P, pi
+
+
+def _edge_blocks(
+    P: object,
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield ``(rows, cols, P_ij, P_ji)`` over the stored edges ``i -> j`` of ``P``.
+
+    Only the nonzero pattern is visited; no transpose of ``P`` is formed.
+    Operators are walked block by block through ``iter_nonzero``.
+    """
+    if _is_operator(P):
+        if not callable(getattr(P, "iter_nonzero", None)) or not callable(
+            getattr(P, "entries", None)
+        ):
+            raise ValueError("operator P must provide iter_nonzero() and entries()")
+        for rows, cols, vals in P.iter_nonzero():
+            yield rows, cols, vals, P.entries(cols, rows)
+    elif sparse.issparse(P):
+        rows, rev_vals = _reverse_edge_values(P)
+        yield rows, P.indices, P.data, rev_vals
+    else:
+        rows, cols = np.nonzero(P)
+        yield rows, cols, P[rows, cols], P[cols, rows]
+
+
+def _reverse_edge_values(P: sparse.csr_array) -> tuple[np.ndarray, np.ndarray]:
+    """Return the row index of every stored edge and the matching ``P_ji``."""
+    rows, pos, found = _reverse_edge_positions(P)
+    return rows, np.where(found, P.data[pos], 0.0)
+
+
+def _reverse_edge_positions(
+    P: sparse.csr_array,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Row of every stored edge ``i -> j`` and where ``j -> i`` is stored, if at all."""
+    P.sum_duplicates()
+    n_states = P.shape[0]
+    rows = np.repeat(np.arange(n_states, dtype=np.int64), np.diff(P.indptr))
+    cols = P.indices.astype(np.int64)
+    # Canonical CSR is sorted by (row, col), so the flat keys are sorted too.
+    keys = rows * n_states + cols
+    rev_keys = cols * n_states + rows
+    pos = np.minimum(np.searchsorted(keys, rev_keys), keys.shape[0] - 1)
+    found = keys[pos] == rev_keys
+    return rows, pos, found
+
 
-    mask = P > 0
+def _edge_entropy_production(
+    pi_rows: np.ndarray,
+    vals: np.ndarray,
+    rev_vals: np.ndarray,
+    *,
+    zero_mode: str,
+    eps: float,
+) -> float:
+    """EP summed over stored edges ``i -> j`` given ``pi_i``, ``P_ij`` and ``P_ji``."""
+    forward = vals > 0
     if zero_mode in {"inf", "raise"}:
-        reverse_zero = mask & (P.T == 0)
-        if np.any(reverse_zero):
+        if np.any(forward & (rev_vals == 0)):
             if zero_mode == "inf":
                 return float("inf")
             raise ValueError(
                 "absolute irreversibility detected: P_ij>0 and P_ji=0"
             )
-
-        with np.errstate(divide="ignore", invalid="ignore"):
-            ratio = np.divide(P, P.T, out=np.ones_like(P), where=mask)
-            log_ratio = np.log(ratio, out=np.zeros_like(P), where=mask)
-        contrib = (pi[:, None] * P) * log_ratio
-        return float(np.sum(contrib))
-
-    with np.errstate(divide="ignore", invalid="ignore"):
-        ratio = (P + eps) / (P.T + eps)
-        log_ratio = np.log(ratio)
-    contrib = (pi[:, None] * P) * log_ratio
-    return float(np.sum(contrib))
+        log_ratio = np.zeros_like(vals)
+        log_ratio[forward] = np.log(vals[forward] / rev_vals[forward])
+    else:
+        log_ratio = np.log((vals + eps) / (rev_vals + eps))
+    return float(np.sum(pi_rows * vals * log_ratio))
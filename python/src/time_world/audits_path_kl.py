@@ -1,9 +1,14 @@
 from __future__ import annotations
 
-from collections import defaultdict
-from typing import Callable, Iterable
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+from functools import cached_property, reduce
+from typing import Callable, Iterable, Iterator
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from time_world.sampling import index_dtype
 
 
 def apply_lens(
@@ -21,32 +26,566 @@ def apply_lens(
             y_states.append(key)
         map_z_to_y[i] = index[key]
 
-    return y_states, map_z_to_y
+    return y_states, map_z_to_y.astype(index_dtype(len(y_states)))
 
 
 def project_traj(traj_z: np.ndarray, map_z_to_y: np.ndarray) -> np.ndarray:
-    return map_z_to_y[np.asarray(traj_z, dtype=int)]
+    return map_z_to_y[np.asarray(traj_z)]
 
 
 def reverse_path_tuple(w: tuple[int, ...]) -> tuple[int, ...]:
     return tuple(reversed(w))
 
 
-def count_paths(traj: np.ndarray, T: int) -> tuple[dict[tuple[int, ...], int], int]:
-    if T < 1:
+@dataclass(frozen=True, eq=False)
+class PathCounts(Mapping):
+    """Histogram of the length-``T + 1`` windows of a trajectory.
+
+    ``paths`` holds the distinct windows as rows in lexicographic order,
+    ``counts`` how often each occurred and ``total`` the number of windows.
+    Lookup, iteration and ``==`` behave like the ``{path tuple: count}`` dict
+    ``count_paths`` used to return.
+    """
+
+    paths: np.ndarray
+    counts: np.ndarray
+    total: int
+
+    @classmethod
+    def from_mapping(cls, counts: Mapping, total: int) -> PathCounts:
+        if isinstance(counts, PathCounts):
+            return counts
+        if not counts:
+            raise ValueError("counts must be non-empty")
+        rows = np.asarray(list(counts), dtype=np.int64)
+        paths, inverse = np.unique(rows, axis=0, return_inverse=True)
+        values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        merged = np.bincount(inverse.reshape(-1), weights=values, minlength=paths.shape[0])
+        return cls(paths=paths, counts=merged.astype(np.int64), total=int(total))
+
+    @property
+    def T(self) -> int:
+        return int(self.paths.shape[1] - 1)
+
+    @cached_property
+    def _keys(self) -> np.ndarray | None:
+        return _encode_paths(self.paths, _path_base(self.paths))
+
+    def find(self, rows: np.ndarray) -> np.ndarray:
+        """Position of each row of ``rows`` in ``paths``, or -1 where absent."""
+        rows = np.asarray(rows).reshape(-1, self.paths.shape[1])
+        found = np.full(rows.shape[0], -1, dtype=np.int64)
+        if self._keys is None:
+            both = np.concatenate([self.paths.astype(np.int64), rows.astype(np.int64)])
+            _, ids = np.unique(both, axis=0, return_inverse=True)
+            ids = ids.reshape(-1)
+            position = np.full(both.shape[0], -1, dtype=np.int64)
+            position[ids[: len(self)]] = np.arange(len(self))
+            return position[ids[len(self) :]]
+        base = _path_base(self.paths)
+        valid = np.all((rows >= 0) & (rows < base), axis=1)
+        keys = _encode_paths(rows[valid], base)
+        pos = np.minimum(np.searchsorted(self._keys, keys), self._keys.shape[0] - 1)
+        found[np.flatnonzero(valid)] = np.where(self._keys[pos] == keys, pos, -1)
+        return found
+
+    def __len__(self) -> int:
+        return int(self.paths.shape[0])
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PathCounts):
+            return np.array_equal(self.paths, other.paths) and np.array_equal(
+                self.counts, other.counts
+            )
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def to_dict(self) -> dict[tuple[int, ...], int]:
+        return dict(zip(self, self.counts.tolist()))
+
+    def __iter__(self) -> Iterator[tuple[int, ...]]:
+        return map(tuple, self.paths.tolist())
+
+    def __getitem__(self, path: tuple[int, ...]) -> int:
+        row = np.asarray(path)
+        if row.shape != (self.paths.shape[1],) or row.dtype.kind not in "iu":
+            raise KeyError(path)
+        hit = int(self.find(row)[0])
+        if hit < 0:
+            raise KeyError(path)
+        return int(self.counts[hit])
+
+
+def _path_base(paths: np.ndarray) -> int:
+    return int(paths.max()) + 1 if paths.size else 1
+
+
+def _encode_paths(paths: np.ndarray, base: int) -> np.ndarray | None:
+    """Big-endian base-``base`` code of every row, or ``None`` if it overflows int64.
+
+    Codes sort like the rows, so sorted paths have sorted codes.
+    """
+    if base ** paths.shape[1] > 2**63 or (paths.size and paths.min() < 0):
+        return None
+    codes = np.zeros(paths.shape[0], dtype=np.int64)
+    for column in range(paths.shape[1]):
+        codes *= base
+        codes += paths[:, column]
+    return codes
+
+
+def _decode_paths(codes: np.ndarray, base: int, width: int) -> np.ndarray:
+    paths = np.empty((codes.shape[0], width), dtype=np.int64)
+    rest = codes.copy()
+    for column in range(width - 1, -1, -1):
+        rest, paths[:, column] = np.divmod(rest, base)
+    return paths
+
+
+def count_paths(traj: np.ndarray, T: int) -> tuple[PathCounts, int]:
+    """Count the length-``T + 1`` windows of ``traj``.
+
+    Windows are encoded as mixed-radix integers and counted with one sort;
+    when ``n_states ** (T + 1)`` overflows int64, :func:`count_paths_multi`
+    ranks them instead.
+    """
+    traj = _as_traj(traj, [T])
+    total = int(traj.shape[0] - T)
+    if traj.min() < 0:
+        return count_paths_multi(traj, [T])[T], total
+    windows = sliding_window_view(traj, T + 1)
+    base = _path_base(traj)
+    codes = _encode_paths(windows, base)
+    if codes is None:
+        return count_paths_multi(traj, [T])[T], total
+    # A plain sort plus run lengths beats np.unique(return_index=True), and
+    # the paths decode straight from the distinct codes.
+    codes.sort()
+    codes, counts = _runs(codes)
+    paths = _decode_paths(codes, base, T + 1).astype(traj.dtype)
+    counts = PathCounts(paths=paths, counts=counts.astype(np.int64), total=total)
+    return counts, total
+
+
+def count_paths_multi(traj: np.ndarray, Ts: Iterable[int]) -> dict[int, PathCounts]:
+    """:func:`count_paths` for every horizon in ``Ts`` from a single sort.
+
+    The longest horizon whose windows fit an int64 code is counted once;
+    shorter horizons are its code prefixes, which stay sorted, plus the few
+    windows at the end of ``traj`` that no longer window covers. Horizons too
+    long to encode refine the per-position ranks of the previous length one
+    symbol at a time, so no path rows are ever compared.
+    """
+    Ts = sorted({int(T) for T in Ts})
+    traj = _as_traj(traj, Ts)
+    low = int(traj.min())
+    if low < 0:
+        # Codes need nonnegative symbols; shifting keeps the lexicographic order.
+        shifted = count_paths_multi(traj.astype(np.int64) - low, Ts)
+        return {
+            T: replace(counts, paths=counts.paths + low) for T, counts in shifted.items()
+        }
+    n = traj.shape[0]
+    base = _path_base(traj)
+    fits = [T for T in Ts if base ** (T + 1) <= 2**63]
+    out: dict[int, PathCounts] = {}
+
+    if fits:
+        longest, _ = count_paths(traj, fits[-1])
+        out[fits[-1]] = longest
+        codes = _encode_paths(longest.paths, base)
+        for T in fits[:-1]:
+            drop = fits[-1] - T
+            keys, starts = _runs(codes // base**drop, return_starts=True)
+            counts = np.add.reduceat(longest.counts, starts)
+            # Merge the last ``drop`` windows into the sorted prefix counts.
+            tail, tail_counts = np.unique(
+                _encode_paths(sliding_window_view(traj[n - fits[-1] :], T + 1), base),
+                return_counts=True,
+            )
+            pos = np.searchsorted(keys, tail)
+            hit = keys[np.minimum(pos, keys.shape[0] - 1)] == tail
+            counts[pos[hit]] += tail_counts[hit]
+            keys = np.insert(keys, pos[~hit], tail[~hit])
+            counts = np.insert(counts, pos[~hit], tail_counts[~hit])
+            paths = _decode_paths(keys, base, T + 1).astype(traj.dtype)
+            out[T] = PathCounts(paths=paths, counts=counts, total=n - T)
+
+    longer = [T for T in Ts if T not in out]
+    if longer:
+        # Rank every window of the longest encodable length, then extend one
+        # symbol per step: (rank, next symbol) pairs stay far inside int64.
+        length = max(L for L in range(longer[-1] + 1) if base ** (L + 1) <= 2**63)
+        codes = _encode_paths(sliding_window_view(traj, length + 1), base)
+        ranks = np.searchsorted(np.unique(codes), codes)
+        for L in range(length + 1, longer[-1] + 1):
+            pairs = ranks[: n - L] * base + traj[L:]
+            _, first, ranks, counts = np.unique(
+                pairs, return_index=True, return_inverse=True, return_counts=True
+            )
+            ranks = ranks.reshape(-1)
+            if L in longer:
+                paths = sliding_window_view(traj, L + 1)[first]
+                out[L] = PathCounts(paths=paths, counts=counts.astype(np.int64), total=n - L)
+    return out
+
+
+def _as_traj(traj: np.ndarray, Ts: list[int]) -> np.ndarray:
+    if not Ts or min(Ts) < 1:
         raise ValueError("T must be >= 1")
-    traj = np.asarray(traj, dtype=int)
+    traj = np.asarray(traj)
     if traj.ndim != 1:
         raise ValueError("traj must be a 1D array")
-    total = int(traj.shape[0] - T)
-    if total <= 0:
+    if traj.dtype.kind not in "iu":
+        traj = traj.astype(int)
+    if traj.shape[0] - max(Ts) <= 0:
         raise ValueError("traj must have length > T")
-
-    counts: dict[tuple[int, ...], int] = defaultdict(int)
-    for i in range(total):
-        window = tuple(traj[i : i + T + 1].tolist())
-        counts[window] += 1
-    return dict(counts), total
+    return traj
+
+
+def _runs(
+    sorted_codes: np.ndarray, *, return_starts: bool = False
+) -> tuple[np.ndarray, np.ndarray]:
+    """Distinct values of a sorted array with their run lengths (or run starts)."""
+    starts = np.flatnonzero(
+        np.concatenate([[True], sorted_codes[1:] != sorted_codes[:-1]])
+    )
+    if return_starts:
+        return sorted_codes[starts], starts
+    return sorted_codes[starts], np.diff(np.append(starts, sorted_codes.shape[0]))
+
+
+def _row_keys(rows: np.ndarray) -> list[np.ndarray]:
+    """int64 codes of consecutive column blocks; comparing them in order compares rows."""
+    if rows.size and rows.min() < 0:
+        rows = rows.astype(np.int64) - rows.min()
+    # All-zero rows have base 1; any base >= 2 still encodes them.
+    base = max(_path_base(rows), 2)
+    width = 1
+    while width < rows.shape[1] and base ** (width + 1) <= 2**63:
+        width += 1
+    return [
+        _encode_paths(rows[:, start : start + width], base)
+        for start in range(0, rows.shape[1], width)
+    ]
+
+
+def _sorted_runs(rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Stable lexicographic order of ``rows`` and the start of each run of equal rows."""
+    keys = _row_keys(rows)
+    order = np.lexsort(keys[::-1])
+    change = np.zeros(rows.shape[0], dtype=bool)
+    change[:1] = True
+    for key in keys:
+        key = key[order]
+        change[1:] |= key[1:] != key[:-1]
+    return order, np.flatnonzero(change)
+
+
+def _group_rows(rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """First index of each distinct row (in lexicographic order) and every row's group."""
+    order, starts = _sorted_runs(rows)
+    groups = np.empty(rows.shape[0], dtype=np.int64)
+    groups[order] = np.repeat(
+        np.arange(starts.shape[0]), np.diff(np.append(starts, rows.shape[0]))
+    )
+    return order[starts], groups
+
+
+def _sum_counts(parts: list[tuple[PathCounts, int]], total: int) -> PathCounts:
+    """``sum(sign * counts)`` over ``(counts, sign)`` pairs, dropping paths that cancel."""
+    paths = np.concatenate([counts.paths for counts, _ in parts])
+    weights = np.concatenate([sign * counts.counts for counts, sign in parts])
+    # Each part is already sorted, and the stable sort merges sorted runs
+    # in close to linear time.
+    order, starts = _sorted_runs(paths)
+    summed = np.add.reduceat(weights[order], starts) if starts.size else weights
+    if np.any(summed < 0):
+        raise ValueError("path counts cannot become negative")
+    keep = summed > 0
+    return PathCounts(
+        paths=paths[order[starts[keep]]], counts=summed[keep], total=int(total)
+    )
+
+
+@dataclass(frozen=True, eq=False)
+class MergeablePathCounts:
+    """Exact window counts of one trajectory segment, mergeable with its neighbours.
+
+    ``head`` and ``tail`` hold the first and last ``max(Ts)`` states (the whole
+    segment if it is shorter), which is all :meth:`merge` needs to count the
+    windows spanning the junction. Merging is associative, so segments counted
+    in separate processes and merged left to right, in any grouping, give the
+    counts of :func:`count_paths_multi` on the concatenated trajectory.
+    """
+
+    Ts: tuple[int, ...]
+    by_T: dict[int, PathCounts]
+    head: np.ndarray
+    tail: np.ndarray
+    length: int
+
+    @classmethod
+    def from_traj(cls, traj: np.ndarray, Ts: Iterable[int]) -> MergeablePathCounts:
+        Ts = tuple(sorted({int(T) for T in Ts}))
+        if not Ts or Ts[0] < 1:
+            raise ValueError("T must be >= 1")
+        traj = np.asarray(traj)
+        if traj.ndim != 1 or traj.shape[0] == 0:
+            raise ValueError("traj must be a non-empty 1D array")
+        if traj.dtype.kind not in "iu":
+            traj = traj.astype(int)
+        n = traj.shape[0]
+        fits = [T for T in Ts if n > T]
+        by_T = count_paths_multi(traj, fits) if fits else {}
+        keep = Ts[-1]
+        return cls(Ts=Ts, by_T=by_T, head=traj[:keep].copy(), tail=traj[-keep:].copy(), length=n)
+
+    def counts(self, T: int) -> PathCounts:
+        if int(T) not in self.Ts:
+            raise KeyError(T)
+        if int(T) not in self.by_T:
+            raise ValueError(f"no complete window of length {int(T) + 1} yet")
+        return self.by_T[int(T)]
+
+    def merge(self, other: MergeablePathCounts) -> MergeablePathCounts:
+        """Counts of this segment followed directly by ``other``."""
+        if other.Ts != self.Ts:
+            raise ValueError("cannot merge counts for different horizons")
+        length = self.length + other.length
+        by_T = {}
+        for T in self.Ts:
+            parts = [(part.by_T[T], 1) for part in (self, other) if T in part.by_T]
+            # Every window of tail + head crosses the junction: neither side
+            # holds more than T states.
+            junction = np.concatenate([self.tail[-T:], other.head[:T]])
+            if junction.shape[0] > T:
+                parts.append((count_paths(junction, T)[0], 1))
+            if parts:
+                by_T[T] = _sum_counts(parts, length - T)
+        keep = self.Ts[-1]
+        return MergeablePathCounts(
+            Ts=self.Ts,
+            by_T=by_T,
+            head=np.concatenate([self.head, other.head])[:keep],
+            tail=np.concatenate([self.tail, other.tail])[-keep:],
+            length=length,
+        )
+
+
+def merge_path_counts(parts: Iterable[MergeablePathCounts]) -> MergeablePathCounts:
+    """Merge consecutive segments in trajectory order."""
+    parts = list(parts)
+    if not parts:
+        raise ValueError("parts must be non-empty")
+    return reduce(lambda left, right: left.merge(right), parts)
+
+
+@dataclass(frozen=True, eq=False)
+class PathCountSketch:
+    """Bounded-memory, mergeable count-min sketch of the length-``T + 1`` windows.
+
+    Windows are hashed as polynomials in wrapping uint64 arithmetic, so
+    hashing a segment costs O(length) for any ``T``. ``table`` never
+    underestimates a count and, with probability ``1 - exp(-depth)``,
+    overestimates it by at most ``e * total / width``. Up to ``top_k``
+    candidate heavy hitters are kept with their paths; candidates of merged
+    segments compete on their merged estimates, so a path that is frequent
+    overall but never locally frequent can be missed. ``head`` and ``tail``
+    play the same role as in :class:`MergeablePathCounts`, and sketches built
+    with the same settings merge to exactly the sketch of the whole trajectory.
+    """
+
+    T: int
+    table: np.ndarray
+    heavy_paths: np.ndarray
+    heavy_keys: np.ndarray
+    head: np.ndarray
+    tail: np.ndarray
+    length: int
+    top_k: int
+    seed: int
+
+    @classmethod
+    def from_traj(
+        cls,
+        traj: np.ndarray,
+        T: int,
+        *,
+        width: int = 1 << 16,
+        depth: int = 4,
+        top_k: int = 256,
+        seed: int = 0,
+    ) -> PathCountSketch:
+        T = int(T)
+        if T < 1:
+            raise ValueError("T must be >= 1")
+        if width < 2 or width & (width - 1):
+            raise ValueError("width must be a power of two >= 2")
+        if depth < 1 or top_k < 0:
+            raise ValueError("depth must be >= 1 and top_k >= 0")
+        traj = np.asarray(traj)
+        if traj.ndim != 1 or traj.shape[0] == 0:
+            raise ValueError("traj must be a non-empty 1D array")
+        if traj.dtype.kind not in "iu":
+            traj = traj.astype(int)
+        empty = cls(
+            T=T,
+            table=np.zeros((depth, width), dtype=np.int64),
+            heavy_paths=np.empty((0, T + 1), dtype=traj.dtype),
+            heavy_keys=np.empty((0, depth), dtype=np.uint64),
+            head=traj[:T].copy(),
+            tail=traj[-T:].copy(),
+            length=int(traj.shape[0]),
+            top_k=int(top_k),
+            seed=int(seed),
+        )
+        return empty._add_windows(traj, empty.table, empty.heavy_paths, empty.heavy_keys)
+
+    @property
+    def width(self) -> int:
+        return int(self.table.shape[1])
+
+    @property
+    def depth(self) -> int:
+        return int(self.table.shape[0])
+
+    @property
+    def total(self) -> int:
+        return max(self.length - self.T, 0)
+
+    @cached_property
+    def _hash_params(self) -> tuple[np.ndarray, np.ndarray]:
+        rng = np.random.default_rng(self.seed)
+        odd = rng.integers(0, 2**63, size=(2, self.depth), dtype=np.uint64) * np.uint64(2)
+        multipliers, mixers = odd + np.uint64(1)
+        return multipliers, mixers
+
+    def _buckets(self, keys: np.ndarray) -> np.ndarray:
+        """Column of every ``(..., depth)`` hash in each row of ``table``."""
+        _, mixers = self._hash_params
+        shift = np.uint64(64 - (self.width.bit_length() - 1))
+        return ((keys * mixers) >> shift).astype(np.intp)
+
+    def _window_keys(self, traj: np.ndarray) -> np.ndarray:
+        """``(n_windows, depth)`` hashes ``sum_j x[t + j] * m ** (T - j)`` mod 2**64."""
+        multipliers, _ = self._hash_params
+        n = traj.shape[0]
+        x = traj.astype(np.uint64) + np.uint64(1)
+        keys = np.empty((n - self.T, self.depth), dtype=np.uint64)
+        for d, m in enumerate(multipliers):
+            # Odd multipliers are invertible mod 2**64, so the window hash is
+            # m ** (t + T + 1) * (S[t + T + 1] - S[t]) for prefix sums S of
+            # x[k] * m ** -(k + 1); no pass over T is needed.
+            inverse = _inverse_mod_2_64(int(m))
+            powers = np.cumprod(np.full(n + 1, m, dtype=np.uint64))
+            inverse_powers = np.cumprod(np.full(n, inverse, dtype=np.uint64))
+            prefix = np.concatenate([[np.uint64(0)], np.cumsum(x * inverse_powers)])
+            keys[:, d] = powers[self.T : n] * (prefix[self.T + 1 :] - prefix[: n - self.T])
+        return keys
+
+    def _row_keys(self, rows: np.ndarray) -> np.ndarray:
+        multipliers, _ = self._hash_params
+        keys = np.zeros((rows.shape[0], self.depth), dtype=np.uint64)
+        for column in rows.T.astype(np.uint64):
+            keys = keys * multipliers + (column + np.uint64(1))[:, None]
+        return keys
+
+    def _add_windows(
+        self,
+        traj: np.ndarray,
+        table: np.ndarray,
+        heavy_paths: np.ndarray,
+        heavy_keys: np.ndarray,
+        **changes: object,
+    ) -> PathCountSketch:
+        if traj.shape[0] > self.T:
+            keys = self._window_keys(traj)
+            buckets = self._buckets(keys)
+            table = table + np.stack(
+                [np.bincount(buckets[:, d], minlength=self.width) for d in range(self.depth)]
+            )
+            # Locally frequent windows become candidates, identified by their
+            # first hash.
+            _, first, local = np.unique(keys[:, 0], return_index=True, return_counts=True)
+            top = first[np.argsort(-local, kind="stable")[: self.top_k]]
+            windows = sliding_window_view(traj, self.T + 1)
+            heavy_paths = np.concatenate([heavy_paths, windows[top]])
+            heavy_keys = np.concatenate([heavy_keys, keys[top]])
+        _, first = np.unique(heavy_keys[:, 0], return_index=True)
+        heavy_paths, heavy_keys = heavy_paths[first], heavy_keys[first]
+        keep = np.argsort(-self._estimate_keys(table, heavy_keys), kind="stable")[: self.top_k]
+        return replace(
+            self,
+            table=table,
+            heavy_paths=heavy_paths[keep],
+            heavy_keys=heavy_keys[keep],
+            **changes,
+        )
+
+    def _estimate_keys(self, table: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        return table[np.arange(self.depth), self._buckets(keys)].min(axis=1)
+
+    def merge(self, other: PathCountSketch) -> PathCountSketch:
+        """Sketch of this segment followed directly by ``other``."""
+        settings = (self.T, self.width, self.depth, self.top_k, self.seed)
+        if settings != (other.T, other.width, other.depth, other.top_k, other.seed):
+            raise ValueError("cannot merge sketches built with different settings")
+        junction = np.concatenate([self.tail, other.head])
+        return self._add_windows(
+            junction,
+            self.table + other.table,
+            np.concatenate([self.heavy_paths, other.heavy_paths]),
+            np.concatenate([self.heavy_keys, other.heavy_keys]),
+            head=np.concatenate([self.head, other.head])[: self.T],
+            tail=np.concatenate([self.tail, other.tail])[-self.T :],
+            length=self.length + other.length,
+        )
+
+    def estimate(self, rows: np.ndarray) -> np.ndarray:
+        """Upper-bound count estimate for every path in ``rows``."""
+        rows = np.asarray(rows).reshape(-1, self.T + 1)
+        if rows.size and rows.min() < 0:
+            raise ValueError("paths must be nonnegative")
+        return self._estimate_keys(self.table, self._row_keys(rows))
+
+    def heavy_hitters(self) -> PathCounts:
+        """The tracked candidates with their estimated counts."""
+        if self.total == 0:
+            raise ValueError(f"no complete window of length {self.T + 1} yet")
+        order, _ = _sorted_runs(self.heavy_paths)
+        counts = self._estimate_keys(self.table, self.heavy_keys)
+        return PathCounts(
+            paths=self.heavy_paths[order], counts=counts[order], total=self.total
+        )
+
+
+def _inverse_mod_2_64(m: int) -> int:
+    inverse = m
+    # Newton's iteration doubles the number of correct low bits each step.
+    for _ in range(6):
+        inverse = inverse * (2 - m * inverse) % 2**64
+    return inverse
+
+
+def _support_counts(
+    counts: PathCounts,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Paths seen forward or reversed, with the counts of each and of its reverse."""
+    paths = counts.paths
+    both = np.concatenate([paths, paths[:, ::-1]])
+    first, groups = _group_rows(both)
+    c_w = np.zeros(first.shape[0], dtype=np.int64)
+    c_rev = np.zeros(first.shape[0], dtype=np.int64)
+    # Row i is path i and row n + i its reverse, so the reverse of the
+    # support path in group groups[n + i] is path i.
+    n_paths = paths.shape[0]
+    c_w[groups[:n_paths]] = counts.counts
+    c_rev[groups[n_paths:]] = counts.counts
+    return both[first], c_w, c_rev
 
 
 def estimate_sigma_T_micro(
@@ -55,23 +594,7 @@ def estimate_sigma_T_micro(
     *,
     alpha: float,
 ) -> float:
-    support = _support_with_reverse(counts)
-    k = len(support)
-    alpha_per = alpha / k if k > 0 else 0.0
-    denom = total + alpha
-    if denom <= 0:
-        raise ValueError("total + alpha must be positive")
-
-    sigma = 0.0
-    for w in support:
-        c_w = counts.get(w, 0)
-        c_rev = counts.get(reverse_path_tuple(w), 0)
-        p_w = (c_w + alpha_per) / denom
-        q_w = (c_rev + alpha_per) / denom
-        if p_w == 0:
-            continue
-        sigma += p_w * np.log(p_w / q_w)
-    return float(sigma)
+    return _sigmas_from_support(_smoothed_support(counts, total, alpha), {})[0]
 
 
 def estimate_sigma_T_macro_from_micro(
@@ -81,35 +604,168 @@ def estimate_sigma_T_macro_from_micro(
     *,
     alpha: float,
 ) -> float:
-    support = _support_with_reverse(counts)
-    k = len(support)
-    alpha_per = alpha / k if k > 0 else 0.0
-    denom = total + alpha
-    if denom <= 0:
-        raise ValueError("total + alpha must be positive")
+    return estimate_sigma_T_lenses(counts, total, {"lens": map_z_to_y}, alpha=alpha)["lens"]
 
-    p_y: dict[tuple[int, ...], float] = defaultdict(float)
-    q_y: dict[tuple[int, ...], float] = defaultdict(float)
 
-    for w in support:
-        c_w = counts.get(w, 0)
-        c_rev = counts.get(reverse_path_tuple(w), 0)
-        p_w = (c_w + alpha_per) / denom
-        q_w = (c_rev + alpha_per) / denom
+def estimate_sigma_T_lenses(
+    counts: Mapping[tuple[int, ...], int],
+    total: int,
+    lens_maps: dict[str, np.ndarray],
+    *,
+    alpha: float,
+) -> dict[str, float]:
+    """Macro path KL of every lens in ``lens_maps`` from one smoothed micro support."""
+    return _sigmas_from_support(_smoothed_support(counts, total, alpha), lens_maps)[1]
 
-        y_path = tuple(map_z_to_y[list(w)].tolist())
-        p_y[y_path] += p_w
-        q_y[y_path] += q_w
 
-    sigma = 0.0
-    for y_path, p_val in p_y.items():
-        q_val = q_y.get(y_path, 0.0)
-        if p_val == 0:
+def _sigmas_from_support(
+    smoothed: tuple[np.ndarray, np.ndarray, np.ndarray], lens_maps: dict[str, np.ndarray]
+) -> tuple[float, dict[str, float]]:
+    support, p_w, q_w = smoothed
+    seen = p_w > 0
+    micro = float(np.sum(p_w[seen] * np.log(p_w[seen] / q_w[seen])))
+    lenses = {
+        name: _lens_sigma(support, p_w, q_w, mapping) for name, mapping in lens_maps.items()
+    }
+    return micro, lenses
+
+
+def _lens_sigma(
+    support: np.ndarray, p_w: np.ndarray, q_w: np.ndarray, map_z_to_y: np.ndarray
+) -> float:
+    # Project the whole support at once, then sum p and q over equal macro paths.
+    _, groups = _group_rows(np.asarray(map_z_to_y)[support])
+    p_y = np.bincount(groups, weights=p_w)
+    q_y = np.bincount(groups, weights=q_w)
+
+    seen = p_y > 0
+    if np.any(seen & (q_y == 0)):
+        return float("inf")
+    return float(np.sum(p_y[seen] * np.log(p_y[seen] / q_y[seen])))
+
+
+class PathKLEstimator:
+    """Path KL for several horizons and lenses, fed one trajectory chunk at a time.
+
+    After any sequence of :meth:`update` calls the counts equal
+    :func:`count_paths_multi` on the concatenated chunks (minus the first
+    ``burn_in`` states): each chunk is merged in as a
+    :class:`MergeablePathCounts`, so windows spanning a chunk boundary are
+    counted exactly once. Memory is bounded by the number of distinct paths,
+    not the trajectory length.
+    """
+
+    def __init__(
+        self,
+        Ts: Iterable[int],
+        lens_maps: dict[str, np.ndarray] | None = None,
+        *,
+        alpha: float,
+        burn_in: int = 0,
+    ) -> None:
+        self.Ts = sorted({int(T) for T in Ts})
+        if not self.Ts or self.Ts[0] < 1:
+            raise ValueError("T must be >= 1")
+        if burn_in < 0:
+            raise ValueError("burn_in must be >= 0")
+        self.lens_maps = dict(lens_maps or {})
+        self.alpha = alpha
+        self._skip = int(burn_in)
+        self._merged: MergeablePathCounts | None = None
+
+    @property
+    def n_seen(self) -> int:
+        return 0 if self._merged is None else self._merged.length
+
+    @property
+    def ready(self) -> bool:
+        """Whether every horizon has at least one window."""
+        return self.n_seen > self.Ts[-1]
+
+    def update(self, chunk: np.ndarray) -> None:
+        chunk = np.asarray(chunk)
+        if chunk.ndim != 1:
+            raise ValueError("chunk must be a 1D array")
+        if self._skip:
+            dropped = min(self._skip, chunk.shape[0])
+            chunk = chunk[dropped:]
+            self._skip -= dropped
+        if chunk.shape[0] == 0:
+            return
+        part = MergeablePathCounts.from_traj(chunk, self.Ts)
+        self._merged = part if self._merged is None else self._merged.merge(part)
+
+    def counts(self, T: int) -> PathCounts:
+        if self._merged is None:
+            if int(T) not in self.Ts:
+                raise KeyError(T)
+            raise ValueError(f"no complete window of length {int(T) + 1} yet")
+        return self._merged.counts(T)
+
+    def estimate(self) -> dict[int, dict[str, object]]:
+        """Current estimates, shaped like :func:`estimate_sigma_Ts_for_lenses`."""
+        return {T: _sigma_entry(self.counts(T), self.lens_maps, self.alpha) for T in self.Ts}
+
+
+def stream_sigma_Ts_for_lenses(
+    chunks: Iterable[np.ndarray],
+    Ts: Iterable[int],
+    lens_maps: dict[str, np.ndarray],
+    *,
+    alpha: float,
+    burn_in: int = 0,
+    rtol: float | None = None,
+    check_every: int = 1,
+) -> tuple[dict[int, dict[str, object]], dict]:
+    """Feed ``chunks`` to a :class:`PathKLEstimator`, optionally stopping early.
+
+    With ``rtol`` set, the estimate is refreshed every ``check_every`` chunks
+    and the stream stops once no micro or lens sigma moved by more than
+    ``rtol`` (relative) since the previous refresh.
+    """
+    if check_every < 1:
+        raise ValueError("check_every must be >= 1")
+    estimator = PathKLEstimator(Ts, lens_maps, alpha=alpha, burn_in=burn_in)
+    previous = None
+    stopped_early = False
+    n_chunks = 0
+    for chunk in chunks:
+        estimator.update(chunk)
+        n_chunks += 1
+        if rtol is None or n_chunks % check_every or not estimator.ready:
             continue
-        if q_val == 0:
-            return float("inf")
-        sigma += p_val * np.log(p_val / q_val)
-    return float(sigma)
+        current = estimator.estimate()
+        if previous is not None and _max_relative_change(previous, current) <= rtol:
+            stopped_early = True
+            break
+        previous = current
+    info = {"states": estimator.n_seen, "chunks": n_chunks, "stopped_early": stopped_early}
+    return estimator.estimate(), info
+
+
+def _max_relative_change(
+    previous: dict[int, dict[str, object]], current: dict[int, dict[str, object]]
+) -> float:
+    change = 0.0
+    for T, entry in current.items():
+        pairs = [(previous[T]["micro"], entry["micro"])]
+        pairs += [(previous[T]["lenses"][name], value) for name, value in entry["lenses"].items()]
+        for old, new in pairs:
+            if old == new:
+                continue
+            if not (np.isfinite(old) and np.isfinite(new)):
+                return float("inf")
+            change = max(change, abs(new - old) / max(abs(old), abs(new)))
+    return change
+
+
+def _sigma_entry(
+    counts: PathCounts, lens_maps: dict[str, np.ndarray], alpha: float
+) -> dict[str, object]:
+    micro, lenses = _sigmas_from_support(
+        _smoothed_support(counts, counts.total, alpha), lens_maps
+    )
+    return {"micro": micro, "lenses": lenses}
 
 
 def estimate_sigma_Ts_for_lenses(
@@ -120,16 +776,10 @@ def estimate_sigma_Ts_for_lenses(
     alpha: float,
 ) -> dict[int, dict[str, object]]:
     results: dict[int, dict[str, object]] = {}
+    Ts = [int(T) for T in Ts]
+    by_T = count_paths_multi(traj_z, Ts)
     for T in Ts:
-        counts, total = count_paths(traj_z, T)
-        micro_sigma = estimate_sigma_T_micro(counts, total, alpha=alpha)
-        lens_sigmas = {
-            name: estimate_sigma_T_macro_from_micro(
-                counts, total, mapping, alpha=alpha
-            )
-            for name, mapping in lens_maps.items()
-        }
-        results[int(T)] = {"micro": micro_sigma, "lenses": lens_sigmas}
+        results[T] = _sigma_entry(by_T[T], lens_maps, alpha)
     return results
 
 
@@ -147,11 +797,14 @@ def lens_identity(state: tuple[int, int, int]) -> tuple[int, int, int]:
     return state
 
 
-def _support_with_reverse(
-    counts: dict[tuple[int, ...], int]
-) -> list[tuple[int, ...]]:
-    support: set[tuple[int, ...]] = set()
-    for w in counts:
-        support.add(w)
-        support.add(reverse_path_tuple(w))
-    return list(support)
+def _smoothed_support(
+    counts: Mapping[tuple[int, ...], int], total: int, alpha: float
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Support paths with their add-``alpha`` forward and reversed probabilities."""
+    support, c_w, c_rev = _support_counts(PathCounts.from_mapping(counts, total))
+    k = support.shape[0]
+    alpha_per = alpha / k if k > 0 else 0.0
+    denom = total + alpha
+    if denom <= 0:
+        raise ValueError("total + alpha must be positive")
+    return support, (c_w + alpha_per) / denom, (c_rev + alpha_per) / denom
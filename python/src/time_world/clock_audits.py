@@ -1,11 +1,18 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Iterable
+from itertools import chain
 
 import numpy as np
+from scipy import sparse
 
-from time_world.utils import seed_everything
+from time_world.model import StateSpace, simulate, state_coords
+from time_world.sampling import (
+    TransitionSampler,
+    build_sampler,
+    index_dtype,
+    uniform_blocks,
+)
 
 
 @dataclass(frozen=True)
@@ -21,8 +28,8 @@ class MaintenanceRun:
 
 
 def simulate_with_maintenance(
-    states: list[tuple[int, int, int]],
-    P: np.ndarray,
+    states: StateSpace | list[tuple[int, int, int]],
+    P: np.ndarray | sparse.csr_array | TransitionSampler,
     steps: int,
     seed: int,
     *,
@@ -38,25 +45,27 @@ def simulate_with_maintenance(
     if budget_total < 0:
         raise ValueError("budget_total must be >= 0")
 
-    seed_everything(seed)
-
     n_states = len(states)
     if n_states == 0:
         raise ValueError("states must be non-empty")
-    if P.shape != (n_states, n_states):
+    sampler = build_sampler(P)
+    if sampler.shape != (n_states, n_states):
         raise ValueError("P has incorrect shape")
     if start_idx < 0 or start_idx >= n_states:
         raise ValueError("start_idx out of range")
 
-    phis = np.array([state[1] for state in states], dtype=int)
-    rs = np.array([state[2] for state in states], dtype=int)
-    n_phi = int(phis.max()) + 1
-    n_r = int(rs.max()) + 1
+    if budget_total == 0:
+        # Without repairs the run is the plain chain on the same stream.
+        traj_full = simulate(sampler, steps + burn_in, seed, start_idx)
+        return maintenance_run_from_traj(states, traj_full, burn_in=burn_in)
 
-    index = {state: i for i, state in enumerate(states)}
+    space = StateSpace.from_states(states)
+    n_phi = space.n_phi
+    n_r = space.n_r
+    xs, phis, rs = (axis.tolist() for axis in space.coords)
 
     total_steps = steps + burn_in
-    traj_full = np.empty(total_steps + 1, dtype=int)
+    traj_full = np.empty(total_steps + 1, dtype=index_dtype(n_states))
     traj_full[0] = start_idx
 
     repairs_used_total = 0
@@ -69,12 +78,16 @@ def simulate_with_maintenance(
     slip_step_count = 0
     drift_flags: list[bool] = []
 
-    for t in range(total_steps):
-        current_idx = traj_full[t]
-        next_idx = int(np.random.choice(n_states, p=P[current_idx]))
+    # Proposals consume the same uniform stream as ``simulate(P, ..., seed)``.
+    draws = chain.from_iterable(
+        block.tolist() for block in uniform_blocks(seed, total_steps)
+    )
+    for t, u in zip(range(total_steps), draws):
+        current_idx = int(traj_full[t])
+        next_idx = sampler.draw(current_idx, u)
 
-        x_prev, phi_prev, _r_prev = states[current_idx]
-        x_prop, phi_prop, r_prop = states[next_idx]
+        phi_prev = phis[current_idx]
+        x_prop, phi_prop, r_prop = xs[next_idx], phis[next_idx], rs[next_idx]
 
         expected = (phi_prev + 1) % n_phi
         drift_pre = (phi_prop != phi_prev) and (phi_prop != expected)
@@ -87,7 +100,7 @@ def simulate_with_maintenance(
         if drift_pre and repairs_used_total < budget_total:
             phi_next = expected
             r_next = min(n_r - 1, r_prop + repair_cost_r_inc)
-            next_idx = index[(x_next, phi_next, r_next)]
+            next_idx = space.encode(x_next, phi_next, r_next)
             repairs_used_total += 1
             repaired = True
 
@@ -114,8 +127,7 @@ def simulate_with_maintenance(
             drift_flags.append(drift_post)
 
     traj = traj_full[burn_in:]
-    phi_traj = np.array([states[idx][1] for idx in traj], dtype=int)
-    tick_times = np.where(phi_traj == 0)[0].tolist()
+    tick_times = np.where(space.phi[traj] == 0)[0].tolist()
 
     return {
         "traj": traj,
@@ -133,6 +145,56 @@ def simulate_with_maintenance(
     }
 
 
+def maintenance_run_from_traj(
+    states: StateSpace | list[tuple[int, int, int]],
+    traj_full: np.ndarray,
+    *,
+    burn_in: int = 0,
+) -> dict:
+    """Summarise an unrepaired trajectory in the format of ``simulate_with_maintenance``.
+
+    ``traj_full`` includes the burn-in prefix; this lets batched simulations
+    (``simulate_batch``) feed the clock metrics without a per-step loop.
+    """
+    if burn_in < 0:
+        raise ValueError("burn_in must be >= 0")
+    traj_full = np.asarray(traj_full)
+    if traj_full.ndim != 1 or traj_full.shape[0] <= burn_in:
+        raise ValueError("traj_full must be 1D and longer than burn_in")
+
+    _, phis, rs = state_coords(states)
+    n_phi = int(phis.max()) + 1
+    n_r = int(rs.max()) + 1
+
+    phi_full = phis[traj_full]
+    phi_prev = phi_full[burn_in:-1]
+    phi_next = phi_full[burn_in + 1 :]
+    expected = (phi_prev + 1) % n_phi
+    backward = (phi_prev - 1) % n_phi
+
+    phi_changed = phi_next != phi_prev
+    drift = phi_changed & (phi_next != expected)
+    drift_count = int(np.count_nonzero(drift))
+
+    traj = traj_full[burn_in:]
+    tick_times = np.where(phi_full[burn_in:] == 0)[0].tolist()
+
+    return {
+        "traj": traj,
+        "repairs_used": 0,
+        "drift_detected_pre": drift_count,
+        "drift_unrepaired_post": drift_count,
+        "phi_change_count": int(np.count_nonzero(phi_changed)),
+        "expected_step_count": int(np.count_nonzero(phi_next == expected)),
+        "backward_step_count": int(np.count_nonzero(phi_next == backward)),
+        "slip_step_count": int(np.count_nonzero(drift & (phi_next != backward))),
+        "tick_times": tick_times,
+        "n_phi": n_phi,
+        "n_r": n_r,
+        "drift_flags": drift,
+    }
+
+
 def clock_metrics_from_run(run_dict: dict) -> dict:
     traj = run_dict["traj"]
     tick_times = run_dict["tick_times"]
@@ -1,25 +1,49 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import Callable
 
 import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
 
 
-def constraint_r_constant() -> Callable[[tuple[int, int, int], tuple[int, int, int]], bool]:
-    def _mask(
-        from_state: tuple[int, int, int], to_state: tuple[int, int, int]
-    ) -> bool:
+StateTuple = tuple[int, int, int]
+Coords = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+@dataclass(frozen=True)
+class Constraint:
+    """Transition feasibility rule with a pairwise and a vectorised form.
+
+    ``pair(from_state, to_state)`` keeps the original callable protocol;
+    ``coords(src, dst)`` receives broadcastable ``(x, phi, r)`` coordinate
+    arrays for the source and target states and returns a boolean mask of
+    their broadcast shape. ``(name, params)`` identifies the rule, e.g. for
+    fingerprinting cached models.
+    """
+
+    name: str
+    pair: Callable[[StateTuple, StateTuple], bool]
+    coords: Callable[[Coords, Coords], np.ndarray]
+    params: tuple[tuple[str, object], ...] = ()
+
+    def __call__(self, from_state: StateTuple, to_state: StateTuple) -> bool:
+        return self.pair(from_state, to_state)
+
+
+def constraint_r_constant() -> Constraint:
+    def _mask(from_state: StateTuple, to_state: StateTuple) -> bool:
         return to_state[2] == from_state[2]
 
-    return _mask
+    def _coords(src: Coords, dst: Coords) -> np.ndarray:
+        return dst[2] == src[2]
+
+    return Constraint(name="r_constant", pair=_mask, coords=_coords)
 
 
-def constraint_phi_forbid_pm1(
-    n_phi: int,
-) -> Callable[[tuple[int, int, int], tuple[int, int, int]], bool]:
-    def _mask(
-        from_state: tuple[int, int, int], to_state: tuple[int, int, int]
-    ) -> bool:
+def constraint_phi_forbid_pm1(n_phi: int) -> Constraint:
+    def _mask(from_state: StateTuple, to_state: StateTuple) -> bool:
         phi_from = from_state[1]
         phi_to = to_state[1]
         if phi_to == (phi_from + 1) % n_phi:
@@ -28,15 +52,17 @@ def constraint_phi_forbid_pm1(
             return False
         return True
 
-    return _mask
+    def _coords(src: Coords, dst: Coords) -> np.ndarray:
+        phi_from, phi_to = src[1], dst[1]
+        return (phi_to != (phi_from + 1) % n_phi) & (phi_to != (phi_from - 1) % n_phi)
 
+    return Constraint(
+        name="phi_forbid_pm1", pair=_mask, coords=_coords, params=(("n_phi", n_phi),)
+    )
 
-def constraint_phi_step_only(
-    n_phi: int,
-) -> Callable[[tuple[int, int, int], tuple[int, int, int]], bool]:
-    def _mask(
-        from_state: tuple[int, int, int], to_state: tuple[int, int, int]
-    ) -> bool:
+
+def constraint_phi_step_only(n_phi: int) -> Constraint:
+    def _mask(from_state: StateTuple, to_state: StateTuple) -> bool:
         phi_from = from_state[1]
         phi_to = to_state[1]
         allowed = {
@@ -46,27 +72,51 @@ def constraint_phi_step_only(
         }
         return phi_to in allowed
 
-    return _mask
+    def _coords(src: Coords, dst: Coords) -> np.ndarray:
+        phi_from, phi_to = src[1], dst[1]
+        return (
+            (phi_to == phi_from)
+            | (phi_to == (phi_from + 1) % n_phi)
+            | (phi_to == (phi_from - 1) % n_phi)
+        )
+
+    return Constraint(
+        name="phi_step_only", pair=_mask, coords=_coords, params=(("n_phi", n_phi),)
+    )
 
 
-def constraint_phi_forbid_value(
-    forbidden_phi: int,
-) -> Callable[[tuple[int, int, int], tuple[int, int, int]], bool]:
-    def _mask(
-        _from_state: tuple[int, int, int], to_state: tuple[int, int, int]
-    ) -> bool:
+def constraint_phi_forbid_value(forbidden_phi: int) -> Constraint:
+    def _mask(_from_state: StateTuple, to_state: StateTuple) -> bool:
         return to_state[1] != forbidden_phi
 
-    return _mask
+    def _coords(_src: Coords, dst: Coords) -> np.ndarray:
+        return dst[1] != forbidden_phi
 
+    return Constraint(
+        name="phi_forbid_value",
+        pair=_mask,
+        coords=_coords,
+        params=(("forbidden_phi", forbidden_phi),),
+    )
 
-def constraint_phi_forbid_zero() -> Callable[[tuple[int, int, int], tuple[int, int, int]], bool]:
+
+def constraint_phi_forbid_zero() -> Constraint:
     return constraint_phi_forbid_value(0)
 
 
+def constraint_phi_odd_only() -> Constraint:
+    def _mask(_from_state: StateTuple, to_state: StateTuple) -> bool:
+        return (to_state[1] % 2) == 1
+
+    def _coords(_src: Coords, dst: Coords) -> np.ndarray:
+        return (dst[1] % 2) == 1
+
+    return Constraint(name="phi_odd_only", pair=_mask, coords=_coords)
+
+
 def constraint_local_x(
     n_x: int, radius: int = 1, *, periodic: bool = True
-) -> Callable[[tuple[int, int, int], tuple[int, int, int]], bool]:
+) -> Constraint:
     if radius < 0:
         raise ValueError("radius must be >= 0")
 
@@ -76,22 +126,57 @@ def constraint_local_x(
         delta = abs(a - b) % n_x
         return min(delta, n_x - delta)
 
-    def _mask(
-        from_state: tuple[int, int, int], to_state: tuple[int, int, int]
-    ) -> bool:
+    def _mask(from_state: StateTuple, to_state: StateTuple) -> bool:
         return _dist(from_state[0], to_state[0]) <= radius
 
-    return _mask
-
-
-def adjacency_from_P(P: np.ndarray, *, tol: float = 0.0) -> list[np.ndarray]:
-    P = np.asarray(P)
+    def _coords(src: Coords, dst: Coords) -> np.ndarray:
+        delta = np.abs(np.asarray(src[0]) - np.asarray(dst[0]))
+        if periodic:
+            delta = delta % n_x
+            delta = np.minimum(delta, n_x - delta)
+        return delta <= radius
+
+    return Constraint(
+        name="local_x",
+        pair=_mask,
+        coords=_coords,
+        params=(("n_x", n_x), ("radius", radius), ("periodic", periodic)),
+    )
+
+
+def evaluate_constraint(
+    constraint_mask: object, src: Coords, dst: Coords
+) -> np.ndarray | None:
+    """Vectorised mask for ``constraint_mask`` over broadcast coordinates.
+
+    Returns ``None`` when the mask only supports the pairwise callable form.
+    """
+    if not isinstance(constraint_mask, Constraint):
+        return None
+    shape = np.broadcast_shapes(*(np.shape(a) for a in (*src, *dst)))
+    return np.broadcast_to(np.asarray(constraint_mask.coords(src, dst), dtype=bool), shape)
+
+
+def adjacency_from_P(
+    P: np.ndarray | sparse.csr_array, *, tol: float = 0.0
+) -> list[np.ndarray]:
+    if sparse.issparse(P):
+        P = sparse.csr_array(P)
+    else:
+        P = np.asarray(P)
     if P.ndim != 2 or P.shape[0] != P.shape[1]:
         raise ValueError("P must be a square matrix")
     if tol < 0:
         raise ValueError("tol must be >= 0")
 
     adj: list[np.ndarray] = []
+    if sparse.issparse(P):
+        for i in range(P.shape[0]):
+            start, end = P.indptr[i], P.indptr[i + 1]
+            neighbors = np.sort(P.indices[start:end][P.data[start:end] > tol])
+            adj.append(neighbors.astype(int, copy=False))
+        return adj
+
     for i in range(P.shape[0]):
         neighbors = np.flatnonzero(P[i] > tol)
         adj.append(neighbors.astype(int, copy=False))
@@ -124,3 +209,35 @@ def reachable_sizes(
             break
 
     return sizes
+
+
+def communicating_classes(
+    adj: list[np.ndarray] | np.ndarray | sparse.sparray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return the class label of every state and which classes are closed.
+
+    ``adj`` is an adjacency list or a square matrix whose positive entries
+    are the edges (e.g. ``P`` itself). A class is closed (recurrent) when no
+    edge leaves it; states in the other classes are transient.
+    """
+    graph = _edge_graph(adj)
+    n_classes, labels = csgraph.connected_components(graph, connection="strong")
+    src = np.repeat(np.arange(graph.shape[0]), np.diff(graph.indptr))
+    leaves = labels[src] != labels[graph.indices]
+    closed = np.ones(n_classes, dtype=bool)
+    closed[labels[src[leaves]]] = False
+    return labels.astype(np.int64), closed
+
+
+def _edge_graph(adj: list[np.ndarray] | np.ndarray | sparse.sparray) -> sparse.csr_array:
+    if isinstance(adj, list):
+        rows = [np.asarray(row, dtype=np.int64) for row in adj]
+        indptr = np.concatenate([[0], np.cumsum([row.shape[0] for row in rows])])
+        indices = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        return sparse.csr_array(
+            (np.ones(indices.shape[0]), indices, indptr), shape=(len(rows), len(rows))
+        )
+    graph = sparse.csr_array(adj if sparse.issparse(adj) else np.asarray(adj))
+    if graph.ndim != 2 or graph.shape[0] != graph.shape[1]:
+        raise ValueError("adjacency must be square")
+    return sparse.csr_array(graph > 0)
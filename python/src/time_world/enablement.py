@@ -4,7 +4,8 @@ from typing import Callable
 
 import numpy as np
 
-from time_world.model import simulate
+from time_world.model import StateSpace, simulate
+from time_world.sampling import TransitionSampler
 
 
 def lens_f0(state: tuple[int, int, int]) -> tuple[int]:
@@ -18,11 +19,14 @@ def lens_f1(state: tuple[int, int, int]) -> tuple[int, int]:
 
 
 def map_traj(
-    states: list[tuple[int, int, int]],
+    states: StateSpace | list[tuple[int, int, int]],
     traj_idx: np.ndarray,
     lens_fn: Callable[[tuple[int, int, int]], tuple[int, ...]],
 ) -> list[tuple[int, ...]]:
-    return [lens_fn(states[int(idx)]) for idx in traj_idx]
+    # Apply the lens once per visited state rather than once per step.
+    visited, inverse = np.unique(np.asarray(traj_idx), return_inverse=True)
+    lensed = [lens_fn(states[idx]) for idx in visited.tolist()]
+    return [lensed[k] for k in inverse.tolist()]
 
 
 def markov_nll_gap(
@@ -120,8 +124,8 @@ def markov_nll_gap(
 
 
 def run_enablement(
-    states: list[tuple[int, int, int]],
-    P: np.ndarray,
+    states: StateSpace | list[tuple[int, int, int]],
+    P: np.ndarray | TransitionSampler,
     *,
     seed: int,
     steps: int,
@@ -129,8 +133,12 @@ def run_enablement(
     window: int,
     threshold: float,
     alpha: float = 1.0,
+    traj: np.ndarray | None = None,
 ) -> dict:
-    traj = simulate(P, steps + burn_in, seed)
+    if traj is None:
+        traj = simulate(P, steps + burn_in, seed)
+    elif len(traj) != steps + burn_in + 1:
+        raise ValueError("traj must have length steps + burn_in + 1")
     traj = traj[burn_in:]
 
     total_steps = len(traj) - 1
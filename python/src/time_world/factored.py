@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import reduce
+from math import prod
+from typing import Union
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import LinearOperator
+
+from time_world.model import _coerce_params, _validate_params
+
+Factor = Union[np.ndarray, sparse.sparray, None]
+
+
+@dataclass(frozen=True)
+class KronTerm:
+    """``weight * (factors[0] ⊗ factors[1] ⊗ ...)``; a ``None`` factor is the identity."""
+
+    weight: float
+    factors: tuple[Factor, ...]
+
+
+@dataclass(frozen=True)
+class FactoredChain:
+    """Transition matrix of a product space given as Kronecker-structured stages.
+
+    States are the C-order flattening of a grid with shape ``dims`` (for the
+    three-factor model, ``(n_x, n_phi, n_r)`` and the usual flat index).
+    ``P = S_0 @ S_1 @ ...`` where each stage ``S_k`` is a sum of
+    :class:`KronTerm` over per-factor local kernels, so ``P`` is applied
+    factor by factor without materialising the product space.
+    """
+
+    dims: tuple[int, ...]
+    stages: tuple[tuple[KronTerm, ...], ...]
+
+    def __post_init__(self) -> None:
+        if not self.dims or min(self.dims) < 1:
+            raise ValueError("dims must be non-empty and positive")
+        if not self.stages or not all(self.stages):
+            raise ValueError("every stage needs at least one term")
+        for stage in self.stages:
+            for term in stage:
+                if len(term.factors) != len(self.dims):
+                    raise ValueError("each term needs one factor per dimension")
+                for factor, dim in zip(term.factors, self.dims):
+                    if factor is not None and factor.shape != (dim, dim):
+                        raise ValueError("factor shape does not match its dimension")
+
+    @property
+    def n_states(self) -> int:
+        return prod(self.dims)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self.n_states, self.n_states)
+
+    def rmatvec(self, v: np.ndarray) -> np.ndarray:
+        """``v @ P`` for a vector or a stack of row vectors ``(k, n_states)``."""
+        v = np.asarray(v, dtype=np.float64)
+        lead = v.shape[:-1]
+        tensor = v.reshape(lead + self.dims)
+        for stage in self.stages:
+            tensor = sum(_apply_term(term, tensor, len(lead), False) for term in stage)
+        return tensor.reshape(v.shape)
+
+    def matvec(self, v: np.ndarray) -> np.ndarray:
+        """``P @ v`` for a vector (or ``(k, n_states)`` stack of them)."""
+        v = np.asarray(v, dtype=np.float64)
+        lead = v.shape[:-1]
+        tensor = v.reshape(lead + self.dims)
+        for stage in reversed(self.stages):
+            tensor = sum(_apply_term(term, tensor, len(lead), True) for term in stage)
+        return tensor.reshape(v.shape)
+
+    def linear_operator(self) -> LinearOperator:
+        return LinearOperator(
+            self.shape, matvec=self.matvec, rmatvec=self.rmatvec, dtype=np.float64
+        )
+
+    def to_csr(self) -> sparse.csr_array:
+        stages = [
+            sum(term.weight * _kron(term.factors, self.dims) for term in stage)
+            for stage in self.stages
+        ]
+        P = sparse.csr_array(reduce(lambda a, b: a @ b, stages))
+        P.sum_duplicates()
+        P.eliminate_zeros()
+        return P
+
+    def to_dense(self) -> np.ndarray:
+        return self.to_csr().toarray()
+
+
+def _apply_term(
+    term: KronTerm, tensor: np.ndarray, n_lead: int, transpose: bool
+) -> np.ndarray:
+    out = tensor
+    for axis, factor in enumerate(term.factors):
+        if factor is None:
+            continue
+        axis += n_lead
+        moved = np.moveaxis(out, axis, -1)
+        flat = moved.reshape(-1, moved.shape[-1])
+        # Row vectors contract with the factor's rows, column vectors with its columns.
+        flat = flat @ (factor.T if transpose else factor)
+        out = np.moveaxis(np.asarray(flat).reshape(moved.shape), -1, axis)
+    return term.weight * out
+
+
+def _kron(factors: tuple[Factor, ...], dims: tuple[int, ...]) -> sparse.csr_array:
+    mats = [
+        sparse.eye_array(dim, format="csr") if factor is None else sparse.csr_array(factor)
+        for factor, dim in zip(factors, dims)
+    ]
+    return sparse.csr_array(reduce(lambda a, b: sparse.kron(a, b, format="csr"), mats))
+
+
+def ring_shift(n: int, step: int) -> sparse.csr_array:
+    """Permutation ``i -> (i + step) % n``."""
+    src = np.arange(n)
+    return sparse.csr_array((np.ones(n), (src, (src + step) % n)), shape=(n, n))
+
+
+def uniform_kernel(n: int) -> np.ndarray:
+    """Resample uniformly: every row is ``1 / n``."""
+    return np.full((n, n), 1.0 / n)
+
+
+def indicator(mask: np.ndarray) -> sparse.csr_array:
+    """Diagonal projector onto the states where ``mask`` is true."""
+    return sparse.diags_array(np.asarray(mask, dtype=np.float64), format="csr")
+
+
+def record_increment(n: int, coupling: float) -> sparse.csr_array:
+    """Advance a register one level with probability ``coupling``; the top level stays."""
+    src = np.arange(n)
+    inc = src + 1 < n
+    rows = np.concatenate([src[inc], src[inc], src[~inc]])
+    cols = np.concatenate([src[inc] + 1, src[inc], src[~inc]])
+    vals = np.concatenate(
+        [np.full(inc.sum(), coupling), np.full(inc.sum(), 1.0 - coupling), [1.0]]
+    )
+    return sparse.csr_array((vals, (rows, cols)), shape=(n, n))
+
+
+def record_backslide(n: int, prob: float) -> sparse.csr_array:
+    """Drop a register one level with probability ``prob``; level 0 stays."""
+    src = np.arange(n)
+    down = src > 0
+    rows = np.concatenate([src, src[down]])
+    cols = np.concatenate([src, src[down] - 1])
+    vals = np.concatenate([np.where(down, 1.0 - prob, 1.0), np.full(down.sum(), prob)])
+    return sparse.csr_array((vals, (rows, cols)), shape=(n, n))
+
+
+def three_factor_chain(params: dict) -> FactoredChain:
+    """The ``build_model`` kernel as a :class:`FactoredChain` over ``(x, phi, r)``.
+
+    Matches ``build_model(params)`` up to floating-point rounding. Constraint
+    masks are not Kronecker-structured and are rejected.
+    """
+    cfg = _coerce_params(params)
+    _validate_params(cfg)
+    if cfg.constraint_mask is not None:
+        raise ValueError("three_factor_chain does not support constraint_mask")
+    n_x, n_phi, n_r = cfg.n_x, cfg.n_phi, cfg.n_r
+
+    p_idle = 1.0 - cfg.p_x - cfg.p_phi
+    p_fwd = 0.5 * (1.0 + cfg.drive_strength)
+    p_bwd = 0.5 * (1.0 - cfg.drive_strength)
+    non_noise = cfg.p_phi * (1.0 - cfg.phase_noise)
+    coupled = cfg.p_x * cfg.x_phi_coupling
+    low_phase = np.arange(n_phi) < n_phi / 2
+
+    terms = [
+        KronTerm(p_idle, (None, None, None)),
+        KronTerm(cfg.p_x * (1.0 - cfg.x_phi_coupling), (uniform_kernel(n_x), None, None)),
+        KronTerm(coupled, (ring_shift(n_x, 1), indicator(low_phase), None)),
+        KronTerm(coupled, (ring_shift(n_x, -1), indicator(~low_phase), None)),
+        KronTerm(cfg.p_phi * cfg.phase_noise, (None, uniform_kernel(n_phi), None)),
+        KronTerm(
+            non_noise * p_fwd,
+            (None, ring_shift(n_phi, 1), record_increment(n_r, cfg.record_coupling)),
+        ),
+        KronTerm(non_noise * p_bwd, (None, ring_shift(n_phi, -1), None)),
+    ]
+    stages = [tuple(term for term in terms if term.weight > 0)]
+    if cfg.record_backslide_prob > 0:
+        stages.append(
+            (KronTerm(1.0, (None, None, record_backslide(n_r, cfg.record_backslide_prob))),)
+        )
+    return FactoredChain(dims=(n_x, n_phi, n_r), stages=tuple(stages))
@@ -1,10 +1,22 @@
 from __future__ import annotations
 
+import operator
+from collections.abc import Iterator, Sequence
 from dataclasses import dataclass
+from functools import cached_property
+from itertools import product
+from typing import Iterable
 
 import numpy as np
+from scipy import sparse
 
-from time_world.utils import seed_everything
+from time_world.constraints_cones import evaluate_constraint
+from time_world.sampling import (
+    TransitionSampler,
+    build_sampler,
+    index_dtype,
+    uniform_blocks,
+)
 
 
 @dataclass(frozen=True)
@@ -22,6 +34,123 @@ class ModelParams:
     constraint_mask: object | None = None
 
 
+@dataclass(frozen=True)
+class StateSpace(Sequence):
+    """The ``(x, phi, r)`` grid in flat-index order.
+
+    State ``i`` is ``(x, phi, r)`` with ``i = (x * n_phi + phi) * n_r + r``.
+    ``len``, iteration and integer indexing behave like the list of tuples
+    ``build_model`` used to return; ``x``, ``phi`` and ``r`` hold every
+    state's coordinates as compact read-only arrays.
+    """
+
+    n_x: int
+    n_phi: int
+    n_r: int
+
+    def __post_init__(self) -> None:
+        if min(self.n_x, self.n_phi, self.n_r) < 1:
+            raise ValueError("n_x, n_phi, n_r must be >= 1")
+
+    @classmethod
+    def from_states(cls, states: Iterable[tuple[int, int, int]]) -> StateSpace:
+        """Recover the grid behind a list of states in ``build_model`` order."""
+        if isinstance(states, StateSpace):
+            return states
+        coords = np.asarray(list(states), dtype=np.int64).reshape(-1, 3)
+        if coords.shape[0] == 0:
+            raise ValueError("states must be non-empty")
+        space = cls(*(int(n) for n in coords.max(axis=0) + 1))
+        if len(space) != coords.shape[0] or not np.array_equal(coords, np.asarray(space)):
+            raise ValueError("states are not a full (x, phi, r) grid in flat-index order")
+        return space
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return (self.n_x, self.n_phi, self.n_r)
+
+    @cached_property
+    def coords(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        grid = np.indices(self.shape, dtype=index_dtype(max(self.shape)))
+        coords = tuple(axis.reshape(-1) for axis in grid)
+        for axis in coords:
+            axis.flags.writeable = False
+        return coords
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.coords[0]
+
+    @property
+    def phi(self) -> np.ndarray:
+        return self.coords[1]
+
+    @property
+    def r(self) -> np.ndarray:
+        return self.coords[2]
+
+    def __len__(self) -> int:
+        return self.n_x * self.n_phi * self.n_r
+
+    def __iter__(self) -> Iterator[tuple[int, int, int]]:
+        return product(range(self.n_x), range(self.n_phi), range(self.n_r))
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        i = operator.index(idx)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("state index out of range")
+        rest, r = divmod(i, self.n_r)
+        x, phi = divmod(rest, self.n_phi)
+        return (x, phi, r)
+
+    def __contains__(self, state: object) -> bool:
+        try:
+            x, phi, r = state
+        except (TypeError, ValueError):
+            return False
+        return 0 <= x < self.n_x and 0 <= phi < self.n_phi and 0 <= r < self.n_r
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        return np.stack(self.coords, axis=1).astype(dtype or np.int64)
+
+    def index(self, state: tuple[int, int, int]) -> int:
+        if state not in self:
+            raise ValueError(f"{state!r} is not in the state space")
+        return self.encode(*state)
+
+    def count(self, state: object) -> int:
+        return int(state in self)
+
+    def encode(self, x, phi, r):
+        """Flat index of ``(x, phi, r)``; scalars give ``int``, arrays give int64."""
+        if all(isinstance(v, (int, np.integer)) for v in (x, phi, r)):
+            return (int(x) * self.n_phi + int(phi)) * self.n_r + int(r)
+        x, phi, r = (np.asarray(v, dtype=np.int64) for v in (x, phi, r))
+        return (x * self.n_phi + phi) * self.n_r + r
+
+    def decode(self, idx) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Coordinate arrays of the flat indices ``idx``."""
+        return self.x[idx], self.phi[idx], self.r[idx]
+
+    def tuples(self, idx) -> list[tuple[int, int, int]]:
+        """``[self[i] for i in idx]`` without per-element index arithmetic."""
+        return list(zip(*(axis.tolist() for axis in self.decode(np.asarray(idx)))))
+
+
+def state_coords(
+    states: StateSpace | Iterable[tuple[int, int, int]],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """int64 ``(x, phi, r)`` arrays for a ``StateSpace`` or a list of state tuples."""
+    if isinstance(states, StateSpace):
+        return tuple(axis.astype(np.int64) for axis in states.coords)
+    coords = np.asarray(list(states), dtype=np.int64).reshape(-1, 3)
+    return tuple(coords.T)
+
+
 def preset_reversibleish() -> dict:
     return {
         "n_x": 3,
@@ -68,165 +197,458 @@ def _coerce_params(params: dict) -> ModelParams:
     )
 
 
-def build_model(params: dict) -> tuple[list[tuple[int, int, int]], np.ndarray]:
+MODEL_FORMATS = ("dense", "csr", "operator")
+
+
+def build_model(
+    params: dict, *, format: str = "dense"
+) -> tuple[StateSpace, np.ndarray | sparse.csr_array | TransitionOperator]:
+    """Build the ``(x, phi, r)`` state space and transition matrix.
+
+    ``format="dense"`` returns a float64 ndarray; ``format="csr"`` returns a
+    ``scipy.sparse.csr_array`` in canonical form (sorted indices, no explicit
+    zeros), which keeps memory at O(nnz) for large record registers;
+    ``format="operator"`` returns a :class:`TransitionOperator` that never
+    stores ``P``.
+    """
+    if format not in MODEL_FORMATS:
+        raise ValueError(f"format must be one of {MODEL_FORMATS}")
     cfg = _coerce_params(params)
+    _validate_params(cfg)
+
+    states = StateSpace(cfg.n_x, cfg.n_phi, cfg.n_r)
+    if format == "operator":
+        return states, TransitionOperator(cfg, states)
+    n_states = len(states)
+    chunks = _transition_chunks(cfg, np.arange(n_states))
+    if format == "csr":
+        rows, cols, vals = (np.concatenate(parts) for parts in zip(*chunks))
+        P = sparse.csr_array((vals, (rows, cols)), shape=(n_states, n_states))
+        P.sum_duplicates()
+        P.eliminate_zeros()
+    else:
+        P = np.zeros((n_states, n_states), dtype=np.float64)
+        for rows, cols, vals in chunks:
+            P[rows, cols] += vals
 
+    _apply_constraints(P, states, cfg.constraint_mask)
+
+    return states, P
+
+
+@dataclass(frozen=True)
+class TransitionOperator:
+    """Matrix-free ``P`` recomputed from the ``(x, phi, r)`` kernel on demand.
+
+    Rows are generated ``block_size`` at a time by the same kernel code as
+    ``build_model`` (constraints and renormalisation included), so memory
+    stays O(n_states + block_size * row_degree) however large the state
+    space is. Each product with a vector regenerates every row.
+    """
+
+    cfg: ModelParams
+    states: StateSpace
+    block_size: int = 1 << 14
+
+    @property
+    def n_states(self) -> int:
+        return len(self.states)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self.n_states, self.n_states)
+
+    def rows(self, src: np.ndarray) -> sparse.csr_array:
+        """Rows ``src`` (sorted, unique state indices) of ``P`` as a CSR block."""
+        src = np.asarray(src, dtype=np.int64)
+        rows, cols, vals = (
+            np.concatenate(parts) for parts in zip(*_transition_chunks(self.cfg, src))
+        )
+        block = sparse.csr_array(
+            (vals, (np.searchsorted(src, rows), cols)),
+            shape=(src.shape[0], self.n_states),
+        )
+        block.sum_duplicates()
+        block.eliminate_zeros()
+        _apply_constraints(block, self.states, self.cfg.constraint_mask, row_ids=src)
+        return block
+
+    def row(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        """Successor indices and probabilities of state ``i``."""
+        block = self.rows(np.array([i]))
+        return block.indices, block.data
+
+    def iter_nonzero(self) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Yield ``(rows, cols, vals)`` for every stored entry, block by block."""
+        for start in range(0, self.n_states, self.block_size):
+            src = np.arange(start, min(start + self.block_size, self.n_states))
+            block = self.rows(src)
+            yield np.repeat(src, np.diff(block.indptr)), block.indices, block.data
+
+    def entries(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """``P[rows, cols]`` elementwise, zero off the sparsity pattern."""
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        out = np.zeros(rows.shape[0], dtype=np.float64)
+        src, inverse = np.unique(rows, return_inverse=True)
+        for start in range(0, src.shape[0], self.block_size):
+            sel = (inverse >= start) & (inverse < start + self.block_size)
+            block = self.rows(src[start : start + self.block_size])
+            out[sel] = block[inverse[sel] - start, cols[sel]]
+        return out
+
+    def rmatvec(self, v: np.ndarray) -> np.ndarray:
+        """``v @ P``."""
+        v = np.asarray(v, dtype=np.float64)
+        out = np.zeros(self.n_states, dtype=np.float64)
+        for rows, cols, vals in self.iter_nonzero():
+            out += np.bincount(cols, weights=v[rows] * vals, minlength=self.n_states)
+        return out
+
+    def matvec(self, v: np.ndarray) -> np.ndarray:
+        """``P @ v``."""
+        v = np.asarray(v, dtype=np.float64)
+        out = np.empty(self.n_states, dtype=np.float64)
+        for start in range(0, self.n_states, self.block_size):
+            src = np.arange(start, min(start + self.block_size, self.n_states))
+            out[src] = self.rows(src) @ v
+        return out
+
+    def draw(self, current: int, u: float) -> int:
+        """Successor of ``current`` for one uniform, as ``TransitionSampler.draw`` picks it."""
+        cols, vals = self.row(current)
+        cdf = np.cumsum(vals)
+        cdf /= cdf[-1]
+        cdf[-1] = 1.0
+        return int(cols[np.searchsorted(cdf, u, side="right")])
+
+    def to_csr(self) -> sparse.csr_array:
+        return sparse.csr_array(
+            sparse.vstack(
+                [
+                    self.rows(np.arange(start, min(start + self.block_size, self.n_states)))
+                    for start in range(0, self.n_states, self.block_size)
+                ],
+                format="csr",
+            )
+        )
+
+
+def _validate_params(cfg: ModelParams) -> None:
     if cfg.n_x < 1 or cfg.n_phi < 1 or cfg.n_r < 1:
         raise ValueError("n_x, n_phi, n_r must be >= 1")
     if cfg.p_x < 0 or cfg.p_phi < 0:
         raise ValueError("p_x and p_phi must be >= 0")
-    p_idle = 1.0 - cfg.p_x - cfg.p_phi
-    if p_idle < 0:
+    if 1.0 - cfg.p_x - cfg.p_phi < 0:
         raise ValueError("p_idle must be >= 0 (p_x + p_phi <= 1)")
     if not (-1.0 <= cfg.drive_strength <= 1.0):
         raise ValueError("drive_strength must be in [-1, 1]")
     if not (0.0 <= cfg.x_phi_coupling <= 1.0):
         raise ValueError("x_phi_coupling must be in [0, 1]")
 
-    p_fwd = 0.5 * (1.0 + cfg.drive_strength)
-    p_bwd = 0.5 * (1.0 - cfg.drive_strength)
 
-    states: list[tuple[int, int, int]] = []
-    index: dict[tuple[int, int, int], int] = {}
-    for x in range(cfg.n_x):
-        for phi in range(cfg.n_phi):
-            for r in range(cfg.n_r):
-                idx = len(states)
-                state = (x, phi, r)
-                states.append(state)
-                index[state] = idx
+def _flat_index(
+    cfg: ModelParams, x: np.ndarray, phi: np.ndarray, r: np.ndarray
+) -> np.ndarray:
+    return (x * cfg.n_phi + phi) * cfg.n_r + r
 
-    n_states = len(states)
-    P = np.zeros((n_states, n_states), dtype=np.float64)
 
-    def add_with_backslide(x: int, phi: int, r: int, prob: float, row: np.ndarray) -> None:
-        if prob <= 0:
-            return
-        r_down = r - 1 if r > 0 else 0
-        if r_down == r or cfg.record_backslide_prob <= 0:
-            row[index[(x, phi, r)]] += prob
+def _transition_chunks(
+    cfg: ModelParams, src: np.ndarray
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Return the transition mass leaving ``src`` as ``(rows, cols, vals)`` chunks.
+
+    Chunks follow the branch order of the kernel (idle, X-update, X-phase
+    coupling, phase noise, driven forward step, backward step) and no chunk
+    repeats a ``(row, col)`` pair, so adding them in order with fancy-index
+    ``+=`` accumulates every entry in the same sequence as a per-row loop.
+    """
+    src = np.asarray(src, dtype=np.int64)
+    x, rem = np.divmod(src, cfg.n_phi * cfg.n_r)
+    phi, r = np.divmod(rem, cfg.n_r)
+
+    p_idle = 1.0 - cfg.p_x - cfg.p_phi
+    p_fwd = 0.5 * (1.0 + cfg.drive_strength)
+    p_bwd = 0.5 * (1.0 - cfg.drive_strength)
+
+    chunks: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def emit(
+        rows: np.ndarray,
+        x_to: np.ndarray,
+        phi_to: np.ndarray,
+        r_to: np.ndarray,
+        prob: float | np.ndarray,
+    ) -> None:
+        prob = np.broadcast_to(np.asarray(prob, dtype=np.float64), rows.shape)
+        cols = _flat_index(cfg, x_to, phi_to, r_to)
+        if cfg.record_backslide_prob <= 0:
+            chunks.append((rows, cols, prob))
             return
-        row[index[(x, phi, r)]] += prob * (1.0 - cfg.record_backslide_prob)
-        row[index[(x, phi, r_down)]] += prob * cfg.record_backslide_prob
-
-    for state in states:
-        x, phi, r = state
-        row = P[index[state]]
-
-        # Idle branch
-        add_with_backslide(x, phi, r, p_idle, row)
-
-        # X-update branch
-        if cfg.p_x > 0:
-            uniform_mass = cfg.p_x * (1.0 - cfg.x_phi_coupling)
-            base_prob = uniform_mass / cfg.n_x if uniform_mass > 0 else 0.0
-            if base_prob > 0:
-                for x_next in range(cfg.n_x):
-                    add_with_backslide(x_next, phi, r, base_prob, row)
-
-            if cfg.x_phi_coupling > 0:
-                direction = 1 if phi < cfg.n_phi / 2 else -1
-                x_next = (x + direction) % cfg.n_x
-                add_with_backslide(
-                    x_next, phi, r, cfg.p_x * cfg.x_phi_coupling, row
+        slide = r_to > 0
+        stay = np.where(slide, prob * (1.0 - cfg.record_backslide_prob), prob)
+        chunks.append(
+            (
+                np.concatenate([rows, rows[slide]]),
+                np.concatenate([cols, cols[slide] - 1]),
+                np.concatenate([stay, prob[slide] * cfg.record_backslide_prob]),
+            )
+        )
+
+    # Idle branch
+    if p_idle > 0:
+        emit(src, x, phi, r, p_idle)
+
+    # X-update branch
+    if cfg.p_x > 0:
+        uniform_mass = cfg.p_x * (1.0 - cfg.x_phi_coupling)
+        base_prob = uniform_mass / cfg.n_x if uniform_mass > 0 else 0.0
+        if base_prob > 0:
+            x_next = np.tile(np.arange(cfg.n_x), src.shape[0])
+            emit(
+                np.repeat(src, cfg.n_x),
+                x_next,
+                np.repeat(phi, cfg.n_x),
+                np.repeat(r, cfg.n_x),
+                base_prob,
+            )
+
+        coupled_prob = cfg.p_x * cfg.x_phi_coupling
+        if cfg.x_phi_coupling > 0 and coupled_prob > 0:
+            direction = np.where(phi < cfg.n_phi / 2, 1, -1)
+            emit(src, (x + direction) % cfg.n_x, phi, r, coupled_prob)
+
+    # Phi-update branch
+    if cfg.p_phi > 0:
+        # Phase noise branch
+        if cfg.phase_noise > 0:
+            noise_prob = cfg.p_phi * cfg.phase_noise / cfg.n_phi
+            if noise_prob > 0:
+                emit(
+                    np.repeat(src, cfg.n_phi),
+                    np.repeat(x, cfg.n_phi),
+                    np.tile(np.arange(cfg.n_phi), src.shape[0]),
+                    np.repeat(r, cfg.n_phi),
+                    noise_prob,
                 )
 
-        # Phi-update branch
-        if cfg.p_phi > 0:
-            # Phase noise branch
-            if cfg.phase_noise > 0:
-                noise_prob = cfg.p_phi * cfg.phase_noise / cfg.n_phi
-                for phi_next in range(cfg.n_phi):
-                    add_with_backslide(x, phi_next, r, noise_prob, row)
-
-            # Non-noise branch with drive
-            non_noise_prob = cfg.p_phi * (1.0 - cfg.phase_noise)
-            if non_noise_prob > 0:
-                phi_fwd = (phi + 1) % cfg.n_phi
-                phi_bwd = (phi - 1) % cfg.n_phi
-
-                fwd_prob = non_noise_prob * p_fwd
-                if fwd_prob > 0:
-                    r_inc = r + 1 if r + 1 < cfg.n_r else cfg.n_r - 1
-                    if cfg.record_coupling > 0 and r_inc != r:
-                        add_with_backslide(
-                            x,
-                            phi_fwd,
-                            r_inc,
-                            fwd_prob * cfg.record_coupling,
-                            row,
-                        )
-                        add_with_backslide(
-                            x,
-                            phi_fwd,
-                            r,
-                            fwd_prob * (1.0 - cfg.record_coupling),
-                            row,
-                        )
-                    else:
-                        add_with_backslide(x, phi_fwd, r, fwd_prob, row)
-
-                bwd_prob = non_noise_prob * p_bwd
-                if bwd_prob > 0:
-                    add_with_backslide(x, phi_bwd, r, bwd_prob, row)
+        # Non-noise branch with drive
+        non_noise_prob = cfg.p_phi * (1.0 - cfg.phase_noise)
+        if non_noise_prob > 0:
+            phi_fwd = (phi + 1) % cfg.n_phi
+            phi_bwd = (phi - 1) % cfg.n_phi
+
+            fwd_prob = non_noise_prob * p_fwd
+            if fwd_prob > 0:
+                if cfg.record_coupling > 0:
+                    inc = r + 1 < cfg.n_r
+                    top = ~inc
+                    inc_prob = fwd_prob * cfg.record_coupling
+                    stay_prob = fwd_prob * (1.0 - cfg.record_coupling)
+                    # Record increment first, then the same-record remainder;
+                    # rows already at the top register take the full step.
+                    if inc_prob > 0:
+                        emit(src[inc], x[inc], phi_fwd[inc], r[inc] + 1, inc_prob)
+                    if stay_prob > 0:
+                        emit(src[inc], x[inc], phi_fwd[inc], r[inc], stay_prob)
+                    emit(src[top], x[top], phi_fwd[top], r[top], fwd_prob)
+                else:
+                    emit(src, x, phi_fwd, r, fwd_prob)
 
-    _apply_constraints(P, states, cfg.constraint_mask)
+            bwd_prob = non_noise_prob * p_bwd
+            if bwd_prob > 0:
+                emit(src, x, phi_bwd, r, bwd_prob)
 
-    return states, P
+    return chunks
 
 
 def _apply_constraints(
-    P: np.ndarray,
-    states: list[tuple[int, int, int]],
+    P: np.ndarray | sparse.csr_array,
+    states: StateSpace,
     constraint_mask: object | None,
+    *,
+    row_ids: np.ndarray | None = None,
 ) -> None:
+    """Mask and renormalise ``P`` in place.
+
+    ``row_ids`` gives the state of each row when ``P`` is a CSR block of rows.
+    """
     if constraint_mask is None:
         return
+    if row_ids is None:
+        row_ids = np.arange(P.shape[0])
 
     if isinstance(constraint_mask, np.ndarray):
-        if constraint_mask.shape != P.shape:
+        if constraint_mask.shape != (len(states), len(states)):
             raise ValueError("constraint_mask has incorrect shape")
-        P *= constraint_mask.astype(np.float64, copy=False)
+        if sparse.issparse(P):
+            rows = row_ids[np.repeat(np.arange(P.shape[0]), np.diff(P.indptr))]
+            P.data *= constraint_mask[rows, P.indices].astype(np.float64, copy=False)
+        else:
+            P *= constraint_mask.astype(np.float64, copy=False)
         _renormalize_rows(P)
         return
 
-    if callable(constraint_mask):
-        n_states = len(states)
-        for i, from_state in enumerate(states):
-            weights = np.ones(n_states, dtype=np.float64)
-            for j, to_state in enumerate(states):
-                raw = constraint_mask(from_state, to_state)
-                if isinstance(raw, bool):
-                    weights[j] = 1.0 if raw else 0.0
-                else:
-                    weights[j] = float(raw)
-            P[i] *= weights
-        _renormalize_rows(P)
-        return
+    if not callable(constraint_mask):
+        raise ValueError("constraint_mask must be None, numpy array, or callable")
+
+    # Entries outside the sparsity pattern stay zero whatever the mask says,
+    # so the mask is only evaluated on stored transitions.
+    if sparse.issparse(P):
+        rows = row_ids[np.repeat(np.arange(P.shape[0]), np.diff(P.indptr))]
+        P.data *= _constraint_weights(constraint_mask, states, rows, P.indices)
+    else:
+        rows, cols = np.nonzero(P)
+        P[rows, cols] *= _constraint_weights(constraint_mask, states, rows, cols)
+    _renormalize_rows(P)
+
+
+def _constraint_weights(
+    constraint_mask: object,
+    states: StateSpace,
+    rows: np.ndarray,
+    cols: np.ndarray,
+) -> np.ndarray:
+    coords = state_coords(states)
+    mask = evaluate_constraint(
+        constraint_mask,
+        tuple(axis[rows] for axis in coords),
+        tuple(axis[cols] for axis in coords),
+    )
+    if mask is not None:
+        return mask.astype(np.float64)
+
+    weights = np.empty(rows.shape[0], dtype=np.float64)
+    for k, (i, j) in enumerate(zip(rows.tolist(), cols.tolist())):
+        raw = constraint_mask(states[i], states[j])
+        if isinstance(raw, bool):
+            weights[k] = 1.0 if raw else 0.0
+        else:
+            weights[k] = float(raw)
+    return weights
+
+
+def _renormalize_rows(P: np.ndarray | sparse.csr_array) -> None:
+    if sparse.issparse(P):
+        P.eliminate_zeros()
+    row_sums = np.asarray(P.sum(axis=1)).ravel()
+    if np.any(row_sums <= 0):
+        raise ValueError("Row has zero mass after applying constraints")
+    if sparse.issparse(P):
+        P.data /= np.repeat(row_sums, np.diff(P.indptr))
+    else:
+        P /= row_sums[:, None]
+
+
+def simulate(
+    P: np.ndarray | sparse.csr_array | TransitionSampler,
+    steps: int,
+    seed: int,
+    start_idx: int = 0,
+) -> np.ndarray:
+    """Sample a trajectory of ``steps`` transitions starting at ``start_idx``.
+
+    The trajectory uses the smallest unsigned dtype that holds every state
+    index (see :func:`~time_world.sampling.index_dtype`).
+
+    ``P`` may be a dense or CSR matrix, or a prebuilt
+    :class:`~time_world.sampling.TransitionSampler` to reuse one table across
+    seeds. Step ``t`` consumes the ``t``-th uniform of
+    ``np.random.default_rng(seed).random(steps)``.
+    """
+    if steps < 0:
+        raise ValueError("steps must be >= 0")
 
-    raise ValueError("constraint_mask must be None, numpy array, or callable")
+    sampler = build_sampler(P)
+    n_states = sampler.n_states
+    if start_idx < 0 or start_idx >= n_states:
+        raise ValueError("start_idx out of range")
 
+    traj = np.empty(steps + 1, dtype=index_dtype(n_states))
+    traj[0] = start_idx
+    t = 0
+    for u in uniform_blocks(seed, steps):
+        sampler.sample_path(traj[t], u, out=traj[t : t + u.shape[0] + 1])
+        t += u.shape[0]
+    return traj
 
-def _renormalize_rows(P: np.ndarray) -> None:
-    row_sums = P.sum(axis=1)
-    for i, total in enumerate(row_sums):
-        if total <= 0:
-            raise ValueError("Row has zero mass after applying constraints")
-        P[i] /= total
 
+def stream_simulate(
+    P: np.ndarray | sparse.csr_array | TransitionSampler,
+    steps: int,
+    seed: int,
+    start_idx: int = 0,
+) -> Iterator[np.ndarray]:
+    """Yield ``simulate(P, steps, seed, start_idx)`` as consecutive chunks.
 
-def simulate(P: np.ndarray, steps: int, seed: int, start_idx: int = 0) -> np.ndarray:
+    The first chunk begins with ``start_idx``; concatenated, the chunks equal
+    the full trajectory, but only one block of uniforms and states is held
+    at a time.
+    """
     if steps < 0:
         raise ValueError("steps must be >= 0")
-    seed_everything(seed)
 
-    n_states = P.shape[0]
+    sampler = build_sampler(P)
+    n_states = sampler.n_states
     if start_idx < 0 or start_idx >= n_states:
         raise ValueError("start_idx out of range")
 
-    traj = np.empty(steps + 1, dtype=int)
-    traj[0] = start_idx
-    for t in range(steps):
-        current = traj[t]
-        traj[t + 1] = np.random.choice(n_states, p=P[current])
-    return traj
+    dtype = index_dtype(n_states)
+    current = int(start_idx)
+    first = True
+    for u in uniform_blocks(seed, steps):
+        block = sampler.sample_path(current, u, out=np.empty(u.shape[0] + 1, dtype=dtype))
+        current = int(block[-1])
+        yield block if first else block[1:]
+        first = False
+    if first:
+        yield np.array([start_idx], dtype=dtype)
+
+
+def simulate_batch(
+    P: np.ndarray | sparse.csr_array | TransitionSampler,
+    steps: int,
+    seeds: Iterable[int],
+    start_idx: int | Iterable[int] = 0,
+    *,
+    lockstep_min_chains: int = 24,
+) -> np.ndarray:
+    """Advance one chain per seed in lockstep and return ``(n_chains, steps + 1)``.
+
+    Every chain keeps its own ``default_rng(seed)`` stream, so row ``k`` equals
+    ``simulate(P, steps, seeds[k], start_idx[k])``. With at least
+    ``lockstep_min_chains`` chains all of them share one vectorised successor
+    draw per time step; smaller batches are cheaper as scalar per-chain loops.
+    """
+    if steps < 0:
+        raise ValueError("steps must be >= 0")
+
+    sampler = build_sampler(P)
+    seeds = [int(seed) for seed in seeds]
+    n_chains = len(seeds)
+    current = np.array(
+        np.broadcast_to(np.asarray(start_idx, dtype=np.int64), (n_chains,))
+    )
+    if np.any(current < 0) or np.any(current >= sampler.n_states):
+        raise ValueError("start_idx out of range")
+
+    trajs = np.empty((n_chains, steps + 1), dtype=index_dtype(sampler.n_states))
+    trajs[:, 0] = current
+    if n_chains < lockstep_min_chains:
+        for row, seed in zip(trajs, seeds):
+            t = 0
+            for u in uniform_blocks(seed, steps):
+                sampler.sample_path(row[t], u, out=row[t : t + u.shape[0] + 1])
+                t += u.shape[0]
+        return trajs
+
+    t = 0
+    for blocks in zip(*(uniform_blocks(seed, steps) for seed in seeds)):
+        u = np.stack(blocks, axis=1)
+        block = np.empty(u.shape, dtype=np.int64)
+        for j in range(u.shape[0]):
+            current = sampler.step(current, u[j])
+            block[j] = current
+        trajs[:, t + 1 : t + u.shape[0] + 1] = block.T
+        t += u.shape[0]
+    return trajs
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import asdict
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from time_world import constraints_cones, model
+from time_world.constraints_cones import Constraint
+from time_world.model import (
+    MODEL_FORMATS,
+    StateSpace,
+    TransitionOperator,
+    _coerce_params,
+    build_model,
+)
+from time_world.utils import artifact_dir
+
+_CACHE_VERSION = 1
+_DEFAULT_MAX_BYTES = 256 * 2**20
+_DEFAULT_MAX_DISK_BYTES = 2**30
+
+
+@lru_cache(maxsize=1)
+def _builder_digest() -> str:
+    """Digest of the builder sources, so edits to the kernel invalidate disk entries."""
+    digest = hashlib.sha256()
+    for module in (model, constraints_cones):
+        digest.update(Path(module.__file__).read_bytes())
+    return digest.hexdigest()
+
+
+def _constraint_identity(constraint_mask: object) -> object:
+    if constraint_mask is None:
+        return None
+    if isinstance(constraint_mask, Constraint):
+        return {
+            "constraint": constraint_mask.name,
+            "params": [[key, _plain(value)] for key, value in constraint_mask.params],
+        }
+    if isinstance(constraint_mask, np.ndarray):
+        mask = np.ascontiguousarray(constraint_mask)
+        return {
+            "array": hashlib.sha256(mask.tobytes()).hexdigest(),
+            "dtype": mask.dtype.str,
+            "shape": list(mask.shape),
+        }
+    raise TypeError("constraint_mask has no stable identity")
+
+
+def _plain(value: object) -> object:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def model_fingerprint(params: dict, *, format: str = "dense") -> str | None:
+    """Canonical hash of the model a ``build_model(params, format=...)`` call produces.
+
+    Returns ``None`` when ``constraint_mask`` is an arbitrary callable, whose
+    behaviour cannot be identified from its value; such models are not cached.
+    """
+    if format not in MODEL_FORMATS:
+        raise ValueError(f"format must be one of {MODEL_FORMATS}")
+    cfg = _coerce_params(params)
+    try:
+        mask_id = _constraint_identity(cfg.constraint_mask)
+    except TypeError:
+        return None
+    payload = {key: value for key, value in asdict(cfg).items() if key != "constraint_mask"}
+    payload.update(
+        constraint_mask=mask_id,
+        format=format,
+        version=_CACHE_VERSION,
+        builder=_builder_digest(),
+    )
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def default_cache_dir() -> Path:
+    """Return artifacts/model_cache, creating it if missing."""
+    return artifact_dir("model_cache")
+
+
+def _freeze(P: np.ndarray | sparse.csr_array) -> np.ndarray | sparse.csr_array:
+    arrays = (P.data, P.indices, P.indptr) if sparse.issparse(P) else (P,)
+    for arr in arrays:
+        arr.flags.writeable = False
+    return P
+
+
+def _nbytes(P: np.ndarray | sparse.csr_array) -> int:
+    if sparse.issparse(P):
+        return int(P.data.nbytes + P.indices.nbytes + P.indptr.nbytes)
+    return int(P.nbytes)
+
+
+class ModelCache:
+    """LRU cache of built models with an optional on-disk layer.
+
+    Entries are keyed by :func:`model_fingerprint`. Cached transition matrices
+    are shared between callers and therefore read-only. The in-memory layer
+    holds at most ``maxsize`` matrices and, if ``max_bytes`` is set, at most
+    that many bytes of matrix data; a matrix larger than ``max_bytes`` is not
+    kept in memory at all. With ``cache_dir`` set, dense matrices are stored
+    as ``.npy`` files and loaded memory-mapped; CSR matrices are stored as
+    ``.npz``. After every write the least recently used files are deleted
+    until the directory holds at most ``max_disk_bytes`` (``None`` for no
+    limit).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 32,
+        cache_dir: str | Path | None = None,
+        *,
+        max_bytes: int | None = None,
+        max_disk_bytes: int | None = _DEFAULT_MAX_DISK_BYTES,
+    ) -> None:
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("max_bytes must be >= 0")
+        if max_disk_bytes is not None and max_disk_bytes < 0:
+            raise ValueError("max_disk_bytes must be >= 0")
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries: OrderedDict[str, np.ndarray | sparse.csr_array] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+
+    def build(
+        self, params: dict, *, format: str = "dense"
+    ) -> tuple[StateSpace, np.ndarray | sparse.csr_array | TransitionOperator]:
+        if format == "operator":
+            # Operators hold no matrix, so there is nothing worth caching.
+            return build_model(params, format=format)
+        key = model_fingerprint(params, format=format)
+        if key is None:
+            self.misses += 1
+            return build_model(params, format=format)
+
+        P = self._entries.get(key)
+        if P is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            P = self._load(key, format)
+            if P is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                _, P = build_model(params, format=format)
+                P = _freeze(P)
+                self._store(key, P)
+            self._remember(key, P)
+
+        cfg = _coerce_params(params)
+        return StateSpace(cfg.n_x, cfg.n_phi, cfg.n_r), P
+
+    def _remember(self, key: str, P: np.ndarray | sparse.csr_array) -> None:
+        size = _nbytes(P)
+        if self.maxsize == 0 or (self.max_bytes is not None and size > self.max_bytes):
+            return
+        if key not in self._entries:
+            self._entries[key] = P
+            self.nbytes += size
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize or (
+            self.max_bytes is not None and self.nbytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= _nbytes(evicted)
+
+    def _path(self, key: str, format: str) -> Path:
+        suffix = ".npz" if format == "csr" else ".npy"
+        return self.cache_dir / f"{key}{suffix}"
+
+    def _load(self, key: str, format: str) -> np.ndarray | sparse.csr_array | None:
+        if self.cache_dir is None:
+            return None
+        path = self._path(key, format)
+        if not path.exists():
+            return None
+        # The modification time doubles as the last-use time for eviction.
+        os.utime(path)
+        if format == "csr":
+            return _freeze(sparse.csr_array(sparse.load_npz(path)))
+        return np.load(path, mmap_mode="r")
+
+    def _store(self, key: str, P: np.ndarray | sparse.csr_array) -> None:
+        if self.cache_dir is None:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fmt = "csr" if sparse.issparse(P) else "dense"
+        path = self._path(key, fmt)
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp{path.suffix}")
+        if fmt == "csr":
+            sparse.save_npz(tmp, P, compressed=False)
+        else:
+            np.save(tmp, P)
+        os.replace(tmp, path)
+        self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        if self.max_disk_bytes is None:
+            return
+        files = []
+        for path in self.cache_dir.iterdir():
+            # Skip other processes' in-flight temporaries.
+            if path.suffix not in (".npy", ".npz") or ".tmp" in path.name:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+# Process-wide, so bounded by bytes as well as entries: a handful of large
+# dense matrices must not stay alive for the life of the process.
+_DEFAULT_CACHE = ModelCache(max_bytes=_DEFAULT_MAX_BYTES)
+
+
+def cached_build_model(
+    params: dict, *, format: str = "dense", cache: ModelCache | None = None
+) -> tuple[StateSpace, np.ndarray | sparse.csr_array | TransitionOperator]:
+    """``build_model`` through ``cache`` (default: a process-wide LRU of <= 256 MiB)."""
+    return (_DEFAULT_CACHE if cache is None else cache).build(params, format=format)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+from scipy import sparse
+
+_UNIFORM_BLOCK = 1 << 16
+_PADDED_WIDTH_MAX = 64
+
+
+@dataclass(frozen=True)
+class TransitionSampler:
+    """Per-row cumulative tables for drawing successors of a transition matrix.
+
+    Row ``i`` owns the slice ``indptr[i]:indptr[i + 1]`` of ``targets`` and
+    ``cdf``. ``cdf`` is the within-row cumulative probability, renormalised so
+    the last entry of every row is exactly 1.0. Given a uniform ``u`` in
+    ``[0, 1)``, the successor is ``targets[k]`` for the first ``k`` in the row
+    with ``u < cdf[k]``.
+    """
+
+    indptr: np.ndarray
+    targets: np.ndarray
+    cdf: np.ndarray
+
+    @property
+    def n_states(self) -> int:
+        return int(self.indptr.shape[0] - 1)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self.n_states, self.n_states)
+
+    @cached_property
+    def _tables(self) -> tuple[list[int], list[int], list[float]]:
+        return self.indptr.tolist(), self.targets.tolist(), self.cdf.tolist()
+
+    def draw(self, current: int, u: float) -> int:
+        """Successor of a single state for one uniform ``u``."""
+        indptr, targets, cdf = self._tables
+        return targets[bisect_right(cdf, u, indptr[current], indptr[current + 1])]
+
+    @cached_property
+    def _padded(self) -> tuple[np.ndarray, np.ndarray] | None:
+        degree = np.diff(self.indptr)
+        width = int(degree.max())
+        if width > _PADDED_WIDTH_MAX:
+            return None
+        rows = np.repeat(np.arange(self.n_states), degree)
+        pos = np.arange(self.targets.shape[0]) - np.repeat(self.indptr[:-1], degree)
+        cdf = np.full((self.n_states, width), np.inf)
+        cdf[rows, pos] = self.cdf
+        targets = np.zeros(self.n_states * width, dtype=np.int64)
+        targets[rows * width + pos] = self.targets
+        return cdf, targets
+
+    def step(self, current: np.ndarray, u: np.ndarray) -> np.ndarray:
+        """Vectorised successor draw for an array of current states.
+
+        Picks the same successor as :meth:`draw` for every element.
+        """
+        current = np.asarray(current, dtype=np.int64)
+        u = np.asarray(u, dtype=np.float64)
+        padded = self._padded
+        if padded is not None:
+            # Narrow rows: the first padded CDF entry above u is bisect_right.
+            cdf, targets = padded
+            k = (cdf[current] > u[:, None]).argmax(axis=1)
+            return targets[current * cdf.shape[1] + k]
+
+        lo = self.indptr[current]
+        hi = self.indptr[current + 1] - 1
+        active = lo < hi
+        while np.any(active):
+            mid = (lo + hi) // 2
+            right = active & (self.cdf[mid] <= u)
+            lo = np.where(right, mid + 1, lo)
+            hi = np.where(active & ~right, mid, hi)
+            active = lo < hi
+        return self.targets[lo]
+
+    def sample_path(
+        self, start_idx: int, u: np.ndarray, out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Advance one chain from ``start_idx`` consuming one uniform per step."""
+        steps = int(u.shape[0])
+        if out is None:
+            out = np.empty(steps + 1, dtype=np.int64)
+        indptr, targets, cdf = self._tables
+        current = int(start_idx)
+        out[0] = current
+        for t, draw in enumerate(u.tolist(), start=1):
+            k = bisect_right(cdf, draw, indptr[current], indptr[current + 1])
+            current = targets[k]
+            out[t] = current
+        return out
+
+
+def build_sampler(P: np.ndarray | sparse.spmatrix | TransitionSampler) -> TransitionSampler:
+    """Build (or pass through) the sampler for a dense or sparse ``P``."""
+    if isinstance(P, TransitionSampler):
+        return P
+    P = sparse.csr_array(P, dtype=np.float64, copy=True)
+    if P.ndim != 2 or P.shape[0] != P.shape[1]:
+        raise ValueError("P must be a square matrix")
+    P.sum_duplicates()
+    P.eliminate_zeros()
+    if np.any(P.data < 0):
+        raise ValueError("P must be nonnegative")
+
+    n_states = P.shape[0]
+    degree = np.diff(P.indptr)
+    if n_states == 0 or np.any(degree == 0):
+        raise ValueError("every row of P must have positive mass")
+
+    # Cumulate each row separately (padded to the max degree) so rounding
+    # does not leak between rows the way a single global cumsum would.
+    width = int(degree.max())
+    pos = np.arange(P.nnz) - np.repeat(P.indptr[:-1], degree)
+    rows = np.repeat(np.arange(n_states), degree)
+    padded = np.zeros((n_states, width), dtype=np.float64)
+    padded[rows, pos] = P.data
+    cumulative = np.cumsum(padded, axis=1)
+    cdf = cumulative[rows, pos] / cumulative[:, -1][rows]
+    cdf[P.indptr[1:] - 1] = 1.0
+
+    return TransitionSampler(
+        indptr=P.indptr.astype(np.int64),
+        targets=P.indices.astype(np.int64),
+        cdf=cdf,
+    )
+
+
+def index_dtype(n_states: int) -> np.dtype:
+    """Smallest unsigned integer dtype that can hold indices ``0..n_states-1``."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n_states - 1 <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def uniform_blocks(seed: int, steps: int):
+    """Yield the uniforms of ``default_rng(seed)`` in bounded-size blocks.
+
+    Concatenating the blocks gives ``np.random.default_rng(seed).random(steps)``.
+    """
+    rng = np.random.default_rng(seed)
+    done = 0
+    while done < steps:
+        size = min(_UNIFORM_BLOCK, steps - done)
+        yield rng.random(size)
+        done += size
@@ -1,15 +1,31 @@
 from __future__ import annotations
 
-from typing import Iterable
+import heapq
+from itertools import product
+from math import prod
+from typing import Callable, Iterable, Sequence
 
 import numpy as np
 
-from time_world.audits_ep import entropy_production_step, stationary_distribution
-from time_world.clock_audits import clock_metrics_from_run, simulate_with_maintenance
-from time_world.constraints_cones import constraint_phi_step_only, constraint_r_constant
+from time_world.audits_ep import (
+    MOVE_TYPES,
+    entropy_production_breakdown,
+    entropy_production_pair,
+    entropy_production_sensitivity,
+    stationary_distribution,
+    stationary_sensitivity,
+)
+from time_world.clock_audits import clock_metrics_from_run, maintenance_run_from_traj
+from time_world.constraints_cones import (
+    constraint_phi_odd_only,
+    constraint_phi_step_only,
+    constraint_r_constant,
+)
 from time_world.enablement import run_enablement
 from time_world.holonomy import omega_from_samples, protocol_A_identity, protocol_B_even, protocol_C_odd
-from time_world.model import build_model, preset_record_drive
+from time_world.model import preset_record_drive, simulate_batch
+from time_world.model_cache import ModelCache, cached_build_model
+from time_world.sampling import build_sampler
 
 
 def generate_cases() -> list[dict]:
@@ -23,19 +39,22 @@ def generate_cases() -> list[dict]:
         for n in phase_noise_vals:
             for rc in record_coupling_vals:
                 for cm in constraint_modes:
-                    case_id = f"d{d}_n{n}_rc{rc}_c{cm}"
-                    cases.append(
-                        {
-                            "case_id": case_id,
-                            "drive_strength": d,
-                            "phase_noise": n,
-                            "record_coupling": rc,
-                            "constraint_mode": cm,
-                        }
-                    )
+                    cases.append(make_case(d, n, rc, cm))
     return cases
 
 
+def make_case(
+    drive_strength: float, phase_noise: float, record_coupling: float, constraint_mode: str
+) -> dict:
+    return {
+        "case_id": f"d{drive_strength}_n{phase_noise}_rc{record_coupling}_c{constraint_mode}",
+        "drive_strength": drive_strength,
+        "phase_noise": phase_noise,
+        "record_coupling": record_coupling,
+        "constraint_mode": constraint_mode,
+    }
+
+
 def make_constraint_mask(mode: str, n_x: int, n_phi: int) -> tuple[str, object | None]:
     if mode == "none":
         return "none", None
@@ -44,12 +63,170 @@ def make_constraint_mask(mode: str, n_x: int, n_phi: int) -> tuple[str, object |
     if mode == "phi_step_only":
         return "phi_step_only", constraint_phi_step_only(n_phi)
     if mode == "odd_phi_only":
-        def _odd_phi_only(_from_state, to_state):
-            return (to_state[1] % 2) == 1
-        return "odd_phi_only", _odd_phi_only
+        return "odd_phi_only", constraint_phi_odd_only()
     raise ValueError(f"Unknown constraint_mode: {mode}")
 
 
+def case_params(case: dict) -> dict:
+    params = dict(preset_record_drive())
+    params["n_r"] = 8
+    params["drive_strength"] = case["drive_strength"]
+    params["phase_noise"] = case["phase_noise"]
+    params["record_coupling"] = case["record_coupling"]
+    _, params["constraint_mask"] = make_constraint_mask(
+        case["constraint_mode"], params["n_x"], params["n_phi"]
+    )
+    return params
+
+
+SWEEP_PARAMS = ("drive_strength", "phase_noise", "record_coupling")
+_PARAM_BOUNDS = {
+    "drive_strength": (-1.0, 1.0),
+    "phase_noise": (0.0, 1.0),
+    "record_coupling": (0.0, 1.0),
+}
+
+
+def ep_gradients(
+    params: dict,
+    names: Sequence[str] = SWEEP_PARAMS,
+    *,
+    step: float = 1e-4,
+    eps: float = 1e-15,
+    cache: ModelCache | None = None,
+) -> dict:
+    """EP and ``pi`` at ``params`` with their derivatives along ``names``.
+
+    ``dP`` is a central difference of the built model, clipped to each
+    parameter's range; without constraints the kernel is affine in these
+    parameters, so the difference is exact up to rounding. ``d pi`` and
+    ``d EP`` then follow analytically from one factorisation of ``P``.
+    """
+    unknown = [name for name in names if name not in _PARAM_BOUNDS]
+    if unknown:
+        raise ValueError(f"no gradient for {unknown}; choose from {SWEEP_PARAMS}")
+    _, P = cached_build_model(params, format="csr", cache=cache)
+    dPs = []
+    for name in names:
+        lower, upper = _PARAM_BOUNDS[name]
+        lo = max(params[name] - step, lower)
+        hi = min(params[name] + step, upper)
+        _, P_lo = cached_build_model({**params, name: lo}, format="csr", cache=cache)
+        _, P_hi = cached_build_model({**params, name: hi}, format="csr", cache=cache)
+        dPs.append((P_hi - P_lo) / (hi - lo))
+
+    pi, d_pi = stationary_sensitivity(P, dPs)
+    ep_raw, ep_reg = entropy_production_pair(P, pi, eps=eps)
+    d_raw, d_reg = entropy_production_sensitivity(P, dPs, pi, d_pi, eps=eps)
+    return {
+        "pi": pi,
+        "ep_raw": ep_raw,
+        "ep_reg": ep_reg,
+        "d_pi": dict(zip(names, d_pi)),
+        "d_ep_raw": {name: float(value) for name, value in zip(names, d_raw)},
+        "d_ep_reg": {name: float(value) for name, value in zip(names, d_reg)},
+    }
+
+
+def adaptive_sweep(
+    grid: dict[str, Sequence[float]],
+    evaluate: Callable[[dict], dict],
+    *,
+    tolerances: dict[str, float],
+    budget: int,
+    constraint_mode: str = "none",
+) -> tuple[list[dict], dict]:
+    """Evaluate the cells of a parameter grid only where the metrics move.
+
+    ``grid`` maps each of :data:`SWEEP_PARAMS` to its candidate values and
+    ``evaluate(case)`` is typically ``run_case_metrics`` with its keyword
+    arguments bound. The sweep starts from the corners of the whole box and
+    bisects every sub-box whose corners differ in some metric of
+    ``tolerances`` (e.g. ``ep_raw``, ``tick_failure_rate_mean``,
+    ``holonomy_H_mean``) by more than its tolerance, largest jump first, until no
+    box exceeds its tolerance or ``budget`` evaluations are spent. A finite
+    and a non-finite value (e.g. ``ep_raw = inf``) always count as a jump.
+
+    Returns the evaluated results in grid order and a report with the number
+    of evaluations and of boxes left unresolved by the budget.
+    """
+    if sorted(grid) != sorted(SWEEP_PARAMS):
+        raise ValueError(f"grid must give values for exactly {SWEEP_PARAMS}")
+    if not tolerances or any(tol <= 0 for tol in tolerances.values()):
+        raise ValueError("tolerances must be a non-empty map of positive values")
+    axes = [sorted(set(grid[key])) for key in SWEEP_PARAMS]
+    if any(not values for values in axes):
+        raise ValueError("every grid axis needs at least one value")
+
+    results: dict[tuple[int, ...], dict] = {}
+
+    def corners(lo: tuple[int, ...], hi: tuple[int, ...]) -> list[tuple[int, ...]]:
+        return sorted(set(product(*zip(lo, hi))))
+
+    def run(points: list[tuple[int, ...]]) -> bool:
+        missing = [point for point in points if point not in results]
+        if len(results) + len(missing) > budget:
+            return False
+        for point in missing:
+            values = [axis[i] for axis, i in zip(axes, point)]
+            results[point] = evaluate(make_case(*values, constraint_mode))
+        return True
+
+    def score(lo: tuple[int, ...], hi: tuple[int, ...]) -> float:
+        rows = [results[point] for point in corners(lo, hi)]
+        return max(
+            _metric_jump([row[metric] for row in rows]) / tol
+            for metric, tol in tolerances.items()
+        )
+
+    root = (tuple(0 for _ in axes), tuple(len(axis) - 1 for axis in axes))
+    unresolved = 0
+    if run(corners(*root)):
+        heap = [(-score(*root), 0, *root)]
+        pushed = 1
+        while heap:
+            neg_score, _, lo, hi = heapq.heappop(heap)
+            if -neg_score <= 1.0:
+                break
+            split = [axis for axis in range(len(axes)) if hi[axis] - lo[axis] > 1]
+            if not split:
+                continue
+            children = []
+            for halves in product((0, 1), repeat=len(split)):
+                child_lo, child_hi = list(lo), list(hi)
+                for axis, half in zip(split, halves):
+                    mid = (lo[axis] + hi[axis]) // 2
+                    if half:
+                        child_lo[axis] = mid
+                    else:
+                        child_hi[axis] = mid
+                children.append((tuple(child_lo), tuple(child_hi)))
+            if not run([point for child in children for point in corners(*child)]):
+                unresolved = 1 + sum(1 for entry in heap if -entry[0] > 1.0)
+                break
+            for child in children:
+                heapq.heappush(heap, (-score(*child), pushed, *child))
+                pushed += 1
+    else:
+        unresolved = 1
+
+    report = {
+        "evaluations": len(results),
+        "grid_size": prod(len(axis) for axis in axes),
+        "budget": budget,
+        "unresolved_boxes": unresolved,
+    }
+    return [results[point] for point in sorted(results)], report
+
+
+def _metric_jump(values: list[float]) -> float:
+    values = np.asarray(values, dtype=np.float64)
+    if np.all(np.isfinite(values)):
+        return float(values.max() - values.min())
+    same = (values == values[0]) | (np.isnan(values) & np.isnan(values[0]))
+    return 0.0 if np.all(same) else float("inf")
+
+
 def _stderr(values: list[float]) -> float:
     if len(values) < 2:
         return 0.0
@@ -60,6 +237,11 @@ def _summary(values: list[float]) -> dict[str, float]:
     return {"mean": float(np.mean(values)), "stderr": _stderr(values)}
 
 
+def ep_move_field(move: str) -> str:
+    """Result column holding the regularised EP of one move type, e.g. ``ep_reg_phi_r``."""
+    return "ep_reg_" + move.replace("+", "_")
+
+
 def run_case_metrics(
     case: dict,
     *,
@@ -68,24 +250,23 @@ def run_case_metrics(
     burn_in: int,
     stride: int,
     alpha_kl: float,
+    cache: ModelCache | None = None,
+    pi: np.ndarray | None = None,
 ) -> dict:
-    base_params = preset_record_drive()
-    params = dict(base_params)
-    params["n_r"] = 8
-    params["drive_strength"] = case["drive_strength"]
-    params["phase_noise"] = case["phase_noise"]
-    params["record_coupling"] = case["record_coupling"]
+    """Clock, EP and holonomy metrics of one sweep case.
 
-    constraint_name, constraint_mask = make_constraint_mask(
-        case["constraint_mode"], params["n_x"], params["n_phi"]
-    )
-    params["constraint_mask"] = constraint_mask
+    ``pi`` may carry a precomputed stationary distribution, e.g. from
+    :func:`stationary_distribution_batch`.
+    """
+    params = case_params(case)
+    constraint_name = case["constraint_mode"]
 
-    states, P = build_model(params)
+    states, P = cached_build_model(params, cache=cache)
+    sampler = build_sampler(P)
 
-    pi = stationary_distribution(P, tol=1e-12)
-    ep_raw = entropy_production_step(P, pi, zero_mode="inf")
-    ep_reg = entropy_production_step(P, pi, zero_mode="regularize", eps=1e-15)
+    if pi is None:
+        pi = stationary_distribution(P, tol=1e-12)
+    ep = entropy_production_breakdown(P, pi, states, eps=1e-15, top_k=1, keep_edges=False)
 
     tick_failure_rates: list[float] = []
     drift_rates: list[float] = []
@@ -98,16 +279,9 @@ def run_case_metrics(
     proto_b = protocol_B_even(params["n_phi"])
     proto_c = protocol_C_odd(params["n_phi"])
 
-    for seed in seeds:
-        run = simulate_with_maintenance(
-            states,
-            P,
-            steps,
-            seed,
-            budget_total=0,
-            burn_in=burn_in,
-            start_idx=0,
-        )
+    trajs = simulate_batch(sampler, steps + burn_in, seeds, start_idx=0)
+    for traj_full in trajs:
+        run = maintenance_run_from_traj(states, traj_full, burn_in=burn_in)
         metrics = clock_metrics_from_run(run)
         tick_failure_rates.append(metrics["tick_failure_rate"])
         drift_rates.append(metrics["drift_rate_per_1k"])
@@ -116,7 +290,7 @@ def run_case_metrics(
         tick_rates.append(metrics["tick_rate_per_1k"])
 
         traj = run["traj"]
-        samples = [states[int(idx)] for idx in traj[::stride]]
+        samples = states.tuples(traj[::stride])
         omega_ab = omega_from_samples(proto_a, proto_b, samples)["omega_mean"]
         omega_bc = omega_from_samples(proto_b, proto_c, samples)["omega_mean"]
         omega_ca = omega_from_samples(proto_c, proto_a, samples)["omega_mean"]
@@ -129,8 +303,9 @@ def run_case_metrics(
         "record_coupling": case["record_coupling"],
         "constraint_mode": case["constraint_mode"],
         "constraint_name": constraint_name,
-        "ep_raw": float(ep_raw),
-        "ep_reg": float(ep_reg),
+        "ep_raw": ep.ep_raw,
+        "ep_reg": ep.ep_reg,
+        **{ep_move_field(move): ep.by_move[move] for move in MOVE_TYPES[1:]},
         "tick_failure_rate_mean": _summary(tick_failure_rates)["mean"],
         "tick_failure_rate_stderr": _summary(tick_failure_rates)["stderr"],
         "drift_rate_per_1k_mean": _summary(drift_rates)["mean"],
@@ -162,7 +337,9 @@ def run_enablement_sweep(
     window: int,
     threshold: float,
     alpha: float = 1.0,
+    cache: ModelCache | None = None,
 ) -> list[dict]:
+    seeds = list(seeds)
     rows: list[dict] = []
     for drive_strength in drive_strength_vals:
         for phase_noise in phase_noise_vals:
@@ -179,17 +356,20 @@ def run_enablement_sweep(
                 "x_phi_coupling": 1.0,
                 "constraint_mask": None,
             }
-            states, P = build_model(params)
-            for seed in seeds:
+            states, P = cached_build_model(params, cache=cache)
+            sampler = build_sampler(P)
+            trajs = simulate_batch(sampler, steps + burn_in, seeds)
+            for seed, traj in zip(seeds, trajs):
                 outcome = run_enablement(
                     states,
-                    P,
+                    sampler,
                     seed=seed,
                     steps=steps,
                     burn_in=burn_in,
                     window=window,
                     threshold=threshold,
                     alpha=alpha,
+                    traj=traj,
                 )
                 row = {
                     "drive_strength": drive_strength,
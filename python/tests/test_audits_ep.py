@@ -1,6 +1,23 @@
 import numpy as np
+import pytest
+from scipy import sparse
 
-from time_world.audits_ep import entropy_production_step, stationary_distribution
+from time_world import audits_ep
+from time_world.audits_ep import (
+    MOVE_TYPES,
+    choose_run_length,
+    entropy_production_batch,
+    entropy_production_breakdown,
+    entropy_production_sensitivity,
+    entropy_production_pair,
+    entropy_production_step,
+    spectral_gap,
+    stationary_decomposition,
+    stationary_distribution,
+    stationary_distribution_batch,
+    stationary_sensitivity,
+)
+from time_world.constraints_cones import constraint_r_constant
 from time_world.model import build_model, preset_record_drive, preset_reversibleish
 
 
@@ -27,3 +44,245 @@ def test_stationary_distribution_and_ep():
 
     assert abs(ep_rev) < 1e-10
     assert np.isinf(ep_rec) or ep_rec > ep_rev + 1e-8
+
+
+def test_sparse_backend_matches_dense():
+    params = dict(preset_record_drive())
+    params["constraint_mask"] = constraint_r_constant()
+    for preset in (preset_record_drive(), params):
+        _, P_d = build_model(preset)
+        _, P_s = build_model(preset, format="csr")
+        assert np.allclose(P_s.toarray(), P_d, atol=1e-15)
+
+        pi_d = stationary_distribution(P_d)
+        pi_s = stationary_distribution(P_s)
+        assert np.allclose(pi_s, pi_d, atol=1e-10)
+
+        for mode in ("inf", "regularize"):
+            ep_d = entropy_production_step(P_d, pi_d, zero_mode=mode)
+            ep_s = entropy_production_step(P_s, pi_s, zero_mode=mode)
+            assert ep_d == ep_s or abs(ep_d - ep_s) < 1e-9
+
+
+@pytest.mark.parametrize(
+    "method", ["auto", "power", "anderson", "direct", "gmres", "bicgstab", "arnoldi"]
+)
+def test_stationary_methods_agree(method):
+    params = preset_record_drive()
+    params["n_r"] = 6
+    _, P = build_model(params, format="csr")
+    reference = stationary_distribution(P, method="power", tol=1e-14)
+    pi = stationary_distribution(P, method=method)
+    np.testing.assert_allclose(pi, reference, atol=1e-10)
+
+
+def test_auto_solves_periodic_chain():
+    P = np.array([[0.0, 1.0, 0.0], [0.5, 0.0, 0.5], [0.0, 1.0, 0.0]])
+    with pytest.raises(ValueError):
+        stationary_distribution(P, method="power", max_iter=1_000)
+    for method in ("auto", "anderson", "arnoldi"):
+        np.testing.assert_allclose(
+            stationary_distribution(P, method=method), [0.25, 0.5, 0.25], atol=1e-12
+        )
+
+
+def test_auto_picks_solver_by_nonzeros(monkeypatch):
+    params = preset_record_drive()
+    _, P = build_model(params, format="csr")
+    states, P_big = build_model({**params, "n_r": 32}, format="csr")
+    _, P_huge = build_model({**params, "n_r": 64}, format="csr")
+    monkeypatch.setattr(audits_ep, "_DIRECT_MAX_NNZ", P.nnz)
+    monkeypatch.setattr(audits_ep, "_ILU_MAX_NNZ", P_big.nnz)
+
+    reference = stationary_distribution(P_big, method="direct")
+    for P_case, blocks, expected in [
+        (P, None, "direct"),
+        (P_big, None, "gmres"),
+        (P_huge, None, "power"),
+        (P_big, states.r, "iad"),
+    ]:
+        pi, info = stationary_distribution(P_case, blocks=blocks, return_info=True)
+        assert info["method"] == expected
+        if P_case is P_big:
+            np.testing.assert_allclose(pi, reference, atol=1e-10)
+
+
+def test_aggregation_disaggregation_over_record_levels():
+    params = preset_record_drive()
+    params.update(n_r=32, record_backslide_prob=0.005)
+    states, P = build_model(params, format="csr")
+    reference = stationary_distribution(P, method="direct")
+    pi, info = stationary_distribution(P, method="iad", blocks=states.r, return_info=True)
+    np.testing.assert_allclose(pi, reference, atol=1e-12)
+    assert info["matvecs"] <= 20
+
+    params["constraint_mask"] = constraint_r_constant()
+    states, P = build_model(params, format="csr")
+    with pytest.raises(ValueError, match="closed"):
+        stationary_distribution(P, method="iad", blocks=states.r)
+
+
+def test_aggregation_disaggregation_rejects_closed_record_level():
+    # Without backslide the top record level is closed, though P still has a
+    # single closed class.
+    params = preset_record_drive()
+    params.update(record_backslide_prob=0.0, n_phi=16, n_r=32)
+    states, P = build_model(params, format="csr")
+    with pytest.raises(ValueError, match="closed"):
+        stationary_distribution(P, method="iad", blocks=states.r)
+    pi = stationary_distribution(P, method="gmres")
+    assert pi[states.r < 31].sum() < 1e-9
+
+    auto, info = stationary_distribution(P, blocks=states.r, return_info=True)
+    assert info["method"] == "gmres"
+    np.testing.assert_allclose(auto, pi, atol=1e-10)
+
+
+def test_class_decomposition_reproduces_power_limit():
+    params = preset_record_drive()
+    params.update(n_r=4, record_backslide_prob=0.1)
+    params["constraint_mask"] = constraint_r_constant()
+    _, P = build_model(params)
+
+    decomposition = stationary_decomposition(P)
+    assert len(decomposition.classes) == 4
+    np.testing.assert_allclose(decomposition.absorption.sum(axis=1), 1.0)
+    np.testing.assert_allclose(
+        stationary_distribution(P), stationary_distribution(P, method="power"), atol=1e-10
+    )
+
+    # Mass starting on a transient record level drains into the r = 0 class.
+    params["constraint_mask"] = None
+    params.update(record_coupling=0.0)
+    _, P = build_model(params)
+    decomposition = stationary_decomposition(P)
+    start = np.zeros(P.shape[0])
+    start[3] = 1.0
+    assert decomposition.transient.size > 0
+    np.testing.assert_allclose(
+        decomposition.limit(start),
+        stationary_distribution(P, method="power", pi0=start),
+        atol=1e-10,
+    )
+
+
+def test_entropy_production_pair_matches_single_modes():
+    params = preset_record_drive()
+    params["n_r"] = 6
+    for constraint in (None, constraint_r_constant()):
+        params["constraint_mask"] = constraint
+        for format in ("dense", "csr"):
+            _, P = build_model(params, format=format)
+            pi = stationary_distribution(P)
+            raw, reg = entropy_production_pair(P, pi)
+            assert raw == entropy_production_step(P, pi, zero_mode="inf")
+            assert reg == pytest.approx(
+                entropy_production_step(P, pi, zero_mode="regularize"), rel=1e-12
+            )
+
+
+def test_entropy_production_breakdown_matches_dense_edges():
+    params = preset_record_drive()
+    params["n_r"] = 5
+    states, P = build_model(params)
+    pi = stationary_distribution(P)
+    flux = pi[:, None] * P
+    dense = np.where(P > 0, flux * np.log((P + 1e-15) / (P.T + 1e-15)), 0.0)
+
+    for matrix in (P, build_model(params, format="csr")[1]):
+        ep = entropy_production_breakdown(matrix, pi, states, top_k=5)
+        assert ep.ep_raw == entropy_production_step(P, pi, zero_mode="inf")
+        assert ep.ep_reg == pytest.approx(dense.sum(), rel=1e-12)
+        assert sum(ep.by_move.values()) == pytest.approx(ep.ep_reg, rel=1e-12)
+        assert ep.by_move["idle"] == 0.0
+
+        edges = np.zeros_like(dense)
+        edges[ep.rows, ep.cols] = ep.contrib
+        np.testing.assert_allclose(edges, dense, rtol=1e-12, atol=1e-18)
+
+        expected = np.sort(dense.ravel())[::-1][:5]
+        np.testing.assert_allclose([c for _, _, c in ep.top], expected, rtol=1e-12)
+        for i, j, c in ep.top:
+            assert dense[i, j] == pytest.approx(c, rel=1e-12)
+
+    coords = np.array(states.coords).T
+    rows, cols = np.nonzero(P)
+    changed = coords[rows] != coords[cols]
+    code = changed @ np.array([1, 2, 4])
+    for k, move in enumerate(MOVE_TYPES):
+        assert ep.by_move[move] == pytest.approx(
+            dense[rows[code == k], cols[code == k]].sum(), rel=1e-10, abs=1e-15
+        )
+    assert entropy_production_breakdown(P, pi, states, keep_edges=False).rows is None
+
+
+def test_batch_audits_match_single_solves():
+    Ps = []
+    for drive in (0.0, 0.5, 0.9):
+        for constraint in (None, constraint_r_constant()):
+            params = preset_record_drive()
+            params.update(n_r=4, drive_strength=drive, constraint_mask=constraint)
+            Ps.append(build_model(params, format="csr")[1])
+    single = np.array([stationary_distribution(P) for P in Ps])
+    pairs = np.array([entropy_production_pair(P, pi) for P, pi in zip(Ps, single)])
+
+    # Constrained and unconstrained chains differ in pattern; sparse input is
+    # stored on the union pattern.
+    for stack in (Ps, np.stack([P.toarray() for P in Ps])):
+        pis = stationary_distribution_batch(stack)
+        np.testing.assert_allclose(pis, single, atol=1e-10)
+        raw, reg = entropy_production_batch(stack, pis)
+        np.testing.assert_allclose(raw, pairs[:, 0], rtol=1e-9)
+        np.testing.assert_allclose(reg, pairs[:, 1], rtol=1e-9)
+
+
+def test_sensitivity_of_reversible_ring_is_exact():
+    def ring(a):
+        return np.array(
+            [
+                [0.2, 0.4 + a, 0.4 - a],
+                [0.4 - a, 0.2, 0.4 + a],
+                [0.4 + a, 0.4 - a, 0.2],
+            ]
+        )
+
+    # pi stays uniform for every a, and EP = (2a) * log((0.4 + a) / (0.4 - a)).
+    a = 0.1
+    dP = ring(1.0) - ring(0.0)
+    pi, d_pi = stationary_sensitivity(ring(a), [dP])
+    np.testing.assert_allclose(pi, np.full(3, 1 / 3))
+    np.testing.assert_allclose(d_pi, 0.0, atol=1e-14)
+
+    expected = 2 * np.log((0.4 + a) / (0.4 - a)) + 2 * a * (1 / (0.4 + a) + 1 / (0.4 - a))
+    d_raw, d_reg = entropy_production_sensitivity(ring(a), [dP], pi, d_pi)
+    assert d_raw[0] == pytest.approx(expected, rel=1e-12)
+    assert d_reg[0] == pytest.approx(expected, rel=1e-12)
+
+
+@pytest.mark.parametrize("n", [40, 600])
+@pytest.mark.parametrize("method", ["arnoldi", "reversible"])
+def test_spectral_gap_of_lazy_ring(n, method):
+    shift = sparse.csr_array(np.roll(np.eye(n), 1, axis=1))
+    P = 0.5 * sparse.eye_array(n) + 0.25 * (shift + shift.T)
+    gap = spectral_gap(sparse.csr_array(P), method=method)
+    expected = 0.5 - 0.5 * np.cos(2 * np.pi / n)
+    assert gap.gap == pytest.approx(expected, rel=1e-6)
+    assert gap.relaxation_time == pytest.approx(1 / expected, rel=1e-6)
+
+
+def test_periodic_chain_has_no_gap():
+    P = np.roll(np.eye(3), 1, axis=1)
+    assert spectral_gap(P).relaxation_time == float("inf")
+    budget = choose_run_length(P, target_stderr=0.01, max_steps=1_000)
+    assert budget["capped"] and budget["steps"] == budget["burn_in"] == 1_000
+
+
+def test_run_length_grows_with_relaxation_time():
+    fast = np.array([[0.5, 0.5], [0.5, 0.5]])
+    slow = np.array([[0.99, 0.01], [0.01, 0.99]])
+    fast_run = choose_run_length(fast, target_stderr=0.01)
+    slow_run = choose_run_length(slow, target_stderr=0.01)
+    assert slow_run["relaxation_time"] == pytest.approx(1 / 0.02)
+    assert slow_run["steps"] > 10 * fast_run["steps"]
+    assert slow_run["burn_in"] > fast_run["burn_in"]
+    assert choose_run_length(slow, target_stderr=0.01, n_chains=4)["steps"] < slow_run["steps"]
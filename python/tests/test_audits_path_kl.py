@@ -1,15 +1,28 @@
+from collections import Counter
+
 import numpy as np
+import pytest
 
 from time_world.audits_path_kl import (
+    MergeablePathCounts,
+    PathCountSketch,
+    PathCounts,
+    PathKLEstimator,
     apply_lens,
     count_paths,
+    count_paths_multi,
+    estimate_sigma_T_lenses,
     estimate_sigma_T_macro_from_micro,
     estimate_sigma_T_micro,
+    estimate_sigma_Ts_for_lenses,
     lens_drop_phi,
     lens_drop_r,
     lens_identity,
+    merge_path_counts,
+    project_traj,
+    stream_sigma_Ts_for_lenses,
 )
-from time_world.model import build_model, preset_record_drive, simulate
+from time_world.model import build_model, preset_record_drive, simulate, stream_simulate
 
 
 def test_dpi_for_path_kl():
@@ -43,3 +56,178 @@ def test_dpi_for_path_kl():
         assert abs(sigma_identity - sigma_micro) < 1e-10
         assert sigma_drop_r < sigma_micro - 1e-6
         assert sigma_drop_phi <= sigma_micro + 1e-12
+
+
+def test_compact_trajectories_need_no_upcast():
+    states, P = build_model(preset_record_drive())
+    _, map_drop_r = apply_lens(states, lens_drop_r)
+    traj = simulate(P, 5_000, seed=3)
+    assert traj.dtype == np.uint16
+    assert map_drop_r.dtype == np.uint8
+
+    projected = project_traj(traj, map_drop_r)
+    assert projected.dtype == np.uint8
+    assert np.array_equal(projected, map_drop_r[traj.astype(np.int64)])
+    assert count_paths(traj, 3) == count_paths(traj.astype(np.int64), 3)
+
+
+@pytest.mark.parametrize("scale", [1, 10**9])
+def test_count_paths_matches_naive_windows(scale):
+    traj = np.random.default_rng(0).integers(0, 5, size=2_000) * scale
+    for T in (1, 2, 4):
+        naive = Counter(tuple(traj[i : i + T + 1].tolist()) for i in range(traj.shape[0] - T))
+        counts, total = count_paths(traj, T)
+        assert isinstance(counts, PathCounts)
+        assert total == traj.shape[0] - T == counts.total
+        assert counts == dict(naive)
+        assert counts.get(tuple(traj[: T + 1].tolist())) == naive[tuple(traj[: T + 1].tolist())]
+        assert counts.get((-1,) * (T + 1)) is None
+        assert counts.get((0,) * T) is None
+
+        sigma = estimate_sigma_T_micro(counts, total, alpha=1.0)
+        assert sigma == pytest.approx(estimate_sigma_T_micro(dict(naive), total, alpha=1.0))
+
+
+def test_multi_horizon_counts_match_single_horizons():
+    rng = np.random.default_rng(1)
+    for traj, Ts in (
+        (rng.integers(0, 3, size=3_000), [1, 2, 5, 30, 41]),
+        (rng.integers(0, 400, size=3_000).astype(np.uint16), [1, 3, 6, 7, 9]),
+    ):
+        by_T = count_paths_multi(traj, Ts)
+        assert sorted(by_T) == sorted(Ts)
+        for T in Ts:
+            counts, total = count_paths(traj, T)
+            assert by_T[T] == counts and by_T[T].total == total
+            assert by_T[T].paths.dtype == traj.dtype
+
+
+def test_lens_sigmas_match_dict_aggregation():
+    states, P = build_model(preset_record_drive())
+    lens_maps = {
+        name: apply_lens(states, lens)[1]
+        for name, lens in (("drop_r", lens_drop_r), ("drop_phi", lens_drop_phi))
+    }
+    traj = simulate(P, 6_000, seed=2)
+    counts, total = count_paths(traj, 3)
+    sigmas = estimate_sigma_T_lenses(counts, total, lens_maps, alpha=0.5)
+
+    # Reference: aggregate smoothed micro probabilities path by path.
+    plain = counts.to_dict()
+    support = set(plain) | {w[::-1] for w in plain}
+    alpha_per = 0.5 / len(support)
+    for name, mapping in lens_maps.items():
+        p_y: dict = Counter()
+        q_y: dict = Counter()
+        for w in support:
+            y = tuple(mapping[list(w)].tolist())
+            p_y[y] += (plain.get(w, 0) + alpha_per) / (total + 0.5)
+            q_y[y] += (plain.get(w[::-1], 0) + alpha_per) / (total + 0.5)
+        expected = sum(p * np.log(p / q_y[y]) for y, p in p_y.items())
+        assert sigmas[name] == pytest.approx(expected, rel=1e-10)
+        assert estimate_sigma_T_macro_from_micro(
+            counts, total, mapping, alpha=0.5
+        ) == pytest.approx(expected, rel=1e-10)
+
+
+def test_streaming_estimator_matches_whole_trajectory():
+    states, P = build_model(preset_record_drive())
+    lens_maps = {"drop_r": apply_lens(states, lens_drop_r)[1]}
+    traj = simulate(P, 20_000, seed=5)
+    Ts = (1, 4, 9)
+
+    estimator = PathKLEstimator(Ts, lens_maps, alpha=1.0, burn_in=500)
+    rng = np.random.default_rng(0)
+    start = 0
+    while start < traj.shape[0]:
+        # Chunks both shorter and longer than the longest window.
+        size = int(rng.choice([1, 3, 10, 2_000]))
+        estimator.update(traj[start : start + size])
+        start += size
+
+    by_T = count_paths_multi(traj[500:], Ts)
+    for T in Ts:
+        assert estimator.counts(T) == by_T[T]
+        assert estimator.counts(T).total == by_T[T].total
+    assert estimator.estimate() == estimate_sigma_Ts_for_lenses(
+        traj[500:], Ts, lens_maps, alpha=1.0
+    )
+
+
+def test_streaming_audit_can_stop_early():
+    _, P = build_model(preset_record_drive())
+    chunks = stream_simulate(P, 400_000, seed=6)
+    _, info = stream_sigma_Ts_for_lenses(chunks, (1, 2), {}, alpha=1.0, rtol=0.05)
+    assert info["stopped_early"] and info["chunks"] < 7
+
+
+def _segments(traj, cuts):
+    bounds = [0, *cuts, traj.shape[0]]
+    return [traj[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def test_merged_segment_counts_equal_single_pass():
+    _, P = build_model(preset_record_drive())
+    traj = simulate(P, 30_000, seed=8)
+    Ts = (1, 3, 12)
+    # Segments shorter than every horizon still carry their states across.
+    parts = [
+        MergeablePathCounts.from_traj(segment, Ts)
+        for segment in _segments(traj, [4, 5, 13, 10_000, 10_011, 22_000])
+    ]
+    left = merge_path_counts(parts)
+    grouped = parts[0].merge(parts[1]).merge(
+        parts[2].merge(parts[3].merge(parts[4])).merge(parts[5].merge(parts[6]))
+    )
+
+    by_T = count_paths_multi(traj, Ts)
+    for merged in (left, grouped):
+        assert merged.length == traj.shape[0]
+        for T in Ts:
+            assert merged.counts(T) == by_T[T]
+            assert merged.counts(T).total == by_T[T].total
+    with pytest.raises(ValueError):
+        parts[0].counts(12)
+
+
+def test_path_sketch_merges_exactly_and_bounds_counts():
+    _, P = build_model(preset_record_drive())
+    traj = simulate(P, 100_000, seed=9)
+    T = 6
+    whole = PathCountSketch.from_traj(traj, T, top_k=32)
+    merged = merge_path_counts(
+        PathCountSketch.from_traj(segment, T, top_k=32)
+        for segment in _segments(traj, [3, 25_000, 25_004, 60_000])
+    )
+    np.testing.assert_array_equal(merged.table, whole.table)
+    assert merged.total == traj.shape[0] - T
+
+    exact, _ = count_paths(traj, T)
+    assert np.all(merged.estimate(exact.paths) >= exact.counts)
+    heavy = merged.heavy_hitters()
+    assert np.all(heavy.counts >= exact.counts[exact.find(heavy.paths)])
+    top = exact.paths[np.argsort(-exact.counts, kind="stable")[:10]]
+    assert np.all(heavy.find(top) >= 0)
+
+
+def test_constant_trajectory_and_lens_give_zero_sigma():
+    traj = np.zeros(50, dtype=np.uint8)
+    lens_maps = {"const": np.zeros(1, np.uint8)}
+    estimate = estimate_sigma_Ts_for_lenses(traj, (1, 3), lens_maps, alpha=1.0)
+    assert estimate[3] == {"micro": 0.0, "lenses": {"const": 0.0}}
+
+    estimator = PathKLEstimator((1, 3), alpha=1.0)
+    estimator.update(traj)
+    assert estimator.estimate()[1]["micro"] == 0.0
+
+    counts, total = count_paths(np.tile([0, 1], 20), 3)
+    lenses = estimate_sigma_T_lenses(counts, total, {"const": np.zeros(2, np.uint8)}, alpha=1.0)
+    assert lenses == {"const": 0.0}
+
+
+def test_count_paths_accepts_negative_states():
+    traj = np.array([-1, 0, 1, 0, -1])
+    counts, total = count_paths(traj, 1)
+    assert total == 4
+    assert counts == {(-1, 0): 1, (0, 1): 1, (1, 0): 1, (0, -1): 1}
+    assert count_paths_multi(traj, (1, 2))[2] == {(-1, 0, 1): 1, (0, 1, 0): 1, (1, 0, -1): 1}
@@ -1,3 +1,5 @@
+import numpy as np
+
 from time_world.clock_audits import clock_metrics_from_run, simulate_with_maintenance
 from time_world.model import build_model, preset_record_drive
 
@@ -38,3 +40,25 @@ def test_budget_reduces_tick_failure():
     metrics_high = clock_metrics_from_run(run_high)
 
     assert metrics_high["tick_failure_rate"] < metrics_low["tick_failure_rate"]
+
+
+def test_unrepaired_fast_path_matches_step_loop():
+    params = dict(preset_record_drive())
+    params["drive_strength"] = 1.0
+    params["phase_noise"] = 0.0
+    states, P = build_model(params)
+
+    # No drift is possible, so the repair loop (budget > 0) never fires and
+    # must agree with the vectorised budget-0 summary.
+    looped = simulate_with_maintenance(
+        states, P, 3_000, seed=4, budget_total=10, burn_in=300
+    )
+    fast = simulate_with_maintenance(
+        states, P, 3_000, seed=4, budget_total=0, burn_in=300
+    )
+    assert looped["drift_detected_pre"] == 0
+    for key, value in looped.items():
+        if isinstance(value, np.ndarray):
+            assert np.array_equal(value, fast[key])
+        else:
+            assert value == fast[key]
@@ -1,14 +1,24 @@
+from itertools import product
+
 import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
 
 from time_world.audits_ep import entropy_production_step, stationary_distribution
 from time_world.clock_audits import clock_metrics_from_run, simulate_with_maintenance
 from time_world.constraints_cones import (
     adjacency_from_P,
+    communicating_classes,
+    constraint_local_x,
+    constraint_phi_forbid_pm1,
     constraint_phi_forbid_zero,
+    constraint_phi_odd_only,
+    constraint_phi_step_only,
     constraint_r_constant,
+    evaluate_constraint,
     reachable_sizes,
 )
-from time_world.model import build_model
+from time_world.model import build_model, preset_record_drive
 
 
 def test_constraints_cones_small():
@@ -61,3 +71,80 @@ def test_constraints_cones_small():
     )
     metrics = clock_metrics_from_run(run)
     assert metrics["tick_rate_per_1k"] < 1e-9
+
+
+def test_constraints_and_cones_on_csr():
+    params = {
+        "n_x": 2,
+        "n_phi": 4,
+        "n_r": 4,
+        "p_x": 0.2,
+        "p_phi": 0.7,
+        "drive_strength": 0.6,
+        "phase_noise": 0.05,
+        "record_coupling": 0.5,
+        "record_backslide_prob": 0.02,
+        "constraint_mask": constraint_phi_forbid_zero(),
+    }
+    states, P_d = build_model(params)
+    _, P_s = build_model(params, format="csr")
+    assert np.allclose(P_s.toarray(), P_d, atol=1e-15)
+
+    adj_d = adjacency_from_P(P_d)
+    adj_s = adjacency_from_P(P_s)
+    assert all(np.array_equal(a, b) for a, b in zip(adj_d, adj_s))
+
+    run = simulate_with_maintenance(
+        states, P_s, steps=2_000, seed=0, budget_total=0, burn_in=100
+    )
+    assert clock_metrics_from_run(run)["tick_rate_per_1k"] < 1e-9
+
+
+def test_vectorized_constraints_match_pairwise():
+    states = list(product(range(3), range(6), range(2)))
+    coords = np.array(states)
+    src = tuple(coords[:, None, i] for i in range(3))
+    dst = tuple(coords[None, :, i] for i in range(3))
+    constraints = [
+        constraint_r_constant(),
+        constraint_phi_forbid_pm1(6),
+        constraint_phi_step_only(6),
+        constraint_phi_forbid_zero(),
+        constraint_phi_odd_only(),
+        constraint_local_x(3, radius=0),
+        constraint_local_x(3, radius=1, periodic=False),
+    ]
+    for constraint in constraints:
+        expected = np.array([[constraint(a, b) for b in states] for a in states])
+        mask = evaluate_constraint(constraint, src, dst)
+        assert mask.shape == expected.shape
+        assert np.array_equal(mask, expected), constraint.name
+
+
+def test_communicating_classes_match_scipy():
+    rng = np.random.default_rng(3)
+    for density in (0.02, 0.05, 0.2):
+        dense = (rng.random((60, 60)) < density).astype(float)
+        adj = adjacency_from_P(dense)
+        labels, closed = communicating_classes(adj)
+        n_ref, ref = csgraph.connected_components(dense, directed=True, connection="strong")
+        assert closed.shape[0] == n_ref
+        # Same partition, possibly with different label values.
+        assert len(set(zip(labels.tolist(), ref.tolist()))) == n_ref
+        leaves = {labels[i] for i, row in enumerate(adj) if np.any(labels[row] != labels[i])}
+        assert set(np.flatnonzero(~closed).tolist()) == leaves
+
+        for matrix in (dense, sparse.csr_array(dense)):
+            same_labels, same_closed = communicating_classes(matrix)
+            assert np.array_equal(same_labels, labels)
+            assert np.array_equal(same_closed, closed)
+
+
+def test_constraint_splits_record_levels_into_closed_classes():
+    params = preset_record_drive()
+    params["n_r"] = 4
+    params["constraint_mask"] = constraint_r_constant()
+    _, P = build_model(params)
+    labels, closed = communicating_classes(adjacency_from_P(P))
+    assert closed.sum() == 4
+    assert np.all(closed[labels])
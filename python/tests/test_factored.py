@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from time_world.audits_ep import stationary_distribution
+from time_world.factored import (
+    FactoredChain,
+    KronTerm,
+    record_backslide,
+    record_increment,
+    ring_shift,
+    three_factor_chain,
+    uniform_kernel,
+)
+from time_world.model import build_model, preset_record_drive, preset_reversibleish
+
+
+@pytest.mark.parametrize("preset", [preset_reversibleish, preset_record_drive])
+def test_three_factor_chain_matches_build_model(preset):
+    params = preset()
+    params["x_phi_coupling"] = 0.4
+    _, P = build_model(params)
+    chain = three_factor_chain(params)
+    np.testing.assert_allclose(chain.to_dense(), P, rtol=0, atol=1e-15)
+
+    v = np.random.default_rng(0).random(P.shape[0])
+    np.testing.assert_allclose(chain.rmatvec(v), v @ P, rtol=1e-13)
+    np.testing.assert_allclose(chain.matvec(v), P @ v, rtol=1e-13)
+    np.testing.assert_allclose(
+        stationary_distribution(chain), stationary_distribution(P), atol=1e-10
+    )
+
+
+def test_two_clock_chain_is_stochastic():
+    # Two phase rings driven independently, plus one record register that
+    # advances with the first clock and slides back afterwards.
+    dims = (5, 7, 4)
+    step = (
+        KronTerm(0.2, (None, None, None)),
+        KronTerm(0.4, (ring_shift(5, 1), None, record_increment(4, 0.5))),
+        KronTerm(0.3, (None, ring_shift(7, 1), None)),
+        KronTerm(0.1, (uniform_kernel(5), uniform_kernel(7), None)),
+    )
+    slide = (KronTerm(1.0, (None, None, record_backslide(4, 0.1))),)
+    chain = FactoredChain(dims=dims, stages=(step, slide))
+
+    P = chain.to_dense()
+    np.testing.assert_allclose(P.sum(axis=1), 1.0, atol=1e-14)
+    np.testing.assert_allclose(chain.matvec(np.ones(chain.n_states)), 1.0, atol=1e-14)
+    pi = stationary_distribution(chain)
+    np.testing.assert_allclose(chain.rmatvec(pi), pi, atol=1e-11)
+
+
+def test_three_factor_chain_rejects_constraints():
+    params = preset_reversibleish()
+    params["constraint_mask"] = lambda a, b: True
+    with pytest.raises(ValueError):
+        three_factor_chain(params)
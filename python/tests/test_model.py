@@ -1,6 +1,20 @@
+from dataclasses import replace
+from itertools import product
+
 import numpy as np
+import pytest
 
-from time_world.model import build_model, preset_record_drive, preset_reversibleish, simulate
+from time_world.audits_ep import entropy_production_step, stationary_distribution
+from time_world.constraints_cones import constraint_phi_forbid_value
+from time_world.model import (
+    StateSpace,
+    build_model,
+    preset_record_drive,
+    preset_reversibleish,
+    simulate,
+    stream_simulate,
+)
+from time_world.sampling import build_sampler
 
 
 def _assert_stochastic(P: np.ndarray) -> None:
@@ -9,6 +23,58 @@ def _assert_stochastic(P: np.ndarray) -> None:
     assert np.all(np.abs(row_sums - 1.0) < 1e-12)
 
 
+def _reference_P(params: dict) -> np.ndarray:
+    n_x, n_phi, n_r = params["n_x"], params["n_phi"], params["n_r"]
+    p_x, p_phi = params["p_x"], params["p_phi"]
+    back = params["record_backslide_prob"]
+    coupling = params.get("x_phi_coupling", 0.0)
+    p_fwd = 0.5 * (1.0 + params["drive_strength"])
+    p_bwd = 0.5 * (1.0 - params["drive_strength"])
+
+    def idx(x, phi, r):
+        return (x * n_phi + phi) * n_r + r
+
+    P = np.zeros((n_x * n_phi * n_r,) * 2)
+
+    def add(row, x, phi, r, prob):
+        if prob <= 0:
+            return
+        if r == 0 or back <= 0:
+            row[idx(x, phi, r)] += prob
+            return
+        row[idx(x, phi, r)] += prob * (1.0 - back)
+        row[idx(x, phi, r - 1)] += prob * back
+
+    for x in range(n_x):
+        for phi in range(n_phi):
+            for r in range(n_r):
+                row = P[idx(x, phi, r)]
+                add(row, x, phi, r, 1.0 - p_x - p_phi)
+                if p_x > 0:
+                    base = p_x * (1.0 - coupling)
+                    for x_next in range(n_x):
+                        add(row, x_next, phi, r, base / n_x if base > 0 else 0.0)
+                    if coupling > 0:
+                        step = 1 if phi < n_phi / 2 else -1
+                        add(row, (x + step) % n_x, phi, r, p_x * coupling)
+                if p_phi > 0:
+                    if params["phase_noise"] > 0:
+                        for phi_next in range(n_phi):
+                            add(row, x, phi_next, r, p_phi * params["phase_noise"] / n_phi)
+                    move = p_phi * (1.0 - params["phase_noise"])
+                    if move > 0:
+                        fwd = move * p_fwd
+                        phi_f = (phi + 1) % n_phi
+                        if fwd > 0:
+                            if params["record_coupling"] > 0 and r + 1 < n_r:
+                                add(row, x, phi_f, r + 1, fwd * params["record_coupling"])
+                                add(row, x, phi_f, r, fwd * (1.0 - params["record_coupling"]))
+                            else:
+                                add(row, x, phi_f, r, fwd)
+                        add(row, x, (phi - 1) % n_phi, r, move * p_bwd)
+    return P
+
+
 def test_presets_build_and_simulate():
     for preset in (preset_reversibleish(), preset_record_drive()):
         states, P = build_model(preset)
@@ -16,3 +82,91 @@ def test_presets_build_and_simulate():
         _assert_stochastic(P)
         traj = simulate(P, steps=10_000, seed=123)
         assert traj.shape[0] == 10_001
+
+
+def test_vectorized_builder_matches_reference_bitwise():
+    variants = [
+        preset_reversibleish(),
+        preset_record_drive(),
+        {**preset_record_drive(), "x_phi_coupling": 0.4, "n_phi": 5, "n_r": 3},
+        {**preset_record_drive(), "record_coupling": 1.0, "phase_noise": 0.0},
+        {**preset_reversibleish(), "drive_strength": -1.0, "n_r": 4, "record_backslide_prob": 0.3},
+    ]
+    for params in variants:
+        states, P = build_model(params)
+        assert len(states) == P.shape[0]
+        assert np.array_equal(P, _reference_P(params))
+
+
+def test_csr_format_matches_dense():
+    params = {**preset_record_drive(), "x_phi_coupling": 0.3}
+    states_d, P_d = build_model(params)
+    states_s, P_s = build_model(params, format="csr")
+    assert states_s == states_d
+    assert P_s.nnz < P_d.size // 4
+    assert np.allclose(P_s.toarray(), P_d, atol=1e-15)
+    traj = simulate(P_s, steps=2_000, seed=1)
+    assert np.all(P_d[traj[:-1], traj[1:]] > 0)
+
+
+def test_trajectories_use_compact_dtype():
+    _, P_small = build_model(preset_reversibleish())
+    _, P_large = build_model({**preset_record_drive(), "n_r": 128})
+    assert simulate(P_small, steps=100, seed=0).dtype == np.uint8
+    assert simulate(P_large, steps=100, seed=0).dtype == np.uint16
+
+
+def test_state_space_behaves_like_tuple_list():
+    states, _ = build_model(preset_reversibleish())
+    legacy = list(product(range(3), range(8), range(1)))
+    assert list(states) == legacy
+    assert len(states) == len(legacy)
+    assert [states[i] for i in range(len(states))] == legacy
+    assert states[-1] == legacy[-1]
+    assert states.index((2, 5, 0)) == legacy.index((2, 5, 0))
+    assert (3, 0, 0) not in states
+
+    space = StateSpace(2, 3, 4)
+    idx = np.arange(len(space))
+    x, phi, r = space.decode(idx)
+    np.testing.assert_array_equal(space.encode(x, phi, r), idx)
+    assert space.tuples(idx[::5]) == list(space)[::5]
+    assert StateSpace.from_states(list(space)) == space
+    with pytest.raises(ValueError):
+        StateSpace.from_states(list(space)[::-1])
+
+
+def test_operator_format_matches_csr():
+    params = preset_record_drive()
+    params["n_r"] = 4
+    params["constraint_mask"] = constraint_phi_forbid_value(3)
+    _, P = build_model(params, format="csr")
+    _, op = build_model(params, format="operator")
+    op = replace(op, block_size=50)
+
+    np.testing.assert_allclose(op.to_csr().toarray(), P.toarray(), rtol=0, atol=1e-15)
+    v = np.random.default_rng(1).random(P.shape[0])
+    np.testing.assert_allclose(op.rmatvec(v), v @ P, rtol=1e-12)
+    np.testing.assert_allclose(op.matvec(v), P @ v, rtol=1e-12)
+    rows, cols = np.nonzero(P.toarray() + P.toarray().T)
+    np.testing.assert_allclose(op.entries(rows, cols), P.toarray()[rows, cols], atol=1e-15)
+
+    sampler = build_sampler(P)
+    for i, u in [(0, 0.3), (17, 0.99), (90, 0.0)]:
+        assert op.draw(i, u) == sampler.draw(i, u)
+
+    pi = stationary_distribution(P, tol=1e-13)
+    np.testing.assert_allclose(stationary_distribution(op, tol=1e-13), pi, atol=1e-10)
+    for zero_mode in ("inf", "regularize"):
+        assert entropy_production_step(op, pi, zero_mode=zero_mode) == pytest.approx(
+            entropy_production_step(P, pi, zero_mode=zero_mode), rel=1e-10
+        )
+
+
+def test_stream_simulate_chunks_concatenate_to_simulate():
+    _, P = build_model(preset_record_drive())
+    chunks = list(stream_simulate(P, 150_000, seed=3, start_idx=7))
+    assert len(chunks) > 1
+    expected = simulate(P, 150_000, seed=3, start_idx=7)
+    np.testing.assert_array_equal(np.concatenate(chunks), expected)
+    np.testing.assert_array_equal(np.concatenate(list(stream_simulate(P, 0, seed=3))), [0])
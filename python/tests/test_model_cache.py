@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from time_world.constraints_cones import constraint_phi_forbid_value, constraint_r_constant
+from time_world.model import build_model, preset_record_drive
+from time_world.model_cache import ModelCache, cached_build_model, model_fingerprint
+
+
+def _params(**overrides):
+    params = preset_record_drive()
+    params.update(n_x=2, n_phi=4, n_r=3)
+    params.update(overrides)
+    return params
+
+
+def test_fingerprint_tracks_params_and_constraints():
+    base = model_fingerprint(_params())
+    assert base == model_fingerprint(_params())
+    assert base != model_fingerprint(_params(drive_strength=0.5))
+    assert base != model_fingerprint(_params(), format="csr")
+
+    forbid_1 = model_fingerprint(_params(constraint_mask=constraint_phi_forbid_value(1)))
+    assert forbid_1 == model_fingerprint(_params(constraint_mask=constraint_phi_forbid_value(1)))
+    assert forbid_1 != model_fingerprint(_params(constraint_mask=constraint_phi_forbid_value(2)))
+
+    assert model_fingerprint(_params(constraint_mask=lambda a, b: True)) is None
+
+
+def test_memory_cache_reuses_read_only_models():
+    cache = ModelCache(maxsize=1)
+    params = _params(constraint_mask=constraint_r_constant())
+    states, P = cache.build(params)
+    states_again, P_again = cache.build(params)
+    assert P_again is P
+    assert states_again == states
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not P.flags.writeable
+    np.testing.assert_array_equal(P, build_model(params)[1])
+
+    cache.build(_params(drive_strength=0.5))
+    assert len(cache) == 1
+    cache.build(params)
+    assert cache.misses == 3
+
+
+@pytest.mark.parametrize("format", ["dense", "csr"])
+def test_memory_cache_is_bounded_by_bytes(format):
+    first, second = _params(), _params(drive_strength=0.5)
+    _, P = build_model(first, format=format)
+    size = P.nbytes if format == "dense" else P.data.nbytes + P.indices.nbytes + P.indptr.nbytes
+
+    cache = ModelCache(max_bytes=size)
+    cache.build(first, format=format)
+    cache.build(second, format=format)
+    assert len(cache) == 1 and cache.nbytes <= size
+    cache.build(first, format=format)
+    assert cache.misses == 3
+
+    tiny = ModelCache(max_bytes=size - 1)
+    tiny.build(first, format=format)
+    assert len(tiny) == 0 and tiny.nbytes == 0
+
+
+@pytest.mark.parametrize("format", ["dense", "csr"])
+def test_disk_cache_round_trip(tmp_path, format):
+    params = _params()
+    _, P = cached_build_model(params, format=format, cache=ModelCache(cache_dir=tmp_path))
+
+    fresh = ModelCache(cache_dir=tmp_path)
+    _, loaded = fresh.build(params, format=format)
+    assert (fresh.disk_hits, fresh.misses) == (1, 0)
+    if format == "csr":
+        assert sparse.issparse(loaded)
+        loaded = loaded.toarray()
+        P = P.toarray()
+    else:
+        assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, P)
+
+
+def test_disk_cache_evicts_least_recently_used_files(tmp_path):
+    first, second, third = (_params(drive_strength=d) for d in (0.1, 0.2, 0.3))
+    ModelCache(cache_dir=tmp_path).build(first)
+    file_size = next(tmp_path.iterdir()).stat().st_size
+    ModelCache(cache_dir=tmp_path).build(second)
+    paths = {
+        name: tmp_path / f"{model_fingerprint(params)}.npy"
+        for name, params in (("first", first), ("second", second), ("third", third))
+    }
+    # Oldest first: only the load below keeps "first" over "second".
+    for age, name in enumerate(("first", "second")):
+        os.utime(paths[name], ns=(age, age))
+
+    cache = ModelCache(maxsize=0, cache_dir=tmp_path, max_disk_bytes=2 * file_size)
+    cache.build(first)
+    assert cache.disk_hits == 1
+    cache.build(third)
+    assert sorted(tmp_path.iterdir()) == sorted([paths["first"], paths["third"]])
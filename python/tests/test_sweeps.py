@@ -1,6 +1,12 @@
 import numpy as np
 
-from time_world.sweeps import run_case_metrics
+from time_world.audits_ep import entropy_production_pair, stationary_distribution
+from time_world.model import build_model, preset_record_drive
+from time_world.sweeps import (
+    adaptive_sweep,
+    ep_gradients,
+    run_case_metrics,
+)
 
 
 def test_sweep_case_metrics_smoke():
@@ -85,3 +91,57 @@ def test_sweep_holonomy_control_fast():
 
     assert abs(result_none["holonomy_H_mean"]) > 0.1
     assert abs(result_odd["holonomy_H_mean"]) < 0.05
+
+
+def test_ep_gradients_match_finite_differences():
+    params = preset_record_drive()
+    params.update(n_r=4, drive_strength=0.3, phase_noise=0.1, record_coupling=0.4)
+    grads = ep_gradients(params)
+
+    h = 1e-5
+    for name in ("drive_strength", "phase_noise", "record_coupling"):
+        ends = []
+        for value in (params[name] - h, params[name] + h):
+            _, P = build_model({**params, name: value})
+            pi = stationary_distribution(P)
+            ends.append((pi, entropy_production_pair(P, pi)[1]))
+        (pi_lo, ep_lo), (pi_hi, ep_hi) = ends
+        np.testing.assert_allclose(grads["d_pi"][name], (pi_hi - pi_lo) / (2 * h), atol=1e-8)
+        assert np.isclose(grads["d_ep_reg"][name], (ep_hi - ep_lo) / (2 * h), rtol=1e-6)
+        # Driven chains have one-way edges, so the raw EP has no derivative.
+        assert np.isnan(grads["d_ep_raw"][name])
+
+    # At the boundary the stencil turns one-sided instead of leaving the range.
+    edge = ep_gradients({**params, "drive_strength": 1.0}, names=["drive_strength"])
+    assert np.isfinite(edge["d_ep_reg"]["drive_strength"])
+
+
+def test_adaptive_sweep_refines_only_near_jumps():
+    def evaluate(case):
+        driven = case["drive_strength"] > 0.4 + case["phase_noise"]
+        return {**case, "ep_raw": float("inf") if driven else 0.1}
+
+    drives = np.linspace(0.0, 1.0, 65).tolist()
+    results, report = adaptive_sweep(
+        {"drive_strength": drives, "phase_noise": [0.0], "record_coupling": [0.5]},
+        evaluate,
+        tolerances={"ep_raw": 1.0},
+        budget=100,
+    )
+    # Bisection: the jump is bracketed by neighbouring grid values in O(log n) runs.
+    seen = [row["drive_strength"] for row in results]
+    assert report["evaluations"] <= 2 + 6 and report["unresolved_boxes"] == 0
+    k = drives.index(max(d for d in seen if d <= 0.4))
+    assert drives[k + 1] in seen
+
+    grid = {
+        "drive_strength": drives[::2],
+        "phase_noise": np.linspace(0.0, 0.2, 33).tolist(),
+        "record_coupling": [0.0, 0.5],
+    }
+    _, report = adaptive_sweep(grid, evaluate, tolerances={"ep_raw": 1.0}, budget=10_000)
+    assert report["unresolved_boxes"] == 0
+    assert report["evaluations"] < report["grid_size"] / 4
+
+    _, report = adaptive_sweep(grid, evaluate, tolerances={"ep_raw": 1.0}, budget=50)
+    assert report["evaluations"] <= 50 and report["unresolved_boxes"] > 0